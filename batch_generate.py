@@ -0,0 +1,301 @@
+"""
+Offline bulk resume generation from a JSONL file of candidate requests.
+
+Each input line is a request body as accepted by http_incognito, e.g. {"candidateId": 475}.
+The file is streamed line by line, so it can be arbitrarily large. Every candidate is run
+through get_candidate_data and generate_resume on a bounded worker pool with a request
+rate limit, and one JSON line per candidate is appended to the output file:
+
+    {"candidateId": 475, "output": "...", "message": "Resume successfully created."}
+    {"candidateId": 476, "output": null, "message": "Error: ..."}
+
+Runs are resumable: candidates that already have a resume in the output file are skipped,
+while candidates that failed are tried again.
+
+With --batch-api the LLM calls are submitted through Anthropic's Message Batches API
+instead, which is cheaper for large backfills but completes asynchronously. --fake-batch-api
+swaps in a local stand-in that returns placeholder resumes without calling the API.
+
+Usage:
+
+    python batch_generate.py candidates.jsonl resumes.jsonl --workers 4 --rate 2
+    python batch_generate.py candidates.jsonl resumes.jsonl --batch-api --batch-size 500
+
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+from create_resume import build_message_params, fix_resume_bullets, generate_resume, get_client
+from parse_postmeta import get_candidate_data
+
+
+class RateLimiter:
+    """
+    Spaces out calls so that at most `rate` of them start per second, across threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Blocks until the caller may start its next call."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def read_requests(path):
+    """
+    Streams the candidate requests of a JSONL file.
+
+    Yields:
+        tuple: The candidate ID (or None) and an error message (or None) for each non-blank line.
+    """
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                candidate_id = json.loads(line).get('candidateId')
+            except (ValueError, AttributeError):
+                yield None, f"Line {number} is not a JSON object"
+                continue
+            if not candidate_id:
+                yield None, f"Line {number} is missing 'candidateId'"
+                continue
+            yield candidate_id, None
+
+
+def read_done(path):
+    """
+    Returns:
+        set: The candidate IDs that already have a resume in the output file.
+    """
+    done = set()
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if result.get('output') is not None:
+                    done.add(str(result.get('candidateId')))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def pending_requests(input_path, output_path, out):
+    """
+    Streams the candidate IDs still to be generated, recording unreadable lines as errors.
+    """
+    done = read_done(output_path)
+    seen = set()
+    for candidate_id, error in read_requests(input_path):
+        if error:
+            write_result(out, {"candidateId": None, "output": None, "message": f"Error: {error}"})
+            continue
+        if str(candidate_id) in done or str(candidate_id) in seen:
+            continue
+        seen.add(str(candidate_id))
+        yield candidate_id
+
+
+def write_result(out, result):
+    out.write(json.dumps(result) + "\n")
+    out.flush()
+
+
+def _error(candidate_id, message):
+    return {"candidateId": candidate_id, "output": None, "message": f"Error: {message}"}
+
+
+def fetch_candidate(candidate_id):
+    """
+    Returns:
+        tuple: The candidate's resume data, or None and the error result line.
+    """
+    try:
+        resume_data = get_candidate_data(candidate_id)
+    except Exception as e:
+        return None, _error(candidate_id, e)
+    if isinstance(resume_data, dict):
+        return None, _error(candidate_id, resume_data['error'])
+    return resume_data, None
+
+
+def generate_one(candidate_id, limiter):
+    """
+    Runs the full pipeline for one candidate.
+
+    Returns:
+        dict: The result line for the output file.
+    """
+    resume_data, error = fetch_candidate(candidate_id)
+    if error:
+        return error
+    limiter.wait()
+    try:
+        resume_document = generate_resume(resume_data)
+    except Exception as e:
+        return _error(candidate_id, e)
+    return {"candidateId": candidate_id, "output": resume_document, "message": "Resume successfully created."}
+
+
+def run_direct(candidate_ids, out, workers, rate):
+    """
+    Generates resumes with the Messages API on a bounded worker pool.
+
+    At most twice as many candidates as workers are in flight, so the input is never
+    loaded into memory as a whole.
+
+    Returns:
+        int: The number of candidates processed.
+    """
+    limiter = RateLimiter(rate)
+    count = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for candidate_id in candidate_ids:
+            in_flight.add(executor.submit(generate_one, candidate_id, limiter))
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write_result(out, future.result())
+                    count += 1
+        for future in in_flight:
+            write_result(out, future.result())
+            count += 1
+    return count
+
+
+class FakeMessageBatches:
+    """
+    Local stand-in for the Message Batches API with the create/retrieve/results interface.
+    Every request succeeds immediately with a placeholder resume.
+    """
+
+    def __init__(self):
+        self._batches = {}
+
+    def create(self, requests):
+        batch_id = f"msgbatch_fake_{uuid.uuid4().hex}"
+        self._batches[batch_id] = list(requests)
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+
+    def retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, processing_status="ended")
+
+    def results(self, batch_id):
+        for request in self._batches.pop(batch_id):
+            text = f"Resume for request {request['custom_id']}\n- Generated by the local batch fake"
+            message = SimpleNamespace(content=[SimpleNamespace(text=text)])
+            yield SimpleNamespace(custom_id=request['custom_id'],
+                                  result=SimpleNamespace(type="succeeded", message=message))
+
+
+def get_message_batches(fake=False):
+    """
+    Returns the Message Batches resource of the Anthropic client, or the local fake.
+    """
+    if fake:
+        return FakeMessageBatches()
+    client = get_client()
+    batches = getattr(client.messages, 'batches', None) or getattr(
+        getattr(getattr(client, 'beta', None), 'messages', None), 'batches', None)
+    if batches is None:
+        raise RuntimeError("The installed anthropic SDK does not support the Message Batches API")
+    return batches
+
+
+def run_batch_api(candidate_ids, out, workers, batch_size, poll_seconds, fake=False):
+    """
+    Generates resumes through the Message Batches API, one batch per `batch_size` candidates.
+
+    Returns:
+        int: The number of candidates processed.
+    """
+    batches = get_message_batches(fake)
+    count = 0
+    candidate_ids = iter(candidate_ids)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            chunk = list(itertools.islice(candidate_ids, batch_size))
+            if not chunk:
+                return count
+
+            requests = []
+            custom_ids = {}
+            for candidate_id, (resume_data, error) in zip(chunk, executor.map(fetch_candidate, chunk)):
+                if error:
+                    write_result(out, error)
+                    count += 1
+                    continue
+                custom_id = f"candidate-{candidate_id}"
+                custom_ids[custom_id] = candidate_id
+                requests.append({"custom_id": custom_id, "params": build_message_params(resume_data)})
+            if not requests:
+                continue
+
+            batch = batches.create(requests=requests)
+            logging.info(f"Submitted message batch {batch.id} with {len(requests)} requests")
+            while batch.processing_status != "ended":
+                time.sleep(poll_seconds)
+                batch = batches.retrieve(batch.id)
+
+            for entry in batches.results(batch.id):
+                candidate_id = custom_ids.pop(entry.custom_id, entry.custom_id)
+                if entry.result.type == "succeeded":
+                    resume_document = fix_resume_bullets(entry.result.message.content[0].text)
+                    write_result(out, {"candidateId": candidate_id, "output": resume_document,
+                                       "message": "Resume successfully created."})
+                else:
+                    write_result(out, _error(candidate_id, f"batch request {entry.result.type}"))
+                count += 1
+            for candidate_id in custom_ids.values():
+                write_result(out, _error(candidate_id, "missing from batch results"))
+                count += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate resumes for every candidate in a JSONL file.")
+    parser.add_argument("input", help="JSONL file with one {\"candidateId\": ...} request per line")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument("--workers", type=int, default=4, help="Candidates processed in parallel")
+    parser.add_argument("--rate", type=float, default=0, help="Maximum LLM requests per second (0 = unlimited)")
+    parser.add_argument("--batch-api", action="store_true", help="Submit through the Message Batches API")
+    parser.add_argument("--fake-batch-api", action="store_true", help="Use the local Message Batches stand-in")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Requests per message batch")
+    parser.add_argument("--poll-seconds", type=float, default=30, help="Interval between batch status checks")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    start = time.monotonic()
+    with open(args.output, 'a', encoding='utf-8') as out:
+        candidate_ids = pending_requests(args.input, args.output, out)
+        if args.batch_api or args.fake_batch_api:
+            count = run_batch_api(candidate_ids, out, args.workers, args.batch_size, args.poll_seconds,
+                                  fake=args.fake_batch_api)
+        else:
+            count = run_direct(candidate_ids, out, args.workers, args.rate)
+    logging.info(f"Processed {count} candidates in {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
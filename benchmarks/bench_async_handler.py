@@ -0,0 +1,134 @@
+"""
+Benchmark of the async http_incognito handler against the previous synchronous handler.
+
+The database fetch and the LLM call are replaced by stand-ins that sleep for a configurable
+latency, so the benchmark measures how many generations one worker keeps in flight.
+The synchronous handler runs on a thread pool, the way the Functions host runs sync
+functions; the async handler runs on one event loop. Both go through the LLM governor, whose
+concurrency limit is printed with the results: without rate limits it is unbounded, so the
+handlers are measured rather than the governor. Pass --llm-concurrency to cap it.
+
+Usage:
+
+    python benchmarks/bench_async_handler.py --requests 200 --db-ms 40 --llm-ms 2000 --threads 8 --llm-concurrency 0
+
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+os.environ.setdefault("CACHE__ENABLED", "false")
+
+import create_resume  # noqa: E402
+import function_app  # noqa: E402
+from llm_governor import governor_stats  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+RESUME_TEXT = "Jane Doe\n- Led a team\n- Shipped a product\n"
+
+
+def _message():
+    return SimpleNamespace(content=[SimpleNamespace(text=RESUME_TEXT)], stop_reason="end_turn",
+                           usage=SimpleNamespace(input_tokens=900, output_tokens=600))
+
+
+def stub_clients(llm_seconds):
+    """Returns sync and async Anthropic client stand-ins that sleep for llm_seconds."""
+    def create(**kwargs):
+        time.sleep(llm_seconds)
+        return _message()
+
+    async def create_async(**kwargs):
+        await asyncio.sleep(llm_seconds)
+        return _message()
+
+    return (SimpleNamespace(messages=SimpleNamespace(create=create)),
+            SimpleNamespace(messages=SimpleNamespace(create=create_async)))
+
+
+def stub_candidate_data(db_seconds):
+    """Returns a get_candidate_data stand-in that sleeps for db_seconds."""
+    def get_candidate_data(candidate_id):
+        time.sleep(db_seconds)
+        return json.dumps({"name": f"Candidate {candidate_id}", "email": "a@example.com", "phone": "555"})
+    return get_candidate_data
+
+
+def sync_handler(candidate_id):
+    """The request path of the synchronous http_incognito handler."""
+    resume_data = function_app.get_candidate_data(candidate_id)
+    resume_document, _ = function_app.generate_resume_cached(resume_data)
+    return json.dumps({"output": resume_document, "message": "Resume successfully created."})
+
+
+def make_request(candidate_id):
+    body = json.dumps({"candidateId": candidate_id}).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({"type": "http", "method": "POST", "path": "/api/http_incognito", "headers": [],
+                    "query_string": b""}, receive)
+
+
+def check_outputs(bodies):
+    """Fails unless every response body holds a resume: failed generations also answer 200."""
+    for body in bodies:
+        result = json.loads(body)
+        assert result["output"] is not None, result["message"]
+
+
+def run_sync(requests, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        bodies = list(executor.map(sync_handler, range(1, requests + 1)))
+    elapsed = time.perf_counter() - start
+    check_outputs(bodies)
+    return elapsed
+
+
+async def run_async(requests):
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(function_app.http_incognito(make_request(i)) for i in range(1, requests + 1)))
+    elapsed = time.perf_counter() - start
+    assert all(response.status_code == 200 for response in responses)
+    check_outputs(response.body for response in responses)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8, help="Thread pool size of the sync handler")
+    parser.add_argument("--db-ms", type=float, default=40)
+    parser.add_argument("--llm-ms", type=float, default=2000)
+    parser.add_argument("--llm-concurrency", type=int, default=0,
+                        help="LLM governor MAX_CONCURRENCY, 0 for the default (unbounded without rate limits)")
+    args = parser.parse_args()
+    if args.llm_concurrency:
+        os.environ["LLM__MAX_CONCURRENCY"] = str(args.llm_concurrency)
+
+    client, async_client = stub_clients(args.llm_ms / 1000)
+    with mock.patch.object(function_app, "get_candidate_data", stub_candidate_data(args.db_ms / 1000)), \
+            mock.patch.object(create_resume, "get_client", lambda: client), \
+            mock.patch.object(create_resume, "get_async_client", lambda: async_client), \
+            mock.patch.object(function_app, "get_async_client", lambda: async_client):
+        sync_seconds = run_sync(args.requests, args.threads)
+        async_seconds = asyncio.run(run_async(args.requests))
+
+    print(f"{'handler':>8} {'seconds':>9} {'req/s':>9}")
+    print(f"{'sync':>8} {sync_seconds:>9.2f} {args.requests / sync_seconds:>9.1f}")
+    print(f"{'async':>8} {async_seconds:>9.2f} {args.requests / async_seconds:>9.1f}")
+    print(f"\nLLM governor limit: {governor_stats()['limit'] or 'unbounded'}")
+
+
+if __name__ == "__main__":
+    main()
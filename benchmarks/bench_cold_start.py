@@ -0,0 +1,112 @@
+"""
+Import-time profile of function_app, the part of a cold start the app controls.
+
+Each run imports function_app in a fresh interpreter with -X importtime and reports the
+median wall time of the import, the packages that account for it, and which of the heavy
+dependencies were loaded. The dependencies the app defers to first use are then imported
+on their own, showing the cost warm_up() moves off the cold start.
+
+Usage:
+
+    python benchmarks/bench_cold_start.py --runs 5 --top 15
+
+"""
+
+import argparse
+import collections
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Dependencies that must not be imported by function_app at load
+DEFERRED = ["anthropic", "httpx", "mysql.connector", "phpserialize"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(",".join(name for name in {deferred!r} if name in sys.modules))
+"""
+
+
+def profile_import(module):
+    """
+    Imports `module` in a fresh interpreter.
+
+    Returns:
+        tuple: Wall seconds, the loaded DEFERRED modules, and the -X importtime records as
+        (module, self microseconds, cumulative microseconds, depth).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, deferred=DEFERRED)],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    seconds, loaded = result.stdout.splitlines()[-2:]
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        records.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return float(seconds), [name for name in loaded.split(",") if name], records
+
+
+def by_package(records):
+    """Sums the self time of the imported modules per top-level package, in milliseconds."""
+    totals = collections.Counter()
+    for name, self_us, _, _ in records:
+        totals[name.split(".")[0]] += self_us / 1000
+    return totals
+
+
+def direct_imports(records, module):
+    """
+    Returns:
+        list: (name, cumulative microseconds) of the modules `module` imported first, slowest first.
+    """
+    # -X importtime lists a module's imports before the module itself, one level deeper
+    end = next(i for i, record in enumerate(records) if record[0] == module and record[3] == 0)
+    start = end
+    while start > 0 and records[start - 1][3] > 0:
+        start -= 1
+    return sorted(((name, cumulative_us) for name, _, cumulative_us, depth in records[start:end] if depth == 1),
+                  key=lambda item: -item[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Packages listed in the profile")
+    args = parser.parse_args()
+
+    runs = [profile_import("function_app") for _ in range(args.runs)]
+    seconds = [run[0] for run in runs]
+    print(f"import function_app: median {statistics.median(seconds) * 1000:.0f} ms, "
+          f"min {min(seconds) * 1000:.0f} ms over {args.runs} runs")
+
+    # The profile of the median run
+    _, loaded, records = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+    print(f"\n{'package':>40} {'self ms':>9}")
+    for package, milliseconds in by_package(records).most_common(args.top):
+        print(f"{package:>40} {milliseconds:>9.1f}")
+
+    print(f"\n{'imported by function_app':>40} {'cum ms':>9}")
+    for name, cumulative_us in direct_imports(records, "function_app")[:args.top]:
+        print(f"{name:>40} {cumulative_us / 1000:>9.1f}")
+
+    print(f"\nDeferred dependencies loaded at import: {', '.join(loaded) or 'none'}")
+    print(f"\n{'deferred to first use':>40} {'ms':>9}")
+    for module in DEFERRED:
+        try:
+            module_seconds, _, _ = profile_import(module)
+        except subprocess.CalledProcessError:
+            print(f"{module:>40} {'missing':>9}")
+            continue
+        print(f"{module:>40} {module_seconds * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+End-to-end benchmark of http_incognito -> get_candidate_data -> generate_resume.
+
+Synthetic candidates (see synthetic.py) are loaded into a local SQLite stand-in of the
+postmeta table, which the real connection pool, query and parsers read through a small
+mysql.connector-shaped adapter. The Anthropic client is replaced by a fake with a
+configurable latency and token output. Only the network is simulated: everything between
+the request body and the JSON response is the production code path.
+
+The handler is driven at each concurrency level in turn and the run reports requests/sec,
+latency percentiles, peak traced memory and the per-stage timings of the metrics module.
+Results are saved as JSON so runs can be compared:
+
+    python -m benchmarks.bench_end_to_end --candidates 200 --concurrency 1,8,32 --llm-ms 800
+    python -m benchmarks.bench_end_to_end --compare benchmarks/results/e2e-20240501-101500.json
+
+The same --seed always produces the same candidates and LLM latencies.
+
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+os.environ.setdefault("CACHE__ENABLED", "false")
+for _key in ("HOST", "USER", "PASSWORD", "DATABASE"):
+    os.environ.setdefault(f"DATABASE__{_key}", "bench")
+
+import create_resume  # noqa: E402
+import db_pool  # noqa: E402
+import function_app  # noqa: E402
+import metrics  # noqa: E402
+import mysql.connector  # noqa: E402
+from benchmarks.synthetic import candidate_rows  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from parse_postmeta import postmeta_table  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def build_database(path, candidates, jobs, degrees, skills, noise, seed):
+    """
+    Writes the synthetic candidates into a SQLite postmeta table.
+
+    Returns:
+        list: The post_ids of the candidates.
+    """
+    table = postmeta_table()
+    cnx = sqlite3.connect(path)
+    cnx.execute(f"DROP TABLE IF EXISTS {table}")
+    cnx.execute(f"CREATE TABLE {table} (meta_id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL, "
+                "meta_key TEXT, meta_value TEXT)")
+    cnx.execute(f"CREATE INDEX post_id ON {table} (post_id)")
+    post_ids = list(range(1000, 1000 + candidates))
+    for post_id in post_ids:
+        rows = candidate_rows(post_id, jobs=jobs, degrees=degrees, skills=skills, noise=noise, seed=seed + post_id)
+        cnx.executemany(f"INSERT INTO {table} (post_id, meta_key, meta_value) VALUES (?, ?, ?)",
+                        [(row["post_id"], row["meta_key"], row["meta_value"]) for row in rows])
+    cnx.commit()
+    cnx.close()
+    return post_ids
+
+
+class SQLiteCursor:
+    """A dictionary cursor over SQLite that accepts the %s placeholders of mysql.connector."""
+
+    def __init__(self, cnx, query_seconds):
+        self._cursor = cnx.cursor()
+        self._query_seconds = query_seconds
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def execute(self, query, params=()):
+        if self._query_seconds:
+            time.sleep(self._query_seconds)
+        self._cursor.execute(query.replace("%s", "?"), params)
+
+    def fetchall(self):
+        columns = [column[0] for column in self._cursor.description]
+        return [dict(zip(columns, row)) for row in self._cursor.fetchall()]
+
+
+class SQLiteConnection:
+    """The part of a mysql.connector connection the pool and parse_postmeta use."""
+
+    def __init__(self, path, query_seconds):
+        self._cnx = sqlite3.connect(path, check_same_thread=False)
+        # The MySQL functions of the candidate fingerprint query
+        self._cnx.create_function("CRC32", 1, lambda text: None if text is None else zlib.crc32(text.encode('utf-8')),
+                                  deterministic=True)
+        self._cnx.create_function("CONCAT_WS", -1, lambda separator, *parts: separator.join(
+            str(part) for part in parts if part is not None), deterministic=True)
+        self._query_seconds = query_seconds
+
+    def cursor(self, dictionary=True):
+        return SQLiteCursor(self._cnx, self._query_seconds)
+
+    def ping(self, reconnect=False):
+        self._cnx.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._cnx.close()
+
+
+class FakeAnthropic:
+    """
+    Async Anthropic client stand-in. Each call sleeps for a latency drawn around `latency`
+    plus `per_token` per output token, then returns a resume of `output_tokens` words.
+    """
+
+    def __init__(self, latency, per_token, output_tokens, jitter, seed):
+        self._latency = latency
+        self._per_token = per_token
+        self._output_tokens = output_tokens
+        self._jitter = jitter
+        self._rng = random.Random(seed)
+        self.messages = SimpleNamespace(create=self.create)
+
+    def _text(self):
+        lines, words = ["Candidate Resume", "Experience"], 2
+        while words < self._output_tokens:
+            lines.append("- Delivered measurable results across the platform team")
+            words += 8
+        return "\n".join(lines)
+
+    async def create(self, **params):
+        # Like the API, the answer stops at max_tokens
+        output_tokens = min(self._output_tokens, params.get("max_tokens", self._output_tokens))
+        seconds = max(0.0, self._rng.gauss(self._latency, self._latency * self._jitter))
+        await asyncio.sleep(seconds + self._per_token * output_tokens)
+        input_tokens = sum(len(str(message["content"])) for message in params.get("messages", [])) // 4
+        return SimpleNamespace(content=[SimpleNamespace(text=self._text())],
+                               stop_reason="max_tokens" if output_tokens < self._output_tokens else "end_turn",
+                               usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens))
+
+
+def make_request(candidate_id):
+    body = json.dumps({"candidateId": candidate_id}).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({"type": "http", "method": "POST", "path": "/api/http_incognito", "headers": [],
+                    "query_string": b""}, receive)
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+async def run_level(post_ids, concurrency, requests):
+    """
+    Sends `requests` requests, at most `concurrency` at a time, cycling through the candidates.
+
+    Returns:
+        dict: Throughput, latency percentiles and error count of the level.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(candidate_id):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await function_app.http_incognito(make_request(candidate_id))
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200 or json.loads(response.body)["output"] is None:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(post_ids[i % len(post_ids)]) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_levels(levels, baseline=None):
+    baseline = {level["concurrency"]: level for level in (baseline or [])}
+    print(f"{'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MiB':>9} {'errors':>7}")
+    for level in levels:
+        line = (f"{level['concurrency']:>5} {level['requests_per_second']:>9.1f} {level['p50_ms']:>9.1f} "
+                f"{level['p95_ms']:>9.1f} {level['p99_ms']:>9.1f} {level['peak_traced_mib']:>9.1f} "
+                f"{level['errors']:>7}")
+        previous = baseline.get(level["concurrency"])
+        if previous:
+            line += (f"   req/s {level['requests_per_second'] / previous['requests_per_second'] - 1:+.1%}"
+                     f", p95 {level['p95_ms'] / previous['p95_ms'] - 1:+.1%}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=5, help="Work history entries per candidate")
+    parser.add_argument("--degrees", type=int, default=2, help="Education entries per candidate")
+    parser.add_argument("--skills", type=int, default=10)
+    parser.add_argument("--noise", type=int, default=20, help="Unrelated meta rows per candidate")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=0, help="Requests per level (default 4x concurrency, min 50)")
+    parser.add_argument("--db-ms", type=float, default=5, help="Simulated network latency per query")
+    parser.add_argument("--llm-ms", type=float, default=500, help="Mean LLM latency")
+    parser.add_argument("--llm-ms-per-token", type=float, default=0, help="Extra LLM latency per output token")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="LLM latency standard deviation, relative")
+    parser.add_argument("--output-tokens", type=int, default=600)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--llm-concurrency", type=int, default=0,
+                        help="LLM governor MAX_CONCURRENCY, 0 for the default (unbounded without rate limits)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="Result file (default benchmarks/results/e2e-<timestamp>.json)")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["levels"]
+
+    os.environ["DATABASE__POOL_SIZE"] = str(args.pool_size)
+    if args.llm_concurrency:
+        os.environ["LLM__MAX_CONCURRENCY"] = str(args.llm_concurrency)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "postmeta.sqlite3")
+        post_ids = build_database(path, args.candidates, args.jobs, args.degrees, args.skills, args.noise, args.seed)
+        client = FakeAnthropic(args.llm_ms / 1000, args.llm_ms_per_token / 1000, args.output_tokens,
+                               args.llm_jitter, args.seed)
+
+        levels = []
+        with mock.patch.object(mysql.connector, "connect",
+                               lambda **kwargs: SQLiteConnection(path, args.db_ms / 1000)), \
+                mock.patch.object(db_pool, "_pool", None), \
+                mock.patch.object(create_resume, "get_async_client", lambda: client), \
+                mock.patch.object(function_app, "get_async_client", lambda: client):
+            for concurrency in (int(level) for level in args.concurrency.split(",")):
+                requests = args.requests or max(50, 4 * concurrency)
+                tracemalloc.start()
+                level = asyncio.run(run_level(post_ids, concurrency, requests))
+                level["peak_traced_mib"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+                levels.append(level)
+            stages = metrics.snapshot()
+            pool = db_pool.pool_stats()
+
+    print_levels(levels, baseline)
+    print(f"{'stage (all levels)':>22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, histogram in stages.items():
+        if "p50" in histogram:
+            print(f"{stage:>22} {histogram['p50']:>9.2f} {histogram['p95']:>9.2f} {histogram['p99']:>9.2f}")
+
+    result = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("save", "no_save", "compare")},
+        "levels": levels,
+        "stages": stages,
+        "db_pool": pool,
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if not args.no_save:
+        save = args.save or os.path.join(
+            RESULTS_DIR, f"e2e-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(save)), exist_ok=True)
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved results to {save}")
+
+
+if __name__ == "__main__":
+    main()
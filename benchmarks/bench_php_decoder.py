@@ -0,0 +1,105 @@
+"""
+Equivalence fuzzing and benchmark of the PHP string-array decoder against phpserialize.
+
+The fuzz step checks that decode_string_array agrees with phpserialize on well-formed
+arrays (including multi-byte UTF-8, quotes, semicolons and braces inside values) and on
+randomly truncated or mutated inputs, where it must either agree or decline (None).
+The benchmark then compares the previous phpserialize-based parse with the fast decoder,
+with and without the memo.
+
+Usage:
+
+    python benchmarks/bench_php_decoder.py --cases 5000 --values 1000
+
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import phpserialize  # noqa: E402
+
+from benchmarks.synthetic import php_array  # noqa: E402
+from php_serialized import decode_string_array, parse_php_serialized  # noqa: E402
+
+ALPHABET = 'abcXYZ 019;:{}"\'\\\r\n\téüß€中文😀'
+
+
+def legacy_parse(data):
+    """parse_php_serialized as it was before the fast decoder, without the print."""
+    try:
+        parsed_data = phpserialize.loads(data.encode('utf-8'))
+    except Exception:
+        return data
+    if isinstance(parsed_data, dict):
+        return [value.decode('utf-8') for value in parsed_data.values()]
+    return data
+
+
+def random_array(rng):
+    values = ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40))) for _ in range(rng.randint(0, 8))]
+    return php_array(values)
+
+
+def mutate(rng, data):
+    choice = rng.randrange(4)
+    if choice == 0 and data:
+        return data[:rng.randrange(len(data))]
+    if choice == 1 and data:
+        i = rng.randrange(len(data))
+        return data[:i] + rng.choice(ALPHABET) + data[i + 1:]
+    if choice == 2:
+        return data.replace('i:1;', 'i:0;', 1)
+    return data + rng.choice(['', ' ', '}', 'x'])
+
+
+def fuzz(cases, seed):
+    rng = random.Random(seed)
+    fast_path = 0
+    for _ in range(cases):
+        for data in (random_array(rng), mutate(rng, random_array(rng))):
+            try:
+                expected = legacy_parse(data)
+            except UnicodeDecodeError:
+                # phpserialize can split a multi-byte character in a corrupted value
+                continue
+            decoded = decode_string_array(data)
+            if decoded is not None:
+                fast_path += 1
+                assert decoded == expected, (data, decoded, expected)
+            assert parse_php_serialized(data) == (expected if data else data), data
+    print(f"fuzz: {cases * 2} inputs agree with phpserialize ({fast_path} decoded on the fast path)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--values", type=int, default=1000, help="Distinct serialized values in the benchmark")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Malformed fuzz inputs are expected to log parse warnings
+    logging.disable(logging.WARNING)
+    fuzz(args.cases, args.seed)
+
+    rng = random.Random(args.seed)
+    corpus = [php_array(f"Value {i} " + "lorem ipsum " * rng.randint(1, 30) for i in range(rng.randint(1, 10)))
+              for _ in range(args.values)]
+    # Each value is parsed several times per candidate, as the parsers used to do
+    workload = corpus * 5
+
+    legacy = min(timeit.repeat(lambda: [legacy_parse(d) for d in workload], number=1, repeat=3))
+    fast = min(timeit.repeat(lambda: [decode_string_array(d) for d in workload], number=1, repeat=3))
+    memo = min(timeit.repeat(lambda: [parse_php_serialized(d) for d in workload], number=1, repeat=3))
+    print(f"{'decoder':>12} {'ms':>9} {'speedup':>8}")
+    for name, seconds in (("phpserialize", legacy), ("fast", fast), ("memoized", memo)):
+        print(f"{name:>12} {seconds * 1000:>9.1f} {legacy / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Prompt size of the candidate model against the previous double-encoded JSON.
+
+get_candidate_data used to return json.dumps(user_data, indent=4), which generate_resume
+encoded again, embedding an escaped, pretty-printed JSON string in the prompt. This script
+builds both prompts for synthetic candidates and reports their size in characters and
+tokens, and the time spent serializing. The sizes are those of the per-candidate user
+message; the fixed instructions in the system prompt are reported separately.
+
+Token counts use the SDK's local tokenizer (Anthropic.count_tokens), which approximates the
+Claude 3 tokenizer; the input_tokens logged per generation are authoritative.
+
+Usage:
+
+    python benchmarks/bench_prompt_size.py --candidates 50 --jobs 6 --degrees 2
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from anthropic import Anthropic  # noqa: E402
+
+from benchmarks.synthetic import candidate_rows  # noqa: E402
+from create_resume import build_prompt_message, resume_instructions  # noqa: E402
+from parse_postmeta import parse_candidate_rows  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=6)
+    parser.add_argument("--degrees", type=int, default=2)
+    args = parser.parse_args()
+
+    candidates = [parse_candidate_rows(candidate_rows(post_id, jobs=args.jobs, degrees=args.degrees))
+                  for post_id in range(args.candidates)]
+    tokenizer = Anthropic(api_key="unused")
+
+    totals = {"legacy": [0, 0], "model": [0, 0]}
+    for candidate in candidates:
+        template = build_prompt_message("{}")["content"]
+        legacy_json = json.dumps(json.dumps(candidate.to_dict(), indent=4))
+        prompts = {
+            "legacy": template.replace("{}", legacy_json, 1),
+            "model": build_prompt_message(candidate)["content"],
+        }
+        for name, prompt in prompts.items():
+            totals[name][0] += len(prompt)
+            totals[name][1] += tokenizer.count_tokens(prompt)
+
+    legacy_time = min(timeit.repeat(
+        lambda: [json.dumps(json.dumps(c.to_dict(), indent=4)) for c in candidates], number=1, repeat=5))
+    model_time = min(timeit.repeat(lambda: [c.to_json() for c in candidates], number=1, repeat=5))
+
+    print(f"{'prompt':>8} {'chars/cand':>11} {'tokens/cand':>12} {'serialize us/cand':>18}")
+    for name, seconds in (("legacy", legacy_time), ("model", model_time)):
+        chars, tokens = totals[name]
+        print(f"{name:>8} {chars / len(candidates):>11.0f} {tokens / len(candidates):>12.0f} "
+              f"{seconds / len(candidates) * 1e6:>18.1f}")
+    saved = 1 - totals["model"][1] / totals["legacy"][1]
+    print(f"input tokens saved per generation: {saved:.1%}")
+    print(f"system prompt: {tokenizer.count_tokens(resume_instructions())} tokens")
+
+
+if __name__ == "__main__":
+    main()
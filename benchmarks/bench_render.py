@@ -0,0 +1,111 @@
+"""
+Throughput of the in-memory DOCX and PDF rendering of resumes.
+
+Renders synthetic resumes (the layout generate_resume returns: name, contact line, headed
+sections with paragraphs and bullets) and reports, per format, resumes per second and the
+p50/p95 latency of a render, with the template parsed once per worker as in the app and
+with it parsed again for every resume. A last pass runs store_documents into a local
+document store, adding the parse of the text and the file write.
+
+Usage:
+
+    python benchmarks/bench_render.py --resumes 200 --bullets 24 --threads 1,4
+
+"""
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import docx_render  # noqa: E402
+import pdf_render  # noqa: E402
+from document_store import FORMATS, LocalDocumentStore, store_documents  # noqa: E402
+from resume_document import parse_resume  # noqa: E402
+
+WORDS = ("managed delivered automated reconciled launched quarterly revenue team platform customers "
+         "reporting migrated reduced costs improved onboarding processes stakeholders budget analysis").split()
+SECTIONS = ["SUMMARY", "PROFESSIONAL EXPERIENCE", "EDUCATION", "SKILLS"]
+
+
+def resume_text(rng, bullets):
+    """Returns a synthetic resume with about `bullets` bullet points across its sections."""
+    lines = [f"Candidate {rng.randint(1, 10 ** 6)}", "555-0100 | candidate@example.com | Boston, MA", ""]
+    for heading in SECTIONS:
+        lines.append(heading)
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 30))).capitalize() + ".")
+        for _ in range(bullets // len(SECTIONS)):
+            lines.append("• " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 22))).capitalize())
+        lines.append("")
+    return "\n".join(lines)
+
+
+def clear_templates():
+    docx_render.load_template.cache_clear()
+    pdf_render.load_template.cache_clear()
+
+
+def run(documents, extension, threads, per_request_template):
+    """
+    Returns:
+        tuple: Wall seconds, the render latencies in milliseconds and the mean output size.
+    """
+    renderer, _ = FORMATS[extension]
+
+    def render(document):
+        if per_request_template:
+            clear_templates()
+        start = time.perf_counter()
+        stream = io.BytesIO()
+        renderer(document, stream)
+        return (time.perf_counter() - start) * 1000, stream.tell()
+
+    clear_templates()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(render, documents))
+    return time.perf_counter() - start, [ms for ms, _ in results], statistics.mean(size for _, size in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resumes", type=int, default=200)
+    parser.add_argument("--bullets", type=int, default=24, help="Bullet points per resume")
+    parser.add_argument("--threads", default="1,4", help="Comma-separated thread counts")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = [resume_text(rng, args.bullets) for _ in range(args.resumes)]
+    start = time.perf_counter()
+    documents = [parse_resume(text) for text in texts]
+    print(f"parse_resume: {(time.perf_counter() - start) / len(texts) * 1000:.3f} ms per resume\n")
+
+    print(f"{'format':>6} {'template':>12} {'threads':>7} {'resumes/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'KiB':>6}")
+    for extension in FORMATS:
+        for per_request in (False, True):
+            for threads in (int(value) for value in args.threads.split(",")):
+                seconds, latencies, size = run(documents, extension, threads, per_request)
+                latencies.sort()
+                print(f"{extension:>6} {'per request' if per_request else 'cached':>12} {threads:>7} "
+                      f"{len(documents) / seconds:>10.0f} {statistics.median(latencies):>8.2f} "
+                      f"{latencies[int(0.95 * (len(latencies) - 1))]:>8.2f} {size / 1024:>6.1f}")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalDocumentStore(root)
+        start = time.perf_counter()
+        for number, text in enumerate(texts):
+            store_documents(number, text, list(FORMATS), store)
+        seconds = time.perf_counter() - start
+    print(f"\nstore_documents (parse, docx and pdf, local store): {len(texts) / seconds:.0f} resumes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Micro-benchmark of the repeater-group parser against the previous per-record next() scans.
+
+The indexed parser is timed with the memo of parsed PHP values (php_serialized.py) emptied
+before each repeat, so its numbers are those of rows seen for the first time.
+
+Usage:
+
+    python benchmarks/bench_repeater_parser.py --candidates 200 --entries 5 10 25 50
+
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from benchmarks.synthetic import candidate_rows  # noqa: E402
+from parse_postmeta import EXPERIENCE_FIELDS, parse_workhistory_records  # noqa: E402
+from php_serialized import _parse_memoized, _parse_with_phpserialize  # noqa: E402
+
+
+def legacy_scan(records):
+    """The lookup pattern parse_workhistory_records used before: six scans and parses per record."""
+    for _ in records:
+        for meta_keys in EXPERIENCE_FIELDS.values():
+            value = next((r['meta_value'] for r in records if r['meta_key'] == meta_keys[0]), "")
+            _parse_with_phpserialize(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--entries", type=int, nargs="+", default=[5, 10, 25, 50])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'legacy ms':>12} {'indexed ms':>12} {'speedup':>8}")
+    for entries in args.entries:
+        candidates = []
+        for post_id in range(args.candidates):
+            rows = candidate_rows(post_id, jobs=entries, noise=0)
+            candidates.append([row for row in rows if row["meta_key"].startswith("jobsearch_field_exp")])
+
+        legacy = min(timeit.repeat(lambda: [legacy_scan(c) for c in candidates], number=1, repeat=args.repeat))
+        # The parse memo is emptied before each repeat, so every repeat parses the values again
+        indexed = min(timeit.repeat(lambda: [parse_workhistory_records(c) for c in candidates],
+                                    setup=_parse_memoized.cache_clear, number=1, repeat=args.repeat))
+        print(f"{entries:>8} {legacy * 1000:>12.1f} {indexed * 1000:>12.1f} {legacy / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Equivalence check and benchmark of the description normalization engine.
+
+The engine must produce byte-identical output to the original clean_description. This
+script checks that on a corpus of realistic HTML snippets (pasted job postings, Word
+bullets, tab-indented lists, CRLF line endings) and on random strings drawn from the
+characters the patterns react to, then times both implementations over the corpus.
+
+Usage:
+
+    python benchmarks/bench_text_normalize.py --fuzz 20000 --repeat 5
+
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from text_normalize import clean_description, clean_descriptions  # noqa: E402
+
+FUZZ_ALPHABET = ['<', '>', 'p', 'li', ' ', '\t', '\n', '\r', '\u2022', '\uf0a7', '\u2019', '\x0b', '\xa0', 'a', 'Z', '.']
+
+SNIPPETS = [
+    "<p><strong>Senior Accountant</strong></p>\r\n<ul>\r\n<li>Prepared monthly close packages</li>\r\n"
+    "<li>Reconciled 40+ accounts</li>\r\n</ul>\r\n",
+    "\u2022\tManaged a team of 6 associates\r\n\u2022\tGrew revenue by 25%\r\n\r\n\u2022\tTrained new hires\r\n",
+    "\uf0a7 Designed the data warehouse\n\uf0a7 Migrated reports to Power BI\n\n\n",
+    "\t\tLed the ERP rollout\n\t\tDocumented processes\n",
+    "<div class=\"job-description\"><h3>Responsibilities</h3><p>Own the quarterly roadmap, "
+    "coordinate with engineering &amp; sales.</p><br/><p>Requirements:</p><ol><li>5 years</li></ol></div>",
+    "Coordinated logistics for a 200-person conference.\u2019",
+    "Line one\r\rLine two\n \n \nLine three",
+]
+
+
+def legacy_clean_description(description):
+    """clean_description as it was before the normalization engine."""
+    text = re.sub(r'<[^>]+>', '', description)
+    text = text.strip('\n\r\t\u2019')
+    text = re.sub(r'^\s*[\u2022\uf0a7]\s*', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^\s*\t+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'[\n\r]\s*[\n\r]+', '\n', text)
+    text = text.replace('\n', ' ').replace('\r', ' ')
+    return text
+
+
+def build_corpus(size, rng):
+    """Builds descriptions from 1-20 snippets each, some several kilobytes long."""
+    return ["".join(rng.choice(SNIPPETS) for _ in range(rng.randint(1, 20))) for _ in range(size)]
+
+
+def check_equivalence(corpus, fuzz, rng):
+    for text in corpus:
+        assert clean_description(text) == legacy_clean_description(text), repr(text)
+    for _ in range(fuzz):
+        text = "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 30)))
+        assert clean_description(text) == legacy_clean_description(text), repr(text)
+    assert clean_descriptions(corpus) == [legacy_clean_description(text) for text in corpus]
+    print(f"equivalence: {len(corpus)} corpus texts and {fuzz} random strings are byte-identical")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", type=int, default=2000)
+    parser.add_argument("--fuzz", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = build_corpus(args.corpus, rng)
+    check_equivalence(corpus, args.fuzz, rng)
+
+    size = sum(len(text) for text in corpus)
+    legacy = min(timeit.repeat(lambda: [legacy_clean_description(t) for t in corpus], number=1, repeat=args.repeat))
+    engine = min(timeit.repeat(lambda: [clean_description(t) for t in corpus], number=1, repeat=args.repeat))
+    print(f"corpus: {len(corpus)} descriptions, {size / 1024:.0f} KiB")
+    print(f"{'implementation':>15} {'ms':>9} {'MB/s':>8} {'speedup':>8}")
+    for name, seconds in (("legacy", legacy), ("engine", engine)):
+        print(f"{name:>15} {seconds * 1000:>9.1f} {size / seconds / 1e6:>8.1f} {legacy / seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
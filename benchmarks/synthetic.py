@@ -0,0 +1,83 @@
+"""
+Synthetic JobSearch postmeta rows for benchmarking the resume pipeline without the real
+Incognito Careers database.
+
+"""
+
+import random
+
+import phpserialize
+
+from parse_postmeta import EDUCATION_FIELDS, EXPERIENCE_FIELDS
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+
+DESCRIPTION = ("<p>Led a team of {n} engineers delivering the {product} platform.</p>\r\n"
+               "<ul><li>• Reduced processing time by {pct}%</li>\r\n"
+               "<li>\t• Managed a ${budget}k budget across {n} quarters</li></ul>\r\n\r\n")
+
+
+def php_array(values):
+    """Serializes a list of strings the way JobSearch stores repeater fields."""
+    return phpserialize.dumps(list(values)).decode('utf-8')
+
+
+def _date(rng, year):
+    return f"{rng.choice(MONTHS)} {rng.randint(1, 28):02d} {year}"
+
+
+def _description(rng):
+    return DESCRIPTION.format(n=rng.randint(2, 12), product=rng.choice(["billing", "search", "payments"]),
+                              pct=rng.randint(5, 60), budget=rng.randint(50, 900))
+
+
+def candidate_rows(post_id, jobs=5, degrees=2, skills=10, noise=20, seed=None):
+    """
+    Builds the postmeta rows of one synthetic candidate.
+
+    Args:
+        post_id (int): The candidate's post_id.
+        jobs (int): Number of work history entries.
+        degrees (int): Number of education entries.
+        skills (int): Number of skills.
+        noise (int): Number of unrelated meta rows, as carried by real WordPress posts.
+        seed: Seed for reproducible output (defaults to the post_id).
+
+    Returns:
+        list: Dictionaries with post_id, meta_key and meta_value.
+    """
+    rng = random.Random(post_id if seed is None else seed)
+    meta = {
+        "member_display_name": f"Candidate {post_id}",
+        "user_email_field": f"candidate{post_id}@example.com",
+        "jobsearch_field_user_phone": f"555-{post_id % 10000:04d}",
+        "jobsearch_cand_skills": php_array(f"Skill {i}" for i in range(skills)),
+    }
+
+    years = [2024 - 2 * i for i in range(jobs)]
+    meta.update({
+        EXPERIENCE_FIELDS["title"][0]: php_array(f"Engineer {i}" for i in range(jobs)),
+        EXPERIENCE_FIELDS["company"][0]: php_array(f"Company {i}" for i in range(jobs)),
+        EXPERIENCE_FIELDS["description"][0]: php_array(_description(rng) for _ in range(jobs)),
+        EXPERIENCE_FIELDS["start_date"][0]: php_array(_date(rng, year - 2) for year in years),
+        EXPERIENCE_FIELDS["end_date"][0]: php_array("" if i == 0 else _date(rng, year) for i, year in enumerate(years)),
+        EXPERIENCE_FIELDS["present"][0]: php_array("on" if i == 0 else "" for i in range(jobs)),
+    })
+
+    years = [2010 - 4 * i for i in range(degrees)]
+    meta.update({
+        EDUCATION_FIELDS["degree"][0]: php_array(f"Degree {i}" for i in range(degrees)),
+        EDUCATION_FIELDS["university"][0]: php_array(f"University {i}" for i in range(degrees)),
+        EDUCATION_FIELDS["description"][0]: php_array(_description(rng) for _ in range(degrees)),
+        EDUCATION_FIELDS["start_date"][0]: php_array(_date(rng, year - 4) for year in years),
+        EDUCATION_FIELDS["end_date"][0]: php_array(_date(rng, year) for year in years),
+        EDUCATION_FIELDS["present"][0]: php_array("" for _ in range(degrees)),
+    })
+
+    for i in range(noise):
+        meta[f"_wp_unrelated_meta_{i}"] = "x" * rng.randint(10, 2000)
+
+    rows = [{"post_id": post_id, "meta_key": key, "meta_value": value} for key, value in meta.items()]
+    rng.shuffle(rows)
+    return rows
@@ -0,0 +1,92 @@
+"""
+In-memory model of the candidate data a resume is generated from.
+
+parse_postmeta builds a Candidate from the postmeta rows and create_resume serializes it
+exactly once, as compact JSON with empty fields pruned, when the prompt is built.
+
+"""
+
+import json
+from dataclasses import dataclass, field
+
+
+def _prune(data):
+    """Drops keys whose values are empty strings, lists or None."""
+    return {key: value for key, value in data.items() if value not in ("", None, [])}
+
+
+@dataclass(slots=True)
+class Education:
+    degree: str = ""
+    university: str = ""
+    year: str = ""
+    description: str = ""
+
+    def to_dict(self):
+        return _prune({"degree": self.degree, "university": self.university,
+                       "year": self.year, "description": self.description})
+
+
+@dataclass(slots=True)
+class Experience:
+    title: str = ""
+    company: str = ""
+    duration: str = ""
+    description: str = ""
+
+    def to_dict(self):
+        return _prune({"title": self.title, "company": self.company,
+                       "duration": self.duration, "description": self.description})
+
+
+@dataclass(slots=True)
+class Candidate:
+    name: str
+    email: str
+    phone: str
+    skills: list = field(default_factory=list)
+    education: list = field(default_factory=list)
+    experience: list = field(default_factory=list)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: The candidate as plain data, without empty fields or entries.
+        """
+        return _prune({
+            "name": self.name,
+            "email": self.email,
+            "phone": self.phone,
+            "skills": [skill for skill in self.skills if skill],
+            "education": [entry for entry in (e.to_dict() for e in self.education) if entry],
+            "experience": [entry for entry in (e.to_dict() for e in self.experience) if entry],
+        })
+
+    def to_json(self):
+        """
+        Returns:
+            str: The candidate as compact JSON, as it is sent to the LLM.
+        """
+        return json.dumps(self.to_dict(), separators=(',', ':'), ensure_ascii=False)
+
+
+def serialize_candidate(candidate_info):
+    """
+    Serializes candidate data for the prompt as compact JSON.
+
+    Args:
+        candidate_info: A Candidate, a dict, or a JSON string of candidate data.
+
+    Returns:
+        str: Compact JSON of the candidate.
+    """
+    if isinstance(candidate_info, Candidate):
+        return candidate_info.to_json()
+    if isinstance(candidate_info, str):
+        try:
+            candidate_info = json.loads(candidate_info)
+        except ValueError:
+            return candidate_info
+    if isinstance(candidate_info, dict):
+        candidate_info = _prune(candidate_info)
+    return json.dumps(candidate_info, separators=(',', ':'), ensure_ascii=False)
@@ -0,0 +1,143 @@
+"""
+Read-through cache of parsed candidates, keyed by post_id.
+
+get_candidate_data fetches every resume-relevant postmeta row of a candidate and runs the
+PHP deserialization and description cleaning over them, even when the candidate has not
+changed since the last request. With this cache it first runs a fingerprint query over the
+same rows:
+
+    SELECT COUNT(*), MAX(meta_id), SUM(CRC32(CONCAT_WS('=', meta_key, meta_value))) ...
+
+The server still reads every meta_value to compute the checksum; what the fingerprint saves
+is sending the values over the network and parsing them. The count and highest meta_id
+change when rows are added or deleted, the checksum when WordPress updates a value in place
+(update_post_meta keeps the meta_id). While the fingerprint matches the one stored with the
+cached candidate, the cached Candidate is returned and the row transfer and parse are
+skipped. A miss costs two round trips, the fingerprint and then the fetch, one more than
+without the cache. Rows that change between the fingerprint and the fetch are stored under
+the older fingerprint, which only costs a miss on the next request.
+
+The cache lives in the worker's memory and is bounded by the approximate size of the parsed
+candidates (their serialized JSON), evicting the least recently used. Cached candidates are
+shared between requests and must not be modified. Settings come from the optional
+CANDIDATE_CACHE section (see settings.py):
+
+    ENABLED     Set to false to fetch and parse every candidate (default true).
+    MAX_BYTES   Approximate memory held by cached candidates (default 16 MB).
+
+"""
+
+import collections
+import json
+import threading
+
+from candidate import serialize_candidate
+from settings import get_section
+
+# Per-entry bookkeeping (dict slot, tuple, fingerprint) added to the serialized size
+ENTRY_OVERHEAD = 256
+
+
+def entry_size(candidate):
+    """Returns the approximate memory of a parsed candidate (or parse error) in bytes."""
+    if isinstance(candidate, dict):
+        return len(json.dumps(candidate)) + ENTRY_OVERHEAD
+    return len(serialize_candidate(candidate).encode('utf-8')) + ENTRY_OVERHEAD
+
+
+class CandidateCache:
+    """
+    Memory-bounded LRU of parsed candidates, each valid for one postmeta fingerprint.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def get(self, post_id, fingerprint):
+        """
+        Returns:
+            The cached candidate if it was parsed from rows with this fingerprint, else None.
+        """
+        with self._lock:
+            entry = self._entries.get(post_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            cached_fingerprint, candidate, _, rows_bytes = entry
+            if cached_fingerprint != fingerprint:
+                self._stats["stale"] += 1
+                return None
+            self._entries.move_to_end(post_id)
+            self._stats["hits"] += 1
+            self._stats["bytes_saved"] += rows_bytes
+            return candidate
+
+    def put(self, post_id, fingerprint, candidate, rows_bytes):
+        """
+        Caches a parsed candidate.
+
+        Args:
+            post_id (int): The candidate ID.
+            fingerprint (tuple): The fingerprint of the rows it was parsed from.
+            candidate: The Candidate, or the error dict of parse_candidate_rows.
+            rows_bytes (int): meta_value bytes of the rows, counted as saved on every hit.
+        """
+        size = entry_size(candidate)
+        with self._lock:
+            previous = self._entries.pop(post_id, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if size > self.max_bytes:
+                return
+            self._entries[post_id] = (fingerprint, candidate, size, rows_bytes)
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit, miss, stale, store and eviction counters, the row bytes not transferred
+            thanks to hits, the number of entries and their approximate size.
+        """
+        with self._lock:
+            stats = {name: self._stats[name] for name in (
+                "hits", "misses", "stale", "stores", "evictions", "bytes_saved")}
+            stats.update(entries=len(self._entries), bytes=self._bytes)
+        lookups = stats["hits"] + stats["misses"] + stats["stale"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_candidate_cache():
+    """
+    Returns the process-wide candidate cache, or None if it is disabled in the settings.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                section = get_section('CANDIDATE_CACHE')
+                if not section.getboolean('ENABLED', fallback=True):
+                    return None
+                _cache = CandidateCache(max_bytes=section.getint('MAX_BYTES', fallback=16 * 1024 * 1024))
+    return _cache
+
+
+def candidate_cache_stats():
+    """
+    Returns:
+        dict: The candidate cache statistics, or an empty dict if the cache is not in use.
+    """
+    return _cache.stats() if _cache is not None else {}
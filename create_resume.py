@@ -6,12 +6,123 @@ Instead of gpt-3.5-turbo or gpt-4, this version of create_resume uses Anthropic'
 
 """
 # Standard library imports
-import configparser
-import json
+import functools
+import logging
 import os
+import threading
+import time
 
-# Related third party imports
-from anthropic import Anthropic  # Import Anthropic library
+# Related third party imports: the anthropic SDK (with httpx and pydantic) is imported by
+# get_client() and get_async_client() on first use, keeping it out of the worker's cold start
+
+# Local application imports
+from candidate import serialize_candidate
+from latency_budget import (new_deadline, output_token_budget, raise_if_expired, record_latency, remaining,
+                            run_hedged)
+from llm_governor import estimate_tokens, get_governor
+from metrics import observe, record_usage, span
+from resume_cache import make_cache_key
+from settings import get_section, get_settings
+
+# Bump PROMPT_VERSION whenever the prompt template changes, so cached resumes are regenerated.
+# The instructions live in prompts/resume_v<PROMPT_VERSION>.txt
+PROMPT_VERSION = "3"
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+# Default of the LLM MODEL setting
+MODEL = "claude-3-haiku-20240307"
+# Ceiling of max_tokens, which latency_budget lowers to a page's worth of output
+MAX_TOKENS = 4096
+TEMPERATURE = 1.0
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+class ResumeTruncatedError(Exception):
+    """Raised when the LLM stopped at max_tokens, so the resume is incomplete and not cached."""
+
+
+def _client_options(llm):
+    """Returns the timeout, retry and connection pool options shared by both clients."""
+    import httpx
+
+    max_connections = llm.getint('MAX_CONNECTIONS', fallback=20)
+    return {
+        "api_key": llm['ANTHROPIC_KEY'],
+        "timeout": httpx.Timeout(llm.getfloat('TIMEOUT', fallback=120.0),
+                                 connect=llm.getfloat('CONNECT_TIMEOUT', fallback=10.0)),
+        # Retries are left to the governor, which backs off across all callers
+        "max_retries": 0,
+        "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                               keepalive_expiry=llm.getfloat('KEEPALIVE_SECONDS', fallback=120.0)),
+    }
+
+
+def get_client():
+    """
+    Returns the process-wide Anthropic client, creating it on first use.
+
+    Reusing one client across invocations keeps its HTTP connection pool and TLS sessions
+    alive, so warm invocations skip the connect and handshake to the API. Timeouts and
+    pool limits come from the optional LLM settings TIMEOUT, CONNECT_TIMEOUT,
+    MAX_CONNECTIONS and KEEPALIVE_SECONDS; retries are done by llm_governor.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from anthropic import Anthropic, DefaultHttpxClient  # Import Anthropic library
+
+                options = _client_options(get_settings()['LLM'])
+                limits = options.pop("limits")
+                _client = Anthropic(**options, http_client=DefaultHttpxClient(limits=limits))
+    return _client
+
+
+def get_async_client():
+    """
+    Returns the process-wide AsyncAnthropic client, configured like get_client().
+
+    The async client must only be used from the worker's event loop.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+
+                options = _client_options(get_settings()['LLM'])
+                limits = options.pop("limits")
+                _async_client = AsyncAnthropic(**options, http_client=DefaultAsyncHttpxClient(limits=limits))
+    return _async_client
+
+
+def fix_resume_line(line):
+    """Replaces a "-" at the beginning of a single line with a bullet point symbol."""
+    if line.startswith("-"):
+        return "• " + line[1:]
+    return line
+
+
+def split_resume_lines(text, final=True):
+    """
+    Splits text into lines at the line boundaries of str.splitlines.
+
+    Args:
+        text: The text, or the part of a streamed text received so far.
+        final: False while more text may follow: the last line is then held back if it may
+            still be continued (it has no line break yet, or ends with a "\r" that a "\n"
+            may follow).
+
+    Returns:
+        tuple: The complete lines without their line breaks, and the text held back.
+    """
+    lines = text.splitlines(keepends=True)
+    rest = ""
+    if not final and lines and (lines[-1].endswith("\r") or lines[-1].splitlines()[0] == lines[-1]):
+        rest = lines.pop()
+    return [line.splitlines()[0] for line in lines], rest
 
 
 def fix_resume_bullets(resume_text):
@@ -23,69 +134,142 @@ def fix_resume_bullets(resume_text):
     Returns:
         The text of the resume with fixed bullet points.
     """
-    lines = resume_text.splitlines()
-    fixed_lines = []
-    for line in lines:
-        if line.startswith("-"):
-            fixed_lines.append("• " + line[1:])
-        else:
-            fixed_lines.append(line)
-    return "\n".join(fixed_lines)
+    lines, _ = split_resume_lines(resume_text)
+    return "\n".join(fix_resume_line(line) for line in lines)
 
 
-def generate_resume(candidate_info):
+def resume_cache_key(candidate_info):
     """
-    Generates a resume using Anthropic's Claude LLM.
+    Returns the resume cache key of a candidate for the current prompt, model and parameters.
+    """
+    options = generation_options(build_prompt_message(candidate_info)["content"])
+    return make_cache_key(candidate_info, PROMPT_VERSION, options["model"],
+                          {"max_tokens": options["max_tokens"], "temperature": options["temperature"]})
+
+
+def generation_options(prompt):
+    """
+    Returns the model, max_tokens and temperature of a generation for the candidate prompt.
+
+    The model comes from the optional LLM MODEL setting, and max_tokens from the one-page
+    output budget of the prompt's size (see latency_budget.py).
+    """
+    return {
+        "max_tokens": output_token_budget(prompt, MAX_TOKENS),
+        "model": get_section('LLM').get('MODEL', fallback=MODEL),
+        "temperature": TEMPERATURE,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def resume_instructions(version=PROMPT_VERSION):
+    """
+    Returns the fixed resume instructions of a prompt version, read from prompts/ once per process.
+    """
+    with open(os.path.join(PROMPT_DIR, f"resume_v{version}.txt"), encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def build_system_prompt():
+    """
+    Builds the system prompt holding the instructions shared by every resume.
+
+    The instructions are the same for every candidate, so they are sent once as the system
+    prompt, and the user message only carries the candidate's information.
+
+    Returns:
+        str: The system prompt.
+    """
+    return resume_instructions()
+
+
+def build_prompt_message(candidate_info):
+    """
+    Builds the user message holding the candidate's information, the part of the prompt that
+    changes with every resume.
 
     Args:
-        candidate_info: A dictionary containing the applicant's information.
+        candidate_info: The applicant's information, a Candidate (or a dict or JSON string).
 
     Returns:
-        The generated resume as a string.
+        The prompt message dictionary.
+    """
+    # Serialize the candidate once, as compact JSON without empty fields
+    candidate_info_json = serialize_candidate(candidate_info)
+    return {"role": "user", "content": f"Applicant information:\n{candidate_info_json}"}
+
+
+def build_message_params(candidate_info):
+    """
+    Returns the Messages API parameters of a resume generation for the candidate.
+    """
+    message = build_prompt_message(candidate_info)
+    return {
+        "system": build_system_prompt(),
+        "messages": [message],
+        **generation_options(message["content"]),
+    }
+
+
+def usage_summary(usage):
     """
+    Returns:
+        dict: The input and output token counts of a response's usage.
+    """
+    return {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}
+
 
-    # Read configuration from config.ini
-    config = configparser.ConfigParser()
-    config.read('config.ini')
+def _check_complete(stop_reason, usage):
+    """Raises ResumeTruncatedError if the answer was cut off by max_tokens."""
+    if stop_reason == "max_tokens":
+        logging.warning(f"Resume cut off at max_tokens={usage.output_tokens}, "
+                        f"raise LATENCY MIN_OUTPUT_TOKENS or ONE_PAGE_TOKENS if this happens often")
+        raise ResumeTruncatedError(f"Resume was cut off at {usage.output_tokens} tokens")
 
-    # Get Anthropic api key
-    api_key = config['LLM']['ANTHROPIC_KEY']
 
-    client = Anthropic(
-        api_key=api_key,
-    )
+def _log_response(response):
+    """Records the token usage of a response, raising ResumeTruncatedError if it was cut off."""
+    record_usage(response.usage)
+    logging.info(f"Resume generated, tokens: {usage_summary(response.usage)}")
+    _check_complete(response.stop_reason, response.usage)
 
-    # Convert candidate info to JSON string
-    candidate_info_json = json.dumps(candidate_info)
 
-    # Define the prompt message
-    prompt = f"""Considering the following applicant information provided in JSON format:
-    {candidate_info_json} 
-    Craft a compelling, one-page resume that showcases their diverse skills and accomplishments. Utilize a professional template and highlight transferable skills throughout the resume, demonstrating their value across various industries and positions.
+def _create(client, params, deadline):
+    """Makes one API call, bounded by the time left in the latency budget."""
+    start = time.monotonic()
+    try:
+        response = client.messages.create(**params, timeout=remaining(deadline))
+    except Exception as e:
+        raise_if_expired(deadline, e)
+        raise
+    record_latency(params["model"], time.monotonic() - start)
+    return response
 
-    Here's what you should leverage from the JSON data:
 
-    Personal Information: Name, contact details (phone, email, optional: LinkedIn profile URL)
-    Skills: List of hard skills (software proficiency, technical skills) and soft skills (communication, leadership)
-    Work History:
-    Company Name, Start & End Dates, Job Title
-    Key Achievements (quantify results whenever possible using numbers, percentages, etc.)
-    Education Background: University Name, Degree Obtained, Relevant Coursework or Projects (optional)
-    Incorporating Transferable Skills:
+async def _create_async(client, params, deadline):
+    start = time.monotonic()
+    try:
+        response = await client.messages.create(**params, timeout=remaining(deadline))
+    except Exception as e:
+        raise_if_expired(deadline, e)
+        raise
+    record_latency(params["model"], time.monotonic() - start)
+    return response
+
+
+def generate_resume(candidate_info):
+    """
+    Generates a resume using Anthropic's Claude LLM.
 
-    Analyze the applicant's work history and education to identify transferable skills that are valuable across different fields.
-    Instead of a separate section, seamlessly integrate these transferable skills into the descriptions of each job experience. Highlight how these skills were utilized to achieve accomplishments.
-    Polishing the Resume:
+    Args:
+        candidate_info: The applicant's information, see build_prompt_message.
 
-    Maintain a clear and concise format with easy-to-read fonts and headings and bullet point lists.
-    Employ strong action verbs to describe accomplishments.
-    Remove the "Transferable Skills and Suggestions" and "Additional Information" sections. Their content should be incorporated into the existing sections.
-    Proofread meticulously for any grammatical errors or typos.
-    By following these guidelines and leveraging the applicant's JSON data, generate a comprehensive and finished professional resume that positions them as a strong candidate for various opportunities.
-    Return the resume in text format.
+    Returns:
+        The generated resume as a string.
     """
 
-    prompt_message = {"role": "user", "content": prompt}
+    # Reuse the process-wide client and its open connections
+    client = get_client()
 
     # Availalble Claude 3 models
     # Claude 3 Opus	    claude-3-opus-20240229
@@ -96,13 +280,102 @@ def generate_resume(candidate_info):
     #                   Fastest and most compact model, designed for near-instant responsiveness and seamless AI experiences that mimic human interactions
 
     # Send the prompt to Claude and get the response
-    response = client.messages.create(
-        messages=[prompt_message],
-        max_tokens=4096,
-        model="claude-3-haiku-20240307",
-        temperature=1.0,
-    )
+    params = build_message_params(candidate_info)
+    deadline = new_deadline()
+    with span("llm"):
+        # The governor admits the call within the rate limits and retries throttled calls
+        # while they fit in the latency budget
+        response = get_governor().call(lambda: _create(client, params, deadline), estimate_tokens(params),
+                                       deadline=deadline)
+    _log_response(response)
 
-    resume = fix_resume_bullets(response.content[0].text)
+    with span("fix_bullets"):
+        resume = fix_resume_bullets(response.content[0].text)
 
     return resume
+
+
+async def generate_resume_async(candidate_info):
+    """
+    Generates a resume using Anthropic's Claude LLM without blocking the event loop.
+
+    A slow call is hedged with a second request, see latency_budget.run_hedged.
+
+    Args:
+        candidate_info: The applicant's information, see build_prompt_message.
+
+    Returns:
+        The generated resume as a string.
+    """
+    client = get_async_client()
+    params = build_message_params(candidate_info)
+    governor = get_governor()
+    deadline = new_deadline()
+
+    async def call(model):
+        model_params = dict(params, model=model)
+        return await governor.call_async(lambda: _create_async(client, model_params, deadline),
+                                         estimate_tokens(model_params), deadline=deadline)
+
+    with span("llm"):
+        response = await run_hedged(call, params["model"], deadline, can_hedge=governor.has_capacity)
+    _log_response(response)
+
+    with span("fix_bullets"):
+        return fix_resume_bullets(response.content[0].text)
+
+
+def generate_resume_stream(candidate_info):
+    """
+    Generates a resume using Anthropic's Claude LLM, yielding it line by line as it arrives.
+
+    Bullet points are fixed on each completed line, so the streamed text matches what
+    generate_resume would return.
+
+    Args:
+        candidate_info: The applicant's information, see build_prompt_message.
+
+    Yields:
+        dict: {"type": "text", "text": ...} events for each completed line, followed by one
+        {"type": "done", "resume": ..., "usage": {...}} event with the full resume. If the
+        resume was cut off at max_tokens, ResumeTruncatedError is raised instead of the
+        "done" event.
+    """
+    client = get_client()
+
+    lines = []
+    pending = ""
+    start = time.perf_counter()
+    first_text = True
+    params = build_message_params(candidate_info)
+    deadline = new_deadline()
+    # Text already sent cannot be taken back, so a stream is admitted but neither retried nor hedged
+    with span("llm"), get_governor().slot(estimate_tokens(params), deadline=deadline) as call, \
+            client.messages.stream(**params, timeout=remaining(deadline)) as stream:
+        for text in stream.text_stream:
+            # The timeout bounds each read; a slow but steady stream is stopped here
+            remaining(deadline)
+            if first_text:
+                observe("llm_first_text", (time.perf_counter() - start) * 1000)
+                first_text = False
+            complete, pending = split_resume_lines(pending + text, final=False)
+            if complete:
+                fixed = [fix_resume_line(line) for line in complete]
+                lines.extend(fixed)
+                yield {"type": "text", "text": "\n".join(fixed) + "\n"}
+        message = stream.get_final_message()
+        call["usage"] = message.usage
+    record_usage(message.usage)
+    _check_complete(message.stop_reason, message.usage)
+
+    rest, _ = split_resume_lines(pending)
+    if rest:
+        fixed = [fix_resume_line(line) for line in rest]
+        lines.extend(fixed)
+        yield {"type": "text", "text": "\n".join(fixed)}
+
+    yield {
+        "type": "done",
+        "resume": "\n".join(lines),
+        "usage": usage_summary(message.usage),
+    }
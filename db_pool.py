@@ -0,0 +1,239 @@
+"""
+Process-wide MySQL connection pool for the Incognito Careers database.
+
+The Azure Functions worker keeps the Python process alive between invocations, so a pool
+created at module level survives across requests served by the same worker. Each request
+checks a connection out of the pool instead of paying a full TCP, auth and database
+handshake against the remote cPanel MySQL host.
+
+mysql.connector is only imported once the first connection is opened, so it does not add to
+the worker's cold start. The pool is created lazily on first use from the DATABASE settings (see settings.py):
+
+    POOL_SIZE                  Maximum number of open connections (default 4).
+    POOL_TIMEOUT               Seconds to wait for a free connection (default 10).
+    POOL_HEALTH_CHECK_SECONDS  Idle time after which a connection is pinged before
+                               it is handed out (default 30).
+
+"""
+
+import contextlib
+import logging
+import threading
+import time
+
+from metrics import span
+from settings import get_settings
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of mysql.connector connections.
+
+    Connections are opened on demand up to `size`. Idle connections are health checked
+    with a ping before they are reused and transparently reopened when they have gone
+    stale (for example after the server's wait_timeout closed them).
+    """
+
+    def __init__(self, size, connect_args, timeout=10.0, health_check_seconds=30.0):
+        """
+        Args:
+            size (int): Maximum number of connections held open by the pool.
+            connect_args (dict): Keyword arguments passed to mysql.connector.connect().
+            timeout (float): Seconds to wait for a connection when the pool is exhausted.
+            health_check_seconds (float): Idle seconds after which a connection is pinged.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.size = size
+        self.timeout = timeout
+        self.health_check_seconds = health_check_seconds
+        # Autocommit keeps each SELECT out of a long-lived REPEATABLE READ snapshot,
+        # otherwise a reused connection would keep returning stale postmeta rows.
+        self._connect_args = dict(connect_args, autocommit=True)
+        # Idle connections as (connection, idle since), the most recently used last
+        self._idle = []
+        self._lock = threading.Lock()
+        # Notified whenever a connection is returned or a slot is freed
+        self._available = threading.Condition(self._lock)
+        self._created = 0
+        self._in_use = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "reconnects": 0,
+            "connects": 0,
+            "discarded": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _connect(self):
+        import mysql.connector
+
+        cnx = mysql.connector.connect(**self._connect_args)
+        self._count("connects")
+        return cnx
+
+    def _release_slot(self):
+        """Frees the slot of a closed connection and wakes a caller waiting for one."""
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def _check_health(self, cnx, idle_since):
+        """
+        Pings a connection that has been idle for too long and reconnects it if stale.
+
+        Returns:
+            A usable connection (the same object, reconnected if necessary).
+        """
+        if time.monotonic() - idle_since < self.health_check_seconds:
+            return cnx
+        from mysql.connector import errors
+
+        try:
+            cnx.ping(reconnect=False)
+            return cnx
+        except errors.Error:
+            logging.info("Stale pooled MySQL connection, reconnecting")
+            self._count("reconnects")
+            with contextlib.suppress(Exception):
+                cnx.close()
+            return self._connect()
+
+    def acquire(self):
+        """
+        Checks a connection out of the pool.
+
+        Raises:
+            mysql.connector.errors.PoolError: If no connection becomes free within the timeout.
+        """
+        self._count("checkouts")
+        deadline = None
+        with self._available:
+            while True:
+                if self._idle:
+                    cnx, idle_since = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    # Reserve a slot and open the connection outside the lock
+                    self._created += 1
+                    cnx = None
+                    break
+                if deadline is None:
+                    self._stats["waits"] += 1
+                    deadline = time.monotonic() + self.timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    from mysql.connector import errors
+
+                    raise errors.PoolError(
+                        f"No MySQL connection available after {self.timeout}s (pool size {self.size})")
+                self._available.wait(remaining)
+
+        try:
+            cnx = self._connect() if cnx is None else self._check_health(cnx, idle_since)
+        except Exception:
+            self._release_slot()
+            raise
+        with self._lock:
+            self._in_use += 1
+        return cnx
+
+    def release(self, cnx, discard=False):
+        """
+        Returns a connection to the pool.
+
+        Args:
+            cnx: A connection obtained from acquire().
+            discard (bool): Close the connection instead of reusing it (e.g. after an error).
+        """
+        with self._lock:
+            self._in_use -= 1
+        # No is_connected() here: it pings the server on every check-in. A connection that
+        # died while idle is caught by the health check at check-out instead.
+        if discard:
+            self._count("discarded")
+            with contextlib.suppress(Exception):
+                cnx.close()
+            self._release_slot()
+            return
+        with self._available:
+            self._idle.append((cnx, time.monotonic()))
+            self._available.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Context manager that checks a connection out and returns it to the pool afterwards.
+        Connections that raised a connection-level error are discarded rather than reused.
+        """
+        from mysql.connector import errors
+
+        with span("db_connect"):
+            cnx = self.acquire()
+        discard = False
+        try:
+            yield cnx
+        except (errors.InterfaceError, errors.OperationalError):
+            discard = True
+            raise
+        finally:
+            self.release(cnx, discard=discard)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Counters and current occupancy, used to size the pool per instance.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(size=self.size, open=self._created, in_use=self._in_use, idle=len(self._idle))
+        return stats
+
+    def close(self):
+        """Closes every idle connection held by the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for cnx, _ in idle:
+            with contextlib.suppress(Exception):
+                cnx.close()
+            self._release_slot()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use from the settings.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db = get_settings()['DATABASE']
+                _pool = ConnectionPool(
+                    size=db.getint('POOL_SIZE', fallback=4),
+                    connect_args={
+                        "user": db['USER'],
+                        "password": db['PASSWORD'],
+                        "host": db['HOST'],
+                        "database": db['DATABASE'],
+                    },
+                    timeout=db.getfloat('POOL_TIMEOUT', fallback=10.0),
+                    health_check_seconds=db.getfloat('POOL_HEALTH_CHECK_SECONDS', fallback=30.0),
+                )
+    return _pool
+
+
+def pool_stats():
+    """
+    Returns:
+        dict: The pool statistics, or an empty dict if the pool has not been created yet.
+    """
+    return _pool.stats() if _pool is not None else {}
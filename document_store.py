@@ -0,0 +1,230 @@
+"""
+Rendering of resume documents and the store they are saved to.
+
+store_documents parses a generated resume once (see resume_document.py), renders each
+requested format in memory (docx_render.py, pdf_render.py) and streams the result to the
+document store, which returns where the document can be downloaded. Documents are named
+after the candidate and a hash of the resume text and the renderer version, so a resume that
+was already rendered (for example one served from the resume cache) is not rendered again.
+
+Two stores implement the same interface:
+
+    blob    Azure Blob Storage in the function app's storage account (AzureWebJobsStorage).
+            The container stays private; the store returns the blob URL with a read-only
+            SAS token that expires after LINK_TTL_SECONDS. Asking for a document again
+            signs a fresh link without rendering it again. Needs the azure-storage-blob
+            package and an account key in the connection string.
+    local   A directory on the local file system, for development and tests. Returns the
+            file path.
+
+Settings come from the optional DOCUMENTS section (see settings.py):
+
+    STORE               blob or local (default blob).
+    CONTAINER           Blob container of the blob store (default resumes).
+    LINK_TTL_SECONDS    Lifetime of the download links of the blob store (default 3600).
+    PATH                Directory of the local store (default in the temp dir).
+    DOCX_TEMPLATE       Directory of the unzipped DOCX template (default templates/resume_docx).
+    PDF_FONT            TrueType font of the PDF text (default templates/fonts/DejaVuSans.ttf).
+    PDF_BOLD_FONT       TrueType font of the PDF headings (default templates/fonts/DejaVuSans-Bold.ttf).
+
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+
+from docx_render import CONTENT_TYPE as DOCX_CONTENT_TYPE, render_docx
+from metrics import span
+from pdf_render import CONTENT_TYPE as PDF_CONTENT_TYPE, render_pdf
+from resume_document import parse_resume
+from settings import get_section
+
+# Bump RENDER_VERSION whenever the templates or renderers change, so documents are rendered again
+RENDER_VERSION = "2"
+
+# format: (renderer, content type)
+FORMATS = {
+    "docx": (render_docx, DOCX_CONTENT_TYPE),
+    "pdf": (render_pdf, PDF_CONTENT_TYPE),
+}
+
+
+class DocumentStore(ABC):
+    """Interface of the document stores."""
+
+    @abstractmethod
+    def exists(self, name):
+        """Returns True if a document with that name was saved."""
+
+    @abstractmethod
+    def save(self, name, stream, content_type):
+        """
+        Saves the contents of a readable binary stream as a document.
+
+        Returns:
+            str: Where the document can be retrieved, see location().
+        """
+
+    @abstractmethod
+    def location(self, name):
+        """Returns the URL or path of a document."""
+
+
+class LocalDocumentStore(DocumentStore):
+    """Document store in a local directory."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def location(self, name):
+        """Returns the path of a document, raising ValueError for a name that leaves the root."""
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, *name.split("/")))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Document name {name!r} is outside the document store")
+        return path
+
+    def exists(self, name):
+        return os.path.exists(self.location(name))
+
+    def save(self, name, stream, content_type):
+        path = self.location(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Written next to the target and renamed, so readers never see a partial document
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as f:
+            shutil.copyfileobj(stream, f)
+        os.replace(f.name, path)
+        return path
+
+
+class BlobDocumentStore(DocumentStore):
+    """Document store in an Azure Storage blob container."""
+
+    def __init__(self, connection_string, container_name, link_ttl_seconds=3600):
+        # Imported here so the local store works without the package
+        from azure.core.exceptions import ResourceExistsError
+        from azure.storage.blob import BlobServiceClient
+
+        service = BlobServiceClient.from_connection_string(connection_string)
+        self._account_key = getattr(service.credential, 'account_key', None)
+        if not self._account_key:
+            raise ValueError("The blob document store needs a connection string with an AccountKey to sign links")
+        self.link_ttl_seconds = link_ttl_seconds
+        self._container = service.get_container_client(container_name)
+        try:
+            self._container.create_container()
+        except ResourceExistsError:
+            pass
+
+    def location(self, name):
+        """Returns the URL of a document with a read-only SAS token valid for link_ttl_seconds."""
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        blob = self._container.get_blob_client(name)
+        token = generate_blob_sas(blob.account_name, blob.container_name, blob.blob_name,
+                                  account_key=self._account_key, permission=BlobSasPermissions(read=True),
+                                  expiry=datetime.now(timezone.utc) + timedelta(seconds=self.link_ttl_seconds))
+        return f"{blob.url}?{token}"
+
+    def exists(self, name):
+        return self._container.get_blob_client(name).exists()
+
+    def save(self, name, stream, content_type):
+        from azure.storage.blob import ContentSettings
+
+        self._container.upload_blob(name, stream, overwrite=True,
+                                    content_settings=ContentSettings(content_type=content_type))
+        return self.location(name)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store():
+    """
+    Returns the process-wide document store selected by the DOCUMENTS STORE setting.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                documents = get_section('DOCUMENTS')
+                kind = documents.get('STORE', fallback='blob').lower()
+                if kind == 'local':
+                    _store = LocalDocumentStore(
+                        documents.get('PATH', fallback=os.path.join(tempfile.gettempdir(), 'resume_documents')))
+                elif kind == 'blob':
+                    _store = BlobDocumentStore(os.environ['AzureWebJobsStorage'],
+                                               documents.get('CONTAINER', fallback='resumes'),
+                                               documents.getfloat('LINK_TTL_SECONDS', fallback=3600))
+                else:
+                    raise ValueError(f"Unknown document store: {kind!r}")
+    return _store
+
+
+def validate_formats(formats):
+    """
+    Returns:
+        list: The requested document formats, without duplicates. Raises ValueError for a
+        format that cannot be rendered.
+    """
+    if not isinstance(formats, list):
+        raise ValueError("'formats' must be a list, e.g. [\"docx\", \"pdf\"]")
+    unknown = [name for name in formats if name not in FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown document formats {unknown}, expected some of {sorted(FORMATS)}")
+    return list(dict.fromkeys(formats))
+
+
+def document_name(candidate_id, resume_text, extension):
+    digest = hashlib.sha256(f"{RENDER_VERSION}\n{resume_text}".encode('utf-8')).hexdigest()[:20]
+    return f"{candidate_id}/resume-{digest}.{extension}"
+
+
+def render_document(resume_text, extension, stream, document=None):
+    """
+    Renders resume text to `stream` in one of the FORMATS, parsing it unless `document` (its
+    ResumeDocument) is given.
+    """
+    renderer, _ = FORMATS[extension]
+    renderer(document or parse_resume(resume_text), stream)
+
+
+def store_documents(candidate_id, resume_text, formats, store=None):
+    """
+    Renders a resume in the requested formats and saves the documents.
+
+    Args:
+        candidate_id: The candidate the resume belongs to.
+        resume_text (str): The resume returned by generate_resume.
+        formats (list): Extensions from FORMATS, see validate_formats().
+        store (DocumentStore): The store to save to, by default get_document_store().
+
+    Returns:
+        dict: The location of each document by format.
+    """
+    store = store or get_document_store()
+    document = None
+    locations = {}
+    for extension in formats:
+        name = document_name(candidate_id, resume_text, extension)
+        if store.exists(name):
+            locations[extension] = store.location(name)
+            continue
+        if document is None:
+            with span("parse_resume"):
+                document = parse_resume(resume_text)
+        stream = io.BytesIO()
+        with span(f"render_{extension}"):
+            render_document(resume_text, extension, stream, document)
+        stream.seek(0)
+        with span("store_document"):
+            locations[extension] = store.save(name, stream, FORMATS[extension][1])
+    return locations
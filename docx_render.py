@@ -0,0 +1,95 @@
+"""
+In-memory Word (DOCX) rendering of a parsed resume.
+
+A DOCX file is a zip of XML parts. The template is the unzipped package in
+templates/resume_docx: its styles (Title, Contact, Heading1, ListBullet), bullet numbering and
+page setup are read once per worker, and word/document.xml is split at its <!--BODY-->
+marker. Rendering a resume only builds the body paragraphs and zips the parts into the
+output stream, without touching the file system.
+
+Set the DOCUMENTS DOCX_TEMPLATE setting to the directory of another unzipped template with
+the same style IDs and marker to change the look of the documents.
+
+"""
+
+import functools
+import os
+import zipfile
+from xml.sax.saxutils import escape
+
+from resume_document import BULLET
+from settings import get_section
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "resume_docx")
+BODY_MARKER = "<!--BODY-->"
+CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# Fixed timestamp of the zip entries, so the same resume always renders to the same bytes
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+class DocxTemplate:
+    """The parts of a DOCX template, with the document part split around its body."""
+
+    def __init__(self, directory):
+        self.parts = {}
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                with open(path, 'rb') as f:
+                    self.parts[os.path.relpath(path, directory).replace(os.sep, "/")] = f.read()
+        document = self.parts.pop("word/document.xml").decode('utf-8')
+        if BODY_MARKER not in document:
+            raise ValueError(f"DOCX template {directory} has no {BODY_MARKER} marker in word/document.xml")
+        head, tail = document.split(BODY_MARKER, 1)
+        self.head, self.tail = head.encode('utf-8'), tail.encode('utf-8')
+        # [Content_Types].xml must be the first entry of the package
+        self.order = sorted(self.parts, key=lambda name: name != "[Content_Types].xml")
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(directory):
+    return DocxTemplate(directory)
+
+
+def get_template():
+    """Returns the DOCX template of the DOCX_TEMPLATE setting, parsed once per worker."""
+    return load_template(get_section('DOCUMENTS').get('DOCX_TEMPLATE', fallback=TEMPLATE_DIR))
+
+
+def _paragraph(text, style=None):
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p>{properties}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def render_body(document):
+    """
+    Returns:
+        str: The WordprocessingML paragraphs of a ResumeDocument.
+    """
+    paragraphs = []
+    if document.name:
+        paragraphs.append(_paragraph(document.name, "Title"))
+    paragraphs.extend(_paragraph(line, "Contact") for line in document.contact)
+    for section in document.sections:
+        if section.heading:
+            paragraphs.append(_paragraph(section.heading, "Heading1"))
+        for block in section.blocks:
+            paragraphs.append(_paragraph(block.text, "ListBullet" if block.kind == BULLET else None))
+    return "".join(paragraphs)
+
+
+def render_docx(document, stream):
+    """
+    Writes a ResumeDocument to `stream` as a DOCX file.
+
+    Args:
+        document (ResumeDocument): The parsed resume.
+        stream: A writable binary file object, such as io.BytesIO.
+    """
+    template = get_template()
+    body = render_body(document).encode('utf-8')
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as package:
+        for name in template.order:
+            package.writestr(zipfile.ZipInfo(name, ZIP_DATE), template.parts[name], zipfile.ZIP_DEFLATED)
+        package.writestr(zipfile.ZipInfo("word/document.xml", ZIP_DATE), template.head + body + template.tail,
+                         zipfile.ZIP_DEFLATED)
@@ -5,51 +5,277 @@ To test locally, run the following in PowerShell:
     $response = Invoke-RestMethod -Uri "http://localhost:7071/api/http_incognito" -Method Post -Body $body -ContentType "application/json"
     $response
 
+A resume is served from the resume cache when the candidate's data, the prompt and the model
+settings are unchanged. Add bypassCache = $true to the body to force a fresh generation.
+Concurrent requests for the same candidate share one postmeta fetch, and one LLM generation
+when their data is the same (see singleflight.py). When the Anthropic API keeps rate limiting
+the app (see llm_governor.py), the route answers 503 with a Retry-After header instead of an
+error message. Every generation has a latency budget (see latency_budget.py): the route answers
+504 when it runs out, and hedges a slow LLM call with a second request.
+
+To regenerate resumes for several candidates at once, post a list of IDs to the batch route.
+It returns one JSON line per candidate (NDJSON) in the order the resumes finish:
+
+    $body = @{candidateIds = @(475, 476, 477)} | ConvertTo-Json
+    Invoke-RestMethod -Uri "http://localhost:7071/api/http_incognito_batch" -Method Post -Body $body -ContentType "application/json"
+
+To watch a resume being written, use the streaming route. It sends NDJSON events as the text
+arrives: {"event": "chunk", "text": ...} lines followed by one {"event": "summary", ...} line:
+
+    curl -N -X POST http://localhost:7071/api/http_incognito_stream -d '{"candidateId": 475}'
+
+Clients that cannot hold a connection open for the whole generation can submit a job instead.
+The jobs route answers 202 with a job ID at once and queues the work for a queue-triggered
+worker; poll the status URL until the status is succeeded or failed (see jobs.py for the job
+store and the optional callback to WordPress):
+
+    $job = Invoke-RestMethod -Uri "http://localhost:7071/api/jobs" -Method Post -Body $body -ContentType "application/json"
+    Invoke-RestMethod -Uri "http://localhost:7071$($job.statusUrl)"
+
+Every stage of the pipeline is timed. The single-candidate route reports its stages in a
+Server-Timing response header, and the metrics route (function key required) returns p50/p95/p99
+per stage together with the DB pool, resume cache and candidate cache statistics:
+
+    curl "http://localhost:7071/api/metrics?code=<function key>"
+
+Add formats = @("docx", "pdf") to the body of the single-candidate or jobs route to also get
+the resume as Word and PDF documents. They are rendered in memory and saved to the document
+store (see document_store.py); the response lists their download links under "documents".
+If the documents cannot be rendered or stored, the resume text is still returned and the
+failure is reported under "documents_error".
+
+Set METRICS__PAYLOAD_LOG_SAMPLE_RATE (0 to 1) to log candidate data and resume text for a
+sample of requests; by default they are only logged at DEBUG level.
+
+The anthropic SDK, mysql.connector and phpserialize are imported on first use rather than at
+load, to shorten cold starts. The warmup route (function key required) initializes the LLM
+client, the settings and a pooled DB connection ahead of the first real request and returns
+how long each took. Set the WARMUP_SCHEDULE app setting (NCRONTAB) to do the same from a timer,
+which also runs when an instance starts, or WARMUP_ON_SCALE_OUT=true on Premium plans to use
+the built-in warmup trigger.
+
+Set PREGENERATE_SCHEDULE (NCRONTAB) to regenerate, in the background, the resumes of candidates
+whose postmeta changed (see pregenerate.py). The results go into the resume cache, whose
+shared tier makes them available to every instance, so the next request for an unchanged
+candidate is answered without waiting for the LLM.
+
+Streaming uses the Azure Functions HTTP streams extension, so every HTTP route in this app
+takes a FastAPI Request and returns a FastAPI Response.
+
 """
 
+import asyncio
 import json
 import logging
+import math
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import azure.functions as func
-# Import the parse_postmeta and create_resume modules
-from parse_postmeta import get_candidate_data
-from create_resume import generate_resume
+from azurefunctions.extensions.http.fastapi import PlainTextResponse, Request, Response, StreamingResponse
+# Import the parse_postmeta and create_resume modules. Their heavy dependencies (the anthropic
+# SDK, mysql.connector, phpserialize) are only imported on first use, see warm_up()
+from pregenerate import pregenerate
+from parse_postmeta import fetch_postmeta_rows, get_candidate_data, parse_candidate_rows
+from create_resume import (generate_resume, generate_resume_async, generate_resume_stream, get_async_client,
+                           resume_cache_key)
+from candidate_cache import candidate_cache_stats
+from db_pool import get_pool, pool_stats
+from document_store import store_documents, validate_formats
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, get_job_store, new_job, send_callback
+from latency_budget import LLMDeadlineError, latency_stats
+from llm_governor import LLMThrottledError, governor_stats
+from metrics import RequestTimer, log_payload, observe, snapshot, span
+from resume_cache import get_resume_cache, resume_cache_stats
+from settings import get_settings
+from singleflight import candidate_fetches, coalescing_stats, generations
 
 sys.path.insert(0, os.path.dirname(__file__))
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 
+# Number of resumes generated in parallel by the batch route, and the largest accepted batch
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CANDIDATES = int(os.environ.get("BATCH_MAX_CANDIDATES", "500"))
 
-@app.route(route="http_incognito")
-def http_incognito(req: func.HttpRequest) -> func.HttpResponse:
-    logging.info('Python HTTP trigger function processed a request.')
+# Storage queue that carries resume jobs from the jobs route to the worker, and the number of
+# deliveries of a job after which a failing generation is given up
+JOBS_QUEUE = os.environ.get("JOBS_QUEUE", "resume-jobs")
+JOBS_MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", "5"))
 
-    try:
-        req_body = req.get_json()
-    except ValueError:
-        logging.error("Failed to parse request body as JSON")
-        return func.HttpResponse("Invalid request body", status_code=400)
+# NCRONTAB schedule of the warm-up timer, e.g. "0 */5 * * * *"; unset disables the timer
+WARMUP_SCHEDULE = os.environ.get("WARMUP_SCHEDULE")
+# Register the warmup trigger that Premium and Dedicated plans run on every new instance
+WARMUP_ON_SCALE_OUT = os.environ.get("WARMUP_ON_SCALE_OUT", "").lower() in ("1", "true", "yes")
+# NCRONTAB schedule of the resume pre-generation timer, e.g. "0 */10 * * * *"; unset disables it
+PREGENERATE_SCHEDULE = os.environ.get("PREGENERATE_SCHEDULE")
+
+
+def _generate_and_store(resume_data, key, cache):
+    resume_document = generate_resume(resume_data)
+    if cache is not None:
+        cache.put(key, resume_document)
+    return resume_document
+
+
+def generate_resume_cached(resume_data, bypass_cache=False):
+    """
+    Returns the candidate's resume from the resume cache, generating it on a miss.
+    Concurrent calls for the same input share one generation.
+
+    Args:
+        resume_data: The candidate data returned by get_candidate_data.
+        bypass_cache (bool): Always generate a fresh resume (and refresh the cache with it).
+
+    Returns:
+        tuple: The resume text and whether it came from the cache.
+
+    Raises:
+        ValueError: If resume_data is the error dict of an incomplete candidate.
+    """
+    if isinstance(resume_data, dict):
+        # Never ask the LLM for a resume of an error message
+        raise ValueError(resume_data['error'])
+
+    cache = get_resume_cache()
+    key = resume_cache_key(resume_data)
+    if cache is not None:
+        if bypass_cache:
+            cache.record_bypass()
+        else:
+            with span("cache_lookup"):
+                resume_document = cache.get(key)
+            if resume_document is not None:
+                return resume_document, True
+
+    return generations.run(key, _generate_and_store, resume_data, key, cache), False
+
+
+async def _generate_and_store_async(resume_data, key, cache):
+    resume_document = await generate_resume_async(resume_data)
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, resume_document)
+    return resume_document
+
+
+async def generate_resume_cached_async(resume_data, bypass_cache=False):
+    """
+    Async counterpart of generate_resume_cached, awaiting the LLM on the event loop.
+
+    Returns:
+        tuple: The resume text and whether it came from the cache.
+    """
+    if isinstance(resume_data, dict):
+        raise ValueError(resume_data['error'])
+
+    cache = await asyncio.to_thread(get_resume_cache)
+    key = resume_cache_key(resume_data)
+    if cache is not None:
+        if bypass_cache:
+            cache.record_bypass()
+        else:
+            with span("cache_lookup"):
+                resume_document = await asyncio.to_thread(cache.get, key)
+            if resume_document is not None:
+                return resume_document, True
+
+    return await generations.run_async(key, _generate_and_store_async, resume_data, key, cache), False
 
-    logging.info(f"Received data: {req_body}")
 
+def _parse_candidate_id(req_body):
+    """
+    Returns the candidateId of a request body as an integer.
+
+    Raises:
+        ValueError: If the candidateId is missing or not an integer.
+    """
     candidate_id = req_body.get('candidateId')
-    if candidate_id:
+    if not candidate_id:
+        logging.error("Missing 'candidateId' in request body")
+        raise ValueError("Missing 'candidateId' in request body")
+    try:
+        # Also names the stored documents, so it must not carry a path
+        return int(candidate_id)
+    except (TypeError, ValueError):
+        raise ValueError("'candidateId' must be an integer") from None
+
+
+async def _create_resume_response(req_body):
+    """
+    Runs the single-candidate pipeline for a parsed request body.
+
+    Returns:
+        Response: The JSON response with a Server-Timing header, a 503 response with a
+        Retry-After header when the LLM is throttled, a 504 response when the generation ran
+        out of its latency budget, or a 400 response for a missing or non-integer candidateId
+        or an unknown document format.
+    """
+    try:
+        candidate_id = _parse_candidate_id(req_body)
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+    try:
+        formats = validate_formats(req_body.get('formats', []))
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+
+    status_code = 200
+    headers = {}
+    with RequestTimer("http_incognito") as timer:
         try:
-            # Call the parse_postmeta function and pass the candidate_id
-            resume_data = get_candidate_data(candidate_id)
-            logging.info(f"Resume json: {resume_data}")
+            # Fetch the candidate on a worker thread while the LLM client and the resume
+            # cache are initialized, so a cold worker pays for them in parallel
+            resume_data, _, _ = await asyncio.gather(
+                # Concurrent requests for the same candidate share one fetch
+                candidate_fetches.run_async(str(candidate_id), asyncio.to_thread, get_candidate_data, candidate_id),
+                asyncio.to_thread(get_async_client),
+                asyncio.to_thread(get_resume_cache),
+            )
+            log_payload("Resume json", resume_data)
+            if isinstance(resume_data, dict):
+                # Missing mandatory fields: report them instead of generating a resume
+                raise ValueError(resume_data['error'])
 
             # Call the create_resume function to generate the resume document
-            resume_document = generate_resume(resume_data)
-            logging.info(f"Resume text: {resume_document}")
+            resume_document, cached = await generate_resume_cached_async(
+                resume_data, bypass_cache=bool(req_body.get('bypassCache')))
+            log_payload("Resume text", resume_document)
 
             response = {
                 "version": 'Python %s\n' % sys.version.split()[0],
                 "output": resume_document,
+                "cached": cached,
                 "message": "Resume successfully created."
             }
+            if formats:
+                try:
+                    # Rendering is CPU-bound, keep it off the event loop
+                    response["documents"] = await asyncio.to_thread(
+                        store_documents, candidate_id, resume_document, formats)
+                except Exception as e:
+                    # The resume itself succeeded, so it is still returned
+                    logging.error(f"Error storing documents for candidate {candidate_id}: {e}")
+                    response["documents_error"] = f"Error: {e}"
+        except LLMThrottledError as e:
+            # Tell the client to come back later instead of reporting a failed generation
+            logging.warning(f"LLM throttled for candidate {candidate_id}: {e}")
+            response = {
+                "version": 'Python %s\n' % sys.version.split()[0],
+                "output": None,
+                "message": f"Error: {e}",
+            }
+            headers["Retry-After"] = str(math.ceil(e.retry_after or 1))
+            status_code = 503
+        except LLMDeadlineError as e:
+            logging.warning(f"Latency budget exceeded for candidate {candidate_id}: {e}")
+            response = {
+                "version": 'Python %s\n' % sys.version.split()[0],
+                "output": None,
+                "message": f"Error: {e}",
+            }
+            status_code = 504
         except Exception as e:
             logging.error(f"Error in parse_postmeta: {e}")
             response = {
@@ -58,14 +284,342 @@ def http_incognito(req: func.HttpRequest) -> func.HttpResponse:
                 # Update message to reflect the actual error
                 "message": f"Error: {e}",
             }
-    else:
-        logging.error("Missing 'candidateId' in request body")
-        return func.HttpResponse("Missing 'candidateId' in request body", status_code=400)
 
-    json_response = json.dumps(response)
+        json_response = json.dumps(response)
+        timer.log(candidateId=candidate_id, cached=response.get("cached", False),
+                  succeeded=response["output"] is not None)
+
+        headers["Server-Timing"] = timer.server_timing()
+        return Response(
+            json_response,
+            status_code=status_code,
+            media_type="application/json",
+            headers=headers,
+        )
+
+
+@app.route(route="http_incognito")
+async def http_incognito(req: Request) -> Response:
+    logging.info('Python HTTP trigger function processed a request.')
+
+    try:
+        req_body = await req.json()
+    except ValueError:
+        logging.error("Failed to parse request body as JSON")
+        return PlainTextResponse("Invalid request body", status_code=400)
+
+    logging.info(f"Received data: {req_body}")
+
+    return await _create_resume_response(req_body)
+
+
+def _stream_resume_events(candidate_id, bypass_cache=False):
+    """
+    Runs the single-candidate pipeline, streaming the resume as it is generated.
+
+    Yields:
+        str: NDJSON lines, {"event": "chunk"} events followed by one {"event": "summary"}.
+    """
+    # The chunks are produced on varying worker threads, so only the request total is
+    # recorded here; its stages still feed their histograms
+    start = time.perf_counter()
+    try:
+        yield from _resume_events(candidate_id, bypass_cache)
+    finally:
+        observe("http_incognito_stream_total", (time.perf_counter() - start) * 1000)
+
+
+def _resume_events(candidate_id, bypass_cache):
+    summary = {"event": "summary", "version": 'Python %s\n' % sys.version.split()[0]}
+    try:
+        resume_data = candidate_fetches.run(str(candidate_id), get_candidate_data, candidate_id)
+        if isinstance(resume_data, dict):
+            summary.update(output=None, message=f"Error: {resume_data['error']}")
+            yield json.dumps(summary) + "\n"
+            return
+
+        cache = get_resume_cache()
+        key = resume_cache_key(resume_data) if cache is not None else None
+        if cache is not None:
+            if bypass_cache:
+                cache.record_bypass()
+            else:
+                resume_document = cache.get(key)
+                if resume_document is not None:
+                    yield json.dumps({"event": "chunk", "text": resume_document}) + "\n"
+                    summary.update(output=resume_document, cached=True, message="Resume successfully created.")
+                    yield json.dumps(summary) + "\n"
+                    return
+
+        for event in generate_resume_stream(resume_data):
+            if event["type"] == "text":
+                yield json.dumps({"event": "chunk", "text": event["text"]}) + "\n"
+            else:
+                if cache is not None:
+                    cache.put(key, event["resume"])
+                logging.info(f"Streamed resume for candidate {candidate_id}, usage: {event['usage']}")
+                summary.update(output=event["resume"], cached=False, usage=event["usage"],
+                               message="Resume successfully created.")
+    except Exception as e:
+        logging.error(f"Error streaming resume for candidate {candidate_id}: {e}")
+        summary.update(output=None, message=f"Error: {e}")
+    yield json.dumps(summary) + "\n"
+
+
+@app.route(route="http_incognito_stream")
+async def http_incognito_stream(req: Request) -> Response:
+    logging.info('Python HTTP trigger function processed a streaming request.')
+
+    try:
+        req_body = await req.json()
+    except ValueError:
+        logging.error("Failed to parse request body as JSON")
+        return PlainTextResponse("Invalid request body", status_code=400)
+
+    try:
+        candidate_id = _parse_candidate_id(req_body)
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+
+    # The blocking generator is iterated on a worker thread, one chunk per completed line
+    return StreamingResponse(
+        _stream_resume_events(candidate_id, bypass_cache=bool(req_body.get('bypassCache'))),
+        media_type="application/x-ndjson"
+    )
+
+
+def _generate_candidate_resume(candidate_id, rows, bypass_cache=False):
+    """
+    Parses one candidate's prefetched postmeta rows and generates their resume.
+
+    Returns:
+        dict: The per-candidate result line of the batch response.
+    """
+    with RequestTimer("batch_candidate") as timer:
+        try:
+            resume_data = parse_candidate_rows(rows)
+            if isinstance(resume_data, dict):
+                result = {"candidateId": candidate_id, "output": None, "message": f"Error: {resume_data['error']}"}
+            else:
+                resume_document, cached = generate_resume_cached(resume_data, bypass_cache=bypass_cache)
+                result = {"candidateId": candidate_id, "output": resume_document, "cached": cached,
+                          "message": "Resume successfully created."}
+        except Exception as e:
+            logging.error(f"Error generating resume for candidate {candidate_id}: {e}")
+            result = {"candidateId": candidate_id, "output": None, "message": f"Error: {e}"}
+        timer.log(candidateId=candidate_id, cached=result.get("cached", False),
+                  succeeded=result["output"] is not None)
+    return result
+
+
+def _stream_batch_results(rows_by_candidate, bypass_cache=False):
+    """
+    Parses and generates with bounded concurrency, yielding each result as it completes.
+
+    Yields:
+        str: One NDJSON line per candidate.
+    """
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+        futures = [executor.submit(_generate_candidate_resume, candidate_id, rows, bypass_cache)
+                   for candidate_id, rows in rows_by_candidate.items()]
+        for future in as_completed(futures):
+            yield json.dumps(future.result()) + "\n"
+
+
+@app.route(route="http_incognito_batch")
+async def http_incognito_batch(req: Request) -> Response:
+    logging.info('Python HTTP trigger function processed a batch request.')
+
+    try:
+        req_body = await req.json()
+    except ValueError:
+        logging.error("Failed to parse request body as JSON")
+        return PlainTextResponse("Invalid request body", status_code=400)
+
+    candidate_ids = req_body.get('candidateIds')
+    if not isinstance(candidate_ids, list) or not candidate_ids:
+        logging.error("Missing 'candidateIds' in request body")
+        return PlainTextResponse("Missing 'candidateIds' in request body", status_code=400)
+    if len(candidate_ids) > BATCH_MAX_CANDIDATES:
+        return PlainTextResponse(
+            f"At most {BATCH_MAX_CANDIDATES} candidates can be requested at once", status_code=400)
+    try:
+        candidate_ids = [int(candidate_id) for candidate_id in candidate_ids]
+    except (TypeError, ValueError):
+        return PlainTextResponse("'candidateIds' must be a list of integers", status_code=400)
+
+    logging.info(f"Received batch of {len(candidate_ids)} candidates")
+
+    try:
+        # Fetch every candidate's postmeta rows with a few IN queries instead of one query each
+        rows_by_candidate = await asyncio.to_thread(fetch_postmeta_rows, candidate_ids)
+    except Exception as e:
+        logging.error(f"Error fetching postmeta for batch: {e}")
+        return Response(json.dumps({"output": None, "message": f"Error: {e}"}),
+                        status_code=200, media_type="application/json")
+    return StreamingResponse(
+        _stream_batch_results(rows_by_candidate, bypass_cache=bool(req_body.get('bypassCache'))),
+        media_type="application/x-ndjson"
+    )
+
 
-    return func.HttpResponse(
-        json_response,
+@app.route(route="jobs", methods=["POST"])
+@app.queue_output(arg_name="msg", queue_name=JOBS_QUEUE, connection="AzureWebJobsStorage")
+async def http_incognito_submit(req: Request, msg: func.Out[str]) -> Response:
+    logging.info('Python HTTP trigger function processed a job submission.')
+
+    try:
+        req_body = await req.json()
+    except ValueError:
+        logging.error("Failed to parse request body as JSON")
+        return PlainTextResponse("Invalid request body", status_code=400)
+
+    try:
+        candidate_id = _parse_candidate_id(req_body)
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+    try:
+        formats = validate_formats(req_body.get('formats', []))
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+
+    job = new_job(candidate_id)
+    await asyncio.to_thread(get_job_store().create, job)
+    msg.set(json.dumps({"jobId": job["jobId"], "candidateId": candidate_id,
+                        "bypassCache": bool(req_body.get('bypassCache')), "formats": formats}))
+
+    status_url = f"/api/jobs/{job['jobId']}"
+    return Response(
+        json.dumps({"jobId": job["jobId"], "status": QUEUED, "statusUrl": status_url}),
+        status_code=202,
+        media_type="application/json",
+        headers={"Location": status_url, "Retry-After": "5"},
+    )
+
+
+@app.route(route="jobs/{job_id}", methods=["GET"])
+async def http_incognito_job_status(req: Request) -> Response:
+    job = await asyncio.to_thread(get_job_store().get, req.path_params.get("job_id", ""))
+    if job is None:
+        return PlainTextResponse("Unknown job", status_code=404)
+    # Ask pollers to come back later while the job is still pending
+    headers = {"Retry-After": "5"} if job["status"] in (QUEUED, RUNNING) else None
+    return Response(json.dumps(job), status_code=200, media_type="application/json", headers=headers)
+
+
+@app.queue_trigger(arg_name="msg", queue_name=JOBS_QUEUE, connection="AzureWebJobsStorage")
+def resume_job_worker(msg: func.QueueMessage) -> None:
+    """
+    Runs a queued resume job through the single-candidate pipeline and records the result.
+
+    A failed generation is raised back to the queue, which delivers the job again, until
+    JOBS_MAX_ATTEMPTS deliveries have failed; the job is then marked failed. Candidates with
+    missing data fail at once. Finished jobs are sent to the callback URL, if configured.
+    """
+    task = json.loads(msg.get_body().decode('utf-8'))
+    job_id, candidate_id = task["jobId"], task["candidateId"]
+    store = get_job_store()
+    job = store.get(job_id)
+    if job is None or job["status"] in (SUCCEEDED, FAILED):
+        # Deleted, or already finished by an earlier delivery of the same message
+        return
+
+    attempts = msg.dequeue_count or 1
+    store.update(job_id, status=RUNNING, attempts=attempts)
+    with RequestTimer("resume_job") as timer:
+        try:
+            resume_data = candidate_fetches.run(str(candidate_id), get_candidate_data, candidate_id)
+            if isinstance(resume_data, dict):
+                fields = {"status": FAILED, "message": f"Error: {resume_data['error']}"}
+            else:
+                resume_document, cached = generate_resume_cached(resume_data, bypass_cache=task.get("bypassCache"))
+                fields = {"status": SUCCEEDED, "output": resume_document, "cached": cached,
+                          "message": "Resume successfully created."}
+                if task.get("formats"):
+                    try:
+                        fields["documents"] = store_documents(candidate_id, resume_document, task["formats"])
+                    except Exception as e:
+                        logging.error(f"Error storing documents for job {job_id}: {e}")
+                        fields["documents_error"] = f"Error: {e}"
+        except Exception as e:
+            logging.error(f"Error in resume job {job_id} (attempt {attempts}): {e}")
+            if attempts < JOBS_MAX_ATTEMPTS:
+                store.update(job_id, status=QUEUED, message=f"Retrying after error: {e}")
+                raise
+            fields = {"status": FAILED, "message": f"Error: {e}"}
+        timer.log(jobId=job_id, candidateId=candidate_id, status=fields["status"], attempts=attempts)
+
+    store.update(job_id, **fields)
+    send_callback(dict(job, attempts=attempts, **fields))
+
+
+@app.route(route="metrics", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+async def http_metrics(req: Request) -> Response:
+    """
+    Returns the per-stage latency histograms (including the LLM latency per model) and the DB
+    pool, resume cache, candidate cache, LLM governor, latency budget and request coalescing
+    statistics.
+    """
+    return Response(
+        json.dumps({"stages": snapshot(), "db_pool": pool_stats(), "resume_cache": resume_cache_stats(),
+                    "candidate_cache": candidate_cache_stats(), "llm_governor": governor_stats(),
+                    "latency_budget": latency_stats(), "coalescing": coalescing_stats()}),
         status_code=200,
-        mimetype="application/json"
+        media_type="application/json"
     )
+
+
+def _open_db_connection():
+    # Opens (or health checks) one pooled connection, which stays idle in the pool
+    with get_pool().connection():
+        pass
+
+
+def warm_up():
+    """
+    Initializes the settings, the LLM client, the resume cache and one pooled DB connection,
+    importing their dependencies, so the first real request does not pay for them.
+
+    Returns:
+        dict: The milliseconds spent on each component, or the error it raised.
+    """
+    timings = {}
+    for name, initialize in (("settings", get_settings), ("llm_client", get_async_client),
+                             ("resume_cache", get_resume_cache), ("db_connection", _open_db_connection)):
+        start = time.perf_counter()
+        try:
+            initialize()
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            logging.warning(f"Warm-up of {name} failed: {e}")
+            timings[name] = f"Error: {e}"
+    logging.info(f"Warm-up finished: {timings}")
+    return timings
+
+
+@app.route(route="warmup", methods=["GET", "POST"], auth_level=func.AuthLevel.FUNCTION)
+async def http_warmup(req: Request) -> Response:
+    """Pre-initializes the worker, e.g. from a deployment slot swap or an external pinger."""
+    timings = await asyncio.to_thread(warm_up)
+    return Response(json.dumps(timings), status_code=200, media_type="application/json")
+
+
+if WARMUP_SCHEDULE:
+    # run_on_startup also warms every new instance as soon as the host starts
+    @app.timer_trigger(schedule=WARMUP_SCHEDULE, arg_name="timer", run_on_startup=True)
+    async def warmup_timer(timer: func.TimerRequest) -> None:
+        await asyncio.to_thread(warm_up)
+
+
+if WARMUP_ON_SCALE_OUT:
+    @app.warm_up_trigger("warmup")
+    async def warmup_instance(warmup) -> None:
+        await asyncio.to_thread(warm_up)
+
+
+if PREGENERATE_SCHEDULE:
+    @app.timer_trigger(schedule=PREGENERATE_SCHEDULE, arg_name="timer")
+    async def pregenerate_timer(timer: func.TimerRequest) -> None:
+        if timer.past_due:
+            logging.info("Resume pre-generation timer is past due")
+        await asyncio.to_thread(pregenerate)
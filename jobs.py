@@ -0,0 +1,184 @@
+"""
+Store of asynchronous resume jobs.
+
+The jobs route of function_app records a job here and queues it; the queue-triggered worker
+updates it as it runs, and the status route reads it back. A job is a dict:
+
+    {"jobId": "9f1c...", "candidateId": 475, "status": "succeeded", "output": "...",
+     "message": "Resume successfully created.", "attempts": 1, "created": ..., "updated": ...}
+
+with status queued, running, succeeded or failed. Jobs that asked for document formats also
+get the URLs of the rendered documents under "documents", or the reason they could not be
+stored under "documents_error". Two stores implement the same interface:
+
+    table   Azure Table Storage in the function app's storage account (AzureWebJobsStorage),
+            shared by every instance. Needs the azure-data-tables package.
+    sqlite  A local SQLite file, for development and tests. Only the instance that wrote a
+            job can read it, so it must not be used when the app scales out.
+
+Settings come from the optional JOBS section (see settings.py):
+
+    STORE               table or sqlite (default table).
+    TABLE               Table name (default resumejobs).
+    PATH                SQLite file of the sqlite store (default in the temp dir).
+    CALLBACK_URL        URL that receives every finished job as a JSON POST, e.g. a WordPress
+                        REST endpoint. Unset disables callbacks.
+    CALLBACK_SECRET     Key of the HMAC-SHA256 signature sent in the X-Incognito-Signature
+                        header of callbacks.
+    CALLBACK_TIMEOUT    Seconds to wait for the callback URL (default 10).
+
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from abc import ABC, abstractmethod
+
+from settings import get_section
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def new_job(candidate_id):
+    """Returns a queued job for a candidate, with a fresh job ID."""
+    now = time.time()
+    return {"jobId": uuid.uuid4().hex, "candidateId": candidate_id, "status": QUEUED, "output": None,
+            "message": "Resume job queued.", "attempts": 0, "created": now, "updated": now}
+
+
+class JobStore(ABC):
+    """Interface of the job stores."""
+
+    @abstractmethod
+    def create(self, job):
+        """Saves a new job."""
+
+    @abstractmethod
+    def get(self, job_id):
+        """
+        Returns:
+            dict: The job, or None if there is no job with that ID.
+        """
+
+    @abstractmethod
+    def update(self, job_id, **fields):
+        """Overwrites the given fields of a job and refreshes its updated time."""
+
+
+class SQLiteJobStore(JobStore):
+    """Job store in a local SQLite file."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    def create(self, job):
+        with self._lock:
+            self._db.execute("INSERT INTO jobs (job_id, data) VALUES (?, ?)", (job["jobId"], json.dumps(job)))
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                raise KeyError(job_id)
+            job = dict(json.loads(row[0]), **fields, updated=time.time())
+            self._db.execute("UPDATE jobs SET data = ? WHERE job_id = ?", (json.dumps(job), job_id))
+
+
+class TableJobStore(JobStore):
+    """Job store in an Azure Storage table, one entity per job partitioned by job ID."""
+
+    def __init__(self, connection_string, table_name):
+        # Imported here so the sqlite store works without the package
+        from azure.data.tables import TableServiceClient
+
+        service = TableServiceClient.from_connection_string(connection_string)
+        self._table = service.create_table_if_not_exists(table_name)
+
+    def create(self, job):
+        self._table.create_entity({"PartitionKey": job["jobId"], "RowKey": "job", "data": json.dumps(job)})
+
+    def get(self, job_id):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            entity = self._table.get_entity(partition_key=job_id, row_key="job")
+        except ResourceNotFoundError:
+            return None
+        return json.loads(entity["data"])
+
+    def update(self, job_id, **fields):
+        # Each job is written by one worker at a time, so read-modify-write is safe
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        job.update(fields, updated=time.time())
+        self._table.upsert_entity({"PartitionKey": job_id, "RowKey": "job", "data": json.dumps(job)})
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """
+    Returns the process-wide job store selected by the JOBS STORE setting.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                jobs = get_section('JOBS')
+                kind = jobs.get('STORE', fallback='table').lower()
+                if kind == 'sqlite':
+                    _store = SQLiteJobStore(
+                        jobs.get('PATH', fallback=os.path.join(tempfile.gettempdir(), 'resume_jobs.sqlite3')))
+                elif kind == 'table':
+                    _store = TableJobStore(os.environ['AzureWebJobsStorage'],
+                                           jobs.get('TABLE', fallback='resumejobs'))
+                else:
+                    raise ValueError(f"Unknown job store: {kind!r}")
+    return _store
+
+
+def send_callback(job):
+    """
+    POSTs a finished job to the CALLBACK_URL setting, if one is configured. Failures are
+    logged and not retried; the caller can still poll the status route.
+    """
+    jobs = get_section('JOBS')
+    url = jobs.get('CALLBACK_URL', fallback='')
+    if not url:
+        return
+    body = json.dumps({key: job.get(key)
+                       for key in ("jobId", "candidateId", "status", "output", "documents", "documents_error",
+                                   "message")})
+    headers = {"Content-Type": "application/json"}
+    secret = jobs.get('CALLBACK_SECRET', fallback='')
+    if secret:
+        signature = hmac.new(secret.encode('utf-8'), body.encode('utf-8'), hashlib.sha256).hexdigest()
+        headers["X-Incognito-Signature"] = f"sha256={signature}"
+    request = urllib.request.Request(url, data=body.encode('utf-8'), headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=jobs.getfloat('CALLBACK_TIMEOUT', fallback=10.0)) as response:
+            logging.info(f"Callback for job {job['jobId']} returned {response.status}")
+    except Exception as e:
+        logging.warning(f"Callback for job {job['jobId']} failed: {e}")
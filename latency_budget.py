@@ -0,0 +1,190 @@
+"""
+Latency budget of a resume generation.
+
+Each generation gets a deadline, and everything it does has to fit in it: waiting for the
+governor, the API call and its retries, and a hedged request. Three controls keep the tail
+latency of the LLM call bounded:
+
+    output size  max_tokens is derived from the one-page target and the size of the
+                 candidate's data instead of a fixed 4096, so a runaway answer stops at a
+                 page's worth of text. Generation time grows with the output tokens.
+    deadline     The API call is given the remaining budget as its timeout, the governor
+                 stops retrying once a retry no longer fits, and LLMDeadlineError is raised
+                 when the budget runs out, including when the API call times out at it.
+    hedging      When a call has not answered after the HEDGE_PERCENTILE of its model's
+                 recent latencies, a second request is sent (to HEDGE_MODEL, if set). The
+                 first successful answer wins and the other request is cancelled. Hedges
+                 are only sent while the governor has a free slot, so they never queue
+                 behind other requests or push the app into the rate limits.
+
+The latency of every completed call is recorded per model as the "llm_model:<model>" stage
+of the metrics route, and is what the hedge delay is computed from. Hedging only applies to
+the single-candidate route; the batch, job and pre-generation paths are not waited on by a
+user and only get the output size and the deadline.
+
+Settings come from the optional LATENCY section (see settings.py):
+
+    DEADLINE_SECONDS    Budget of a generation, including retries and hedges (default 120). Also
+                        bounds the admission waits and retries of the LLM governor.
+    ONE_PAGE_TOKENS     Output tokens of a full one-page resume, the max_tokens ceiling (default 1500).
+    MIN_OUTPUT_TOKENS   max_tokens of the sparsest profile (default 1200). A resume cut off at
+                        max_tokens is an error and not cached, so keep this near a page.
+    OUTPUT_PER_INPUT    Output tokens allowed per token of candidate data (default 2.0).
+    HEDGE_PERCENTILE    Latency percentile (0-100) after which a hedge is sent, 0 disables
+                        hedging (default 95).
+    HEDGE_MIN_SAMPLES   Completed calls of a model needed before it is hedged (default 20).
+    HEDGE_MODEL         Model of the hedged request, e.g. a faster one (default the same model).
+
+"""
+
+import asyncio
+import collections
+import logging
+import threading
+import time
+
+from metrics import observe, percentile
+from settings import get_section
+
+# Timers may fire this many seconds early, a timeout that close to the deadline ran into it
+_TIMER_SLACK = 0.05
+_stats = collections.Counter()
+_stats_lock = threading.Lock()
+
+
+class LLMDeadlineError(TimeoutError):
+    """Raised when a generation did not finish within its latency budget."""
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def deadline_seconds():
+    """Returns the DEADLINE_SECONDS setting, the one end-to-end budget of a generation."""
+    return get_section('LATENCY').getfloat('DEADLINE_SECONDS', fallback=120.0)
+
+
+def new_deadline():
+    """Returns the monotonic time at which a generation starting now runs out of budget."""
+    return time.monotonic() + deadline_seconds()
+
+
+def remaining(deadline):
+    """
+    Returns the seconds left until `deadline`, or raises LLMDeadlineError if none are left.
+    """
+    seconds = deadline - time.monotonic()
+    if seconds <= 0:
+        _count("deadline_exceeded")
+        raise LLMDeadlineError("Resume generation exceeded its latency budget")
+    return seconds
+
+
+def raise_if_expired(deadline, error):
+    """
+    Raises LLMDeadlineError from `error` if the call it ended ran into `deadline`. Calls are
+    given the time left as their timeout, so a timeout at the deadline is the budget running
+    out; an earlier one (a stalled connection) is left to the caller, which may retry it.
+    """
+    if time.monotonic() >= deadline - _TIMER_SLACK:
+        _count("deadline_exceeded")
+        raise LLMDeadlineError("Resume generation exceeded its latency budget") from error
+
+
+def output_token_budget(candidate_json, ceiling):
+    """
+    Returns the max_tokens of a resume for the candidate's serialized data.
+
+    A resume restates and expands the candidate's data, so its length follows the size of
+    the data, up to one page.
+
+    Args:
+        candidate_json (str): The candidate data sent to the LLM.
+        ceiling (int): The most tokens the caller allows.
+    """
+    latency = get_section('LATENCY')
+    # About four characters per token, the estimate the governor uses as well
+    input_tokens = len(candidate_json) // 4
+    budget = latency.getint('MIN_OUTPUT_TOKENS', fallback=1200) + int(
+        input_tokens * latency.getfloat('OUTPUT_PER_INPUT', fallback=2.0))
+    return min(budget, latency.getint('ONE_PAGE_TOKENS', fallback=1500), ceiling)
+
+
+def record_latency(model, seconds):
+    """Records the latency of a completed call of `model`."""
+    observe(f"llm_model:{model}", seconds * 1000)
+
+
+def hedge_delay(model):
+    """
+    Returns:
+        float: Seconds to wait for a call of `model` before hedging it, or None if hedging
+        is disabled or the model has too few recorded calls.
+    """
+    latency = get_section('LATENCY')
+    hedge_percentile = latency.getfloat('HEDGE_PERCENTILE', fallback=95.0)
+    if hedge_percentile <= 0:
+        return None
+    milliseconds = percentile(f"llm_model:{model}", hedge_percentile / 100,
+                              min_samples=latency.getint('HEDGE_MIN_SAMPLES', fallback=20))
+    return None if milliseconds is None else milliseconds / 1000
+
+
+def hedge_model(model):
+    """Returns the model of a hedged request for a call of `model`."""
+    return get_section('LATENCY').get('HEDGE_MODEL', fallback='') or model
+
+
+async def run_hedged(call, model, deadline, can_hedge=lambda: True):
+    """
+    Awaits `call(model)`, hedging it with `call(hedge_model(model))` if it is slow.
+
+    Args:
+        call: Coroutine function making one API call for a model.
+        model (str): Model of the first call.
+        deadline (float): Monotonic deadline of the generation.
+        can_hedge: Returns False when a hedge must not be sent now, e.g. the governor has
+            no free slot.
+
+    Returns:
+        The response of the first call that succeeded.
+    """
+    tasks = [asyncio.ensure_future(call(model))]
+    hedge = None
+    try:
+        delay = hedge_delay(model)
+        if delay is not None and delay < remaining(deadline):
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and can_hedge():
+                _count("hedges")
+                logging.info(f"Hedging LLM call to {model} after {delay:.1f}s")
+                hedge = asyncio.ensure_future(call(hedge_model(model)))
+                tasks.append(hedge)
+
+        error = None
+        while tasks:
+            done, _ = await asyncio.wait(tasks, timeout=remaining(deadline),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    if task is hedge:
+                        _count("hedge_wins")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # The losing request is cancelled, which also closes its connection
+        for task in tasks:
+            task.cancel()
+
+
+def latency_stats():
+    """
+    Returns:
+        dict: Hedges sent, hedges that answered first, and generations that ran out of budget.
+    """
+    with _stats_lock:
+        return {name: _stats[name] for name in ("hedges", "hedge_wins", "deadline_exceeded")}
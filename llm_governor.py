@@ -0,0 +1,463 @@
+"""
+Process-wide admission control and retry policy for LLM calls.
+
+Every Messages API call of create_resume goes through the governor, from the HTTP routes,
+the batch route, the job worker and pre-generation alike. It keeps the worker under the
+account's rate limits instead of discovering them through 429s:
+
+    concurrency  An adaptive limit on calls in flight (AIMD): it grows by one for every
+                 limit's worth of successful calls and halves when the API answers 429
+                 (rate limited) or 529 (overloaded). Only calls admitted after the last
+                 decrease can halve it again, so a burst of throttles counts once. Without
+                 a MAX_CONCURRENCY it starts unbounded and the first throttle halves the
+                 calls in flight at that moment.
+    buckets      Token buckets for requests and tokens per minute. A call is charged its
+                 estimated tokens up front and corrected with the actual usage afterwards.
+    retry-after  A throttled response pauses every caller until its retry-after has passed.
+
+Callers waiting for a slot sleep on a condition that every finished call notifies, and
+callers waiting for the rate limits or a pause sleep until the budget is back. Failed calls
+are retried with exponential backoff and full jitter, for rate limits, overloads, 5xx
+responses, timeouts and connection errors, as long as the retry still fits in the call's
+deadline, the LATENCY DEADLINE_SECONDS setting (see latency_budget.py). When the deadline
+or the retries run out on a throttle, LLMThrottledError is raised so the HTTP routes can
+answer 503 with a Retry-After.
+
+Settings come from the optional LLM section (see settings.py):
+
+    MAX_CONCURRENCY         Upper bound of the adaptive concurrency limit. By default the calls the
+                            rate limits below allow to be in flight when each one lasts the whole
+                            deadline, or unbounded when they are 0.
+    MIN_CONCURRENCY         Lower bound of the adaptive concurrency limit (default 1).
+    REQUESTS_PER_MINUTE     Request rate limit of the account, 0 for none (default 0).
+    TOKENS_PER_MINUTE       Token rate limit of the account (input + output), 0 for none (default 0).
+    EXPECTED_OUTPUT_TOKENS  Output tokens charged up front per call (default 1000).
+    MAX_RETRIES             Retries of a failed call (default 4).
+
+"""
+
+import asyncio
+import collections
+import contextlib
+import logging
+import math
+import random
+import threading
+import time
+
+from latency_budget import deadline_seconds
+from settings import get_section
+
+# Status codes worth retrying: rate limited, server errors and overloaded
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLE_STATUS = {429, 529}
+# Backoff of the first retry and the longest single backoff, in seconds
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+
+class LLMThrottledError(Exception):
+    """Raised when a call could not get through the API's rate limits within its deadline."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` per second up to `per_minute`. Not thread-safe on its own."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """Returns the seconds until `amount` is available (a call larger than the bucket waits for a full one)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        # May go negative when usage turns out higher than estimated, delaying later calls
+        self.level -= amount
+
+
+def _status_code(error):
+    return getattr(error, 'status_code', None)
+
+
+def _retry_after(error):
+    """Returns the retry-after of an API error in seconds, or None."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def default_max_concurrency(requests_per_minute, tokens_per_minute, tokens_per_call, call_seconds):
+    """
+    Returns the calls the rate limits allow to be in flight at once when each call uses
+    `tokens_per_call` and lasts `call_seconds`, or None (unbounded) without rate limits.
+    """
+    calls_per_minute = [rate for rate in (requests_per_minute,
+                                          tokens_per_minute / tokens_per_call if tokens_per_minute else 0) if rate]
+    if not calls_per_minute:
+        return None
+    return max(1, math.ceil(min(calls_per_minute) * call_seconds / 60))
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def is_retryable(error):
+    """Returns True for rate limits, overloads, 5xx responses, timeouts and connection errors."""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # APIConnectionError and its APITimeoutError subclass carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class Governor:
+    """
+    Adaptive concurrency limit, rate limit buckets and retry policy shared by all LLM calls.
+    """
+
+    def __init__(self, max_concurrency=None, min_concurrency=1, requests_per_minute=0, tokens_per_minute=0,
+                 max_retries=4, deadline_seconds=120.0):
+        """
+        Args:
+            max_concurrency (int): Upper bound of the concurrency limit, None for unbounded.
+        """
+        self.max_concurrency = math.inf if max_concurrency is None else max_concurrency
+        self.min_concurrency = min(min_concurrency, self.max_concurrency)
+        self.max_retries = max_retries
+        self.deadline_seconds = deadline_seconds
+        self.limit = float(self.max_concurrency)
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        # Notified whenever a call ends, for threads waiting for a slot
+        self._released = threading.Condition(self._lock)
+        # (event loop, future) of the coroutines waiting for a slot, woken the same way
+        self._async_waiters = set()
+        self._in_flight = 0
+        self._waiting = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._stats = collections.Counter()
+
+    def _slots(self):
+        """Returns the calls that may be in flight under the current limit."""
+        return int(self.limit) if math.isfinite(self.limit) else math.inf
+
+    def _try_acquire(self, tokens, now):
+        """
+        Takes a slot and the rate budget of a call. The caller holds the lock.
+
+        Returns:
+            float: 0 if the call was admitted, else the seconds to wait (infinite when
+            waiting for a call to end).
+        """
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= self._slots():
+            return math.inf
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait_time(1, now))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_time(tokens, now))
+        if wait:
+            return wait
+        if self._requests is not None:
+            self._requests.take(1)
+        if self._tokens is not None:
+            self._tokens.take(tokens)
+        self._in_flight += 1
+        self._stats["admitted"] += 1
+        return 0.0
+
+    def _wait_time(self, tokens, deadline):
+        """
+        Tries to admit a call. The caller holds the lock.
+
+        Returns:
+            float: 0 if the call was admitted, else the seconds to wait before trying again.
+            Raises LLMThrottledError if the call cannot start before `deadline`.
+        """
+        now = time.monotonic()
+        wait = self._try_acquire(tokens, now)
+        if not wait:
+            return 0.0
+        left = deadline - now
+        # A slot can free up at any moment, a pause or the rate budget only after `wait`
+        if left <= 0 or wait > left and math.isfinite(wait):
+            self._stats["deadline_exceeded"] += 1
+            retry_after = max(self._paused_until - now, 1.0)
+            raise LLMThrottledError(f"LLM capacity not available within {self.deadline_seconds:.0f}s",
+                                    retry_after=retry_after)
+        return min(wait, left)
+
+    def acquire(self, tokens, deadline):
+        """
+        Blocks until the call may start, or raises LLMThrottledError at the deadline.
+
+        Returns:
+            float: The admission time, to pass on to release().
+        """
+        start = time.monotonic()
+        with self._released:
+            self._waiting += 1
+            try:
+                while True:
+                    wait = self._wait_time(tokens, deadline)
+                    if not wait:
+                        break
+                    self._released.wait(wait)
+            finally:
+                self._waiting -= 1
+                self._stats["wait_ms"] += int((time.monotonic() - start) * 1000)
+        return time.monotonic()
+
+    async def acquire_async(self, tokens, deadline):
+        """Like acquire(), without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    wait = self._wait_time(tokens, deadline)
+                    if not wait:
+                        break
+                    waiter = (loop, loop.create_future())
+                    self._async_waiters.add(waiter)
+                try:
+                    await asyncio.wait_for(waiter[1], wait)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._lock:
+                        self._async_waiters.discard(waiter)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self._stats["wait_ms"] += int((time.monotonic() - start) * 1000)
+        return time.monotonic()
+
+    def _notify(self):
+        """Wakes every caller waiting for a slot. The caller holds the lock."""
+        self._released.notify_all()
+        for loop, future in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The waiter's event loop was closed
+                pass
+        self._async_waiters.clear()
+
+    def release(self, admitted_at, estimated_tokens=0, usage=None, error=None):
+        """
+        Ends a call: corrects the token bucket with the actual usage and adapts the
+        concurrency limit to the outcome.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight -= 1
+            if self._tokens is not None and usage is not None:
+                self._tokens.take(usage.input_tokens + usage.output_tokens - estimated_tokens)
+
+            status = _status_code(error) if error is not None else None
+            if status in THROTTLE_STATUS:
+                self._stats["throttled"] += 1
+                retry_after = _retry_after(error)
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                if admitted_at >= self._last_decrease:
+                    # An unbounded limit starts from the calls that were in flight
+                    self.limit = max(float(self.min_concurrency), min(self.limit, self._in_flight + 1) / 2)
+                    self._last_decrease = now
+                    logging.warning(f"LLM throttled ({status}), concurrency limit lowered to {int(self.limit)}")
+            elif error is None and math.isfinite(self.limit):
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._notify()
+
+    @contextlib.contextmanager
+    def slot(self, estimated_tokens, deadline=None):
+        """
+        Holds a slot for a call that cannot be retried, such as a stream whose text was
+        already passed on. Set "usage" in the yielded dict to correct the token bucket.
+        """
+        call = {}
+        admitted_at = self.acquire(estimated_tokens, self._deadline(deadline))
+        error = None
+        try:
+            yield call
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Also runs when the client abandons the stream
+            self.release(admitted_at, estimated_tokens, usage=call.get("usage"), error=error)
+
+    def _deadline(self, deadline):
+        own = time.monotonic() + self.deadline_seconds
+        return own if deadline is None else min(deadline, own)
+
+    def has_capacity(self):
+        """Returns True if a call could start right now without waiting for a slot."""
+        with self._lock:
+            return time.monotonic() >= self._paused_until and self._in_flight < self._slots()
+
+    def _backoff(self, attempt, error):
+        """Returns the seconds to sleep before retry `attempt` (1-based), honouring retry-after."""
+        backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+        return max(backoff, _retry_after(error) or 0.0)
+
+    def _give_up(self, error, attempt, delay, deadline):
+        """Returns True if a failed call must not be retried."""
+        if not is_retryable(error) or attempt > self.max_retries:
+            return True
+        if time.monotonic() + delay > deadline:
+            with self._lock:
+                self._stats["deadline_exceeded"] += 1
+            return True
+        with self._lock:
+            self._stats["retries"] += 1
+        logging.info(f"Retrying LLM call in {delay:.1f}s after {type(error).__name__} (retry {attempt})")
+        return False
+
+    def _final_error(self, error):
+        if _status_code(error) in THROTTLE_STATUS:
+            return LLMThrottledError(f"LLM rate limited: {error}", retry_after=_retry_after(error) or BACKOFF_CAP)
+        return error
+
+    def call(self, fn, estimated_tokens, deadline=None):
+        """
+        Runs `fn()` (one Messages API call) under the governor, retrying it as configured.
+
+        Args:
+            fn: Makes the call.
+            estimated_tokens (int): Tokens charged up front, see estimate_tokens().
+            deadline (float): Monotonic time by which the call must be done, at most the
+                LATENCY DEADLINE_SECONDS from now (the default).
+
+        Returns:
+            The result of `fn()`.
+        """
+        deadline = self._deadline(deadline)
+        attempt = 0
+        while True:
+            admitted_at = self.acquire(estimated_tokens, deadline)
+            try:
+                response = fn()
+            except Exception as e:
+                self.release(admitted_at, estimated_tokens, error=e)
+                attempt += 1
+                delay = self._backoff(attempt, e)
+                if self._give_up(e, attempt, delay, deadline):
+                    raise self._final_error(e) from e
+                time.sleep(delay)
+                continue
+            self.release(admitted_at, estimated_tokens, usage=getattr(response, 'usage', None))
+            return response
+
+    async def call_async(self, fn, estimated_tokens, deadline=None):
+        """
+        Like call(), for a coroutine function `fn`. A cancelled call (such as the losing
+        request of a hedge) gives its slot back and is not retried.
+        """
+        deadline = self._deadline(deadline)
+        attempt = 0
+        while True:
+            admitted_at = await self.acquire_async(estimated_tokens, deadline)
+            try:
+                response = await fn()
+            except asyncio.CancelledError:
+                self.release(admitted_at, estimated_tokens)
+                raise
+            except Exception as e:
+                self.release(admitted_at, estimated_tokens, error=e)
+                attempt += 1
+                delay = self._backoff(attempt, e)
+                if self._give_up(e, attempt, delay, deadline):
+                    raise self._final_error(e) from e
+                await asyncio.sleep(delay)
+                continue
+            self.release(admitted_at, estimated_tokens, usage=getattr(response, 'usage', None))
+            return response
+
+    def stats(self):
+        """
+        Returns:
+            dict: Current limit (None while unbounded), calls in flight, queue depth and the
+            throttle, retry and deadline counters.
+        """
+        with self._lock:
+            stats = {name: self._stats[name] for name in (
+                "admitted", "throttled", "retries", "deadline_exceeded", "wait_ms")}
+            stats.update(limit=int(self.limit) if math.isfinite(self.limit) else None,
+                         in_flight=self._in_flight, waiting=self._waiting,
+                         paused_seconds=round(max(0.0, self._paused_until - time.monotonic()), 1))
+        return stats
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """
+    Returns the process-wide governor, creating it on first use from the LLM settings.
+    """
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                llm = get_section('LLM')
+                requests_per_minute = llm.getint('REQUESTS_PER_MINUTE', fallback=0)
+                tokens_per_minute = llm.getint('TOKENS_PER_MINUTE', fallback=0)
+                deadline = deadline_seconds()
+                max_concurrency = llm.getint('MAX_CONCURRENCY', fallback=0) or default_max_concurrency(
+                    requests_per_minute, tokens_per_minute, llm.getint('EXPECTED_OUTPUT_TOKENS', fallback=1000),
+                    deadline)
+                _governor = Governor(
+                    max_concurrency=max_concurrency,
+                    min_concurrency=llm.getint('MIN_CONCURRENCY', fallback=1),
+                    requests_per_minute=requests_per_minute,
+                    tokens_per_minute=tokens_per_minute,
+                    max_retries=llm.getint('MAX_RETRIES', fallback=4),
+                    deadline_seconds=deadline,
+                )
+    return _governor
+
+
+def governor_stats():
+    """
+    Returns:
+        dict: The governor statistics, or an empty dict if no LLM call was made yet.
+    """
+    return _governor.stats() if _governor is not None else {}
+
+
+def estimate_tokens(params):
+    """
+    Returns the tokens a call is charged up front: about four characters per input token
+    plus the EXPECTED_OUTPUT_TOKENS setting.
+    """
+    characters = sum(len(str(message["content"])) for message in params.get("messages", []))
+    characters += len(str(params.get("system", "")))
+    expected_output = get_section('LLM').getint('EXPECTED_OUTPUT_TOKENS', fallback=1000)
+    return characters // 4 + min(expected_output, params.get("max_tokens", expected_output))
@@ -0,0 +1,203 @@
+"""
+Lightweight per-stage latency instrumentation.
+
+Code wraps each stage of the resume pipeline in a span:
+
+    with span("db_query"):
+        cursor.execute(...)
+
+Every span feeds a process-wide histogram of its stage (p50/p95/p99 over a window of recent
+samples, exposed by the metrics route). While a request is being timed (see RequestTimer),
+its spans are also collected for the Server-Timing response header and the structured
+request log record, together with the LLM token usage. The current request travels in a
+context variable, so spans recorded in asyncio.to_thread workers are attributed to it.
+
+"""
+
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+
+from settings import get_section
+
+# Number of recent samples each histogram computes its percentiles over
+WINDOW = 2048
+
+_current = contextvars.ContextVar("request_timer", default=None)
+
+
+class Histogram:
+    """
+    Latency histogram over a sliding window of recent samples, plus lifetime count and sum.
+    """
+
+    def __init__(self, window=WINDOW):
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+            self.total += value
+
+    def percentile(self, p, min_samples=1):
+        """
+        Returns:
+            float: The `p` (0 to 1) percentile of the window, or None with fewer than
+            `min_samples` samples.
+        """
+        with self._lock:
+            if len(self._samples) < max(min_samples, 1):
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: count, mean and p50/p95/p99/max of the window, in milliseconds.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total = self.count, self.total
+        if not samples:
+            return {"count": count}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 2)
+
+        return {
+            "count": count,
+            "mean": round(total / count, 2),
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": round(samples[-1], 2),
+        }
+
+
+_histograms = collections.defaultdict(Histogram)
+_histograms_lock = threading.Lock()
+
+
+def observe(stage, milliseconds):
+    """Records a stage duration in its histogram and in the current request, if any."""
+    with _histograms_lock:
+        histogram = _histograms[stage]
+    histogram.observe(milliseconds)
+    timer = _current.get()
+    if timer is not None:
+        timer.record(stage, milliseconds)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Times the enclosed block as one occurrence of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, (time.perf_counter() - start) * 1000)
+
+
+def record_usage(usage):
+    """Attaches the LLM token usage of a response to the current request, if any."""
+    timer = _current.get()
+    if timer is not None and usage is not None:
+        for name in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            value = getattr(usage, name, None)
+            if value:
+                timer.usage[name] = timer.usage.get(name, 0) + value
+
+
+def percentile(stage, p, min_samples=1):
+    """
+    Returns:
+        float: The `p` (0 to 1) percentile of a stage in milliseconds, or None while the stage
+        has fewer than `min_samples` recent samples.
+    """
+    with _histograms_lock:
+        histogram = _histograms.get(stage)
+    return None if histogram is None else histogram.percentile(p, min_samples)
+
+
+def snapshot():
+    """
+    Returns:
+        dict: The histogram snapshot of every stage.
+    """
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {stage: histogram.snapshot() for stage, histogram in sorted(histograms.items())}
+
+
+class RequestTimer:
+    """
+    Collects the spans and token usage of one request.
+
+    Use as a context manager around the request; it becomes the current request for every
+    span recorded inside, including in threads started with asyncio.to_thread.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.usage = {}
+        self._start = None
+        self._token = None
+        self._lock = threading.Lock()
+
+    def record(self, stage, milliseconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + milliseconds
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+        observe(f"{self.name}_total", (time.perf_counter() - self._start) * 1000)
+
+    def elapsed(self):
+        """Returns the milliseconds since the request started."""
+        return (time.perf_counter() - self._start) * 1000
+
+    def server_timing(self):
+        """
+        Returns:
+            str: The Server-Timing header value, e.g. "db_query;dur=12.3, llm;dur=2310.0, total;dur=2330.1".
+        """
+        with self._lock:
+            stages = list(self.stages.items())
+        stages.append(("total", self.elapsed()))
+        return ", ".join(f"{stage};dur={milliseconds:.1f}" for stage, milliseconds in stages)
+
+    def log(self, **fields):
+        """Writes the structured record of the request: stage timings, token usage and `fields`."""
+        with self._lock:
+            record = {"event": self.name, **fields,
+                      "timings_ms": {stage: round(ms, 1) for stage, ms in self.stages.items()},
+                      "total_ms": round(self.elapsed(), 1), "usage": dict(self.usage)}
+        logging.info(json.dumps(record), extra={"custom_dimensions": record})
+
+
+def log_payload(label, payload):
+    """
+    Logs a large payload (candidate data, resume text) only when DEBUG logging is enabled or
+    the request is sampled (METRICS PAYLOAD_LOG_SAMPLE_RATE, default 0), so formatting it does
+    not cost time on every request.
+    """
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("%s: %s", label, payload)
+    elif random.random() < get_section('METRICS').getfloat('PAYLOAD_LOG_SAMPLE_RATE', fallback=0.0):
+        logging.info("%s: %s", label, payload)
@@ -10,319 +10,393 @@ Args:
     retrieve relevant records from the incognito MySQL database.
 
 Returns:
-    Currently, returns a json dump of the candidate's resume info.
+    Currently, returns the candidate's resume info as a Candidate model.
     Ultimately, will return a link to a PDF or Word resume document.
 
 """
 
-import configparser
 import datetime
-import json
-import mysql.connector
-import os
-import phpserialize
+import logging
 import re
 
+from candidate import Candidate, Education, Experience
+from candidate_cache import get_candidate_cache
+from db_pool import get_pool
+from metrics import span
+from php_serialized import parse_php_serialized
+from settings import get_settings
+from text_normalize import clean_descriptions
 
-def parse_php_serialized(data):
+
+def clean_date(date_str):
     """
-    Parses a PHP serialized string using the phpserialize package.
+    Cleans the date string by removing the day of the month.
     Args:
-        data: The PHP serialized string to parse.
+        date_str (str): The date string to be cleaned.
     Returns:
-        A Python list of values or the original data on error.
+        str: The cleaned date string in the format "Month Year".
     """
     try:
-        parsed_data = phpserialize.loads(data.encode('utf-8'))
-    except Exception as e:
-        print(f"Error parsing data: {e}")
-        return data  # Return original data on error
-
-    # Check if parsed data is a dictionary
-    if isinstance(parsed_data, dict):
-        # Convert dictionary values (bytes) to strings and return as list
-        return [value.decode('utf-8') for value in parsed_data.values()]
-    else:
-        # Not a dictionary, return the original data
-        return data
+        date = datetime.datetime.strptime(date_str, "%B %d %Y")
+        return date.strftime("%B %Y")
+    except ValueError:
+        return ""
 
 
-def clean_description(description):
+# Declarative specs of the JobSearch repeater groups. Each output field maps to the meta_keys
+# holding its PHP-serialized array, in fallback order: for every entry the first non-empty
+# value wins (e.g. the hidden date fields are used when the visible ones are empty).
+# Further groups (certifications, awards, ...) only need a spec like these.
+EDUCATION_FIELDS = {
+    "degree": ("jobsearch_field_education_title",),
+    "university": ("jobsearch_field_education_academy",),
+    "description": ("jobsearch_field_education_description",),
+    "start_date": ("jobsearch_field_education_start_date", "jobsearch_field_edu_start_date_hiden"),
+    "end_date": ("jobsearch_field_education_end_date", "jobsearch_field_edu_end_date_hiden"),
+    "present": ("jobsearch_field_education_date_prsnt",),
+}
+
+EXPERIENCE_FIELDS = {
+    "title": ("jobsearch_field_experience_title",),
+    "company": ("jobsearch_field_experience_company",),
+    "description": ("jobsearch_field_experience_description",),
+    "start_date": ("jobsearch_field_experience_start_date",),
+    "end_date": ("jobsearch_field_experience_end_date",),
+    "present": ("jobsearch_field_experience_date_prsnt",),
+}
+
+
+# Scalar meta_keys read by parse_candidate_rows
+CONTACT_META_KEYS = (
+    "member_display_name",
+    "email",
+    "user_email_field",
+    "user_phone",
+    "jobsearch_field_user_phone",
+    "jobsearch_cand_skills",
+)
+
+# Every meta_key the parsers consume. Candidate queries only fetch these rows, since
+# JobSearch posts carry many large meta rows that the resume never uses.
+CANDIDATE_META_KEYS = CONTACT_META_KEYS + tuple(
+    meta_key
+    for fields in (EDUCATION_FIELDS, EXPERIENCE_FIELDS)
+    for meta_keys in fields.values()
+    for meta_key in meta_keys
+)
+
+
+def index_meta_rows(records):
     """
-    Cleans the description text by removing HTML tags, special characters, and formatting.
+    Builds a meta_key -> meta_value index in a single pass over the records.
     Args:
-        description (str): The description text to be cleaned.
+        records: A list of dictionaries with meta_key and meta_value.
     Returns:
-        str: The cleaned description text.
+        dict: The first non-empty value of each meta_key.
     """
-    # Remove HTML tags
-    text = re.sub(r'<[^>]+>', '', description)
-    # Remove leading/trailing newlines, carriage returns, whitespace, and special characters
-    text = text.strip('\n\r\t\u2019')
-    # Remove bullet points and tabs
-    text = re.sub(r'^\s*[\u2022\uf0a7]\s*', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\t+', '', text, flags=re.MULTILINE)
-    # Remove multiple consecutive newlines and carriage returns
-    text = re.sub(r'[\n\r]\s*[\n\r]+', '\n', text)
-    # Replace remaining newline and carriage return characters with spaces
-    text = text.replace('\n', ' ').replace('\r', ' ')
-    return text
+    index = {}
+    for record in records:
+        value = record.get('meta_value')
+        if value:
+            index.setdefault(record['meta_key'], value)
+    return index
 
 
-def clean_date(date_str):
+def parse_repeater_group(index, fields):
     """
-    Cleans the date string by removing the day of the month.
+    Zips the serialized arrays of a repeater group into one dictionary per entry.
+    Every meta_key is deserialized exactly once.
     Args:
-        date_str (str): The date string to be cleaned.
+        index (dict): A meta_key -> meta_value index, see index_meta_rows().
+        fields (dict): The group spec, mapping output field names to meta_keys.
     Returns:
-        str: The cleaned date string in the format "Month Year".
+        list: One dictionary per entry with every field of the spec ("" when missing).
     """
-    try:
-        date = datetime.datetime.strptime(date_str, "%B %d %Y")
-        return date.strftime("%B %Y")
-    except ValueError:
-        return ""
+    columns = {}
+    count = 0
+    for name, meta_keys in fields.items():
+        arrays = []
+        for meta_key in meta_keys:
+            if meta_key not in index:
+                continue
+            values = parse_php_serialized(index[meta_key])
+            if isinstance(values, list):
+                arrays.append(values)
+                count = max(count, len(values))
+        columns[name] = arrays
+
+    entries = []
+    for i in range(count):
+        entry = {}
+        for name, arrays in columns.items():
+            entry[name] = next((values[i] for values in arrays if i < len(values) and values[i]), "")
+        entries.append(entry)
+    return entries
+
+
+def format_period(start_date_str, end_date_str, is_present):
+    """
+    Formats the period of an education or work history entry.
+    Args:
+        start_date_str (str): The raw start date.
+        end_date_str (str): The raw end date.
+        is_present: Truthy when the entry is ongoing.
+    Returns:
+        str: "Month Year - Month Year", "Month Year - Present", a single date or "".
+    """
+    start_date = clean_date(start_date_str)
+    end_date = clean_date(end_date_str)
+
+    # Combine and format dates if both start and end dates are available
+    if start_date and end_date:
+        return f"{start_date} - {end_date}"
+    elif start_date and is_present:
+        return f"{start_date} - Present"
+    return start_date or end_date or ""
 
 
 def parse_education_records(records):
     """
-    Parses a list of education records and converts them to JSON format.
+    Parses a list of education records into Education entries.
 
     Args:
         records: A list of dictionaries containing education data.
 
     Returns:
-        A JSON string representing the education data.
+        A list of Education entries, or None if there are none.
     """
+    entries = parse_repeater_group(index_meta_rows(records), EDUCATION_FIELDS)
+    # Remove HTML tags, special characters and formatting from all descriptions at once
+    descriptions = clean_descriptions([entry["description"] for entry in entries])
+
     education = []
-    count_degrees = None
+    for entry, description in zip(entries, descriptions):
+        education.append(Education(
+            degree=entry["degree"],
+            university=entry["university"],
+            year=format_period(entry["start_date"], entry["end_date"], entry["present"]),
+            description=description,
+        ))
 
-    # Extract the education data from the records
-    for record in records:
-        # Extract the education data from the record
-        if not count_degrees:
-            count_degrees = parse_php_serialized(record.get('meta_value'))
-        degree_value = (next
-                        ((r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_education_title'), ""))
-        university_value = next(
-            (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_education_academy'), "")
-        description_value = next(
-            (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_education_description'), "")
-        start_date_value = next(
-            (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_education_start_date'), "")
-        end_date_value = next(
-            (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_education_end_date'), "")
-        # start_date_hidden_value = next(
-        #     (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_edu_start_date_hiden'), "")
-        # end_date_hidden_value = next(
-        #     (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_edu_end_date_hiden'), "")
-        is_present_value = next(
-            (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_education_date_prsnt'), "")
-
-        # Parse the degree, university, and description
-        degrees = parse_php_serialized(degree_value)
-        start_dates = parse_php_serialized(
-            start_date_value) or parse_php_serialized(start_date_hidden_value)
-        end_dates = parse_php_serialized(
-            end_date_value) or parse_php_serialized(end_date_hidden_value)
-        universities = parse_php_serialized(university_value)
-        descriptions = parse_php_serialized(description_value)
-
-    # Process each education record
-    for i in range(len(count_degrees)):
-        degree = degrees[i]
-        university = universities[i]
-        description = descriptions[i]
-        start_date = clean_date(start_dates[i] or start_dates_hidden[i])
-        end_date = clean_date(end_dates[i] or end_dates_hidden[i])
-
-        # Combine and format dates if both start and end dates are available
-        if start_date and end_date:
-            year = f"{start_date} - {end_date}"
-        elif start_date and (is_present[i] or is_present[i] == 'on'):
-            year = f"{start_date} - Present"
-        else:
-            year = start_date or end_date or ""
-
-        # Remove HTML tags, special characters and formatting
-        text = clean_description(description)
-
-        # Extract the location from the description
-        # location = ""
-        # if description:
-        #     location_match = re.search(r'(?<=, ).*', description)
-        #     if location_match:
-        #         location = location_match.group()
-
-        # Create the education dictionary
-        education_data = {
-            "degree": degree,
-            "university": university,
-            # "location": location,
-            "year": year,
-            "description": text,
-        }
-        education.append(education_data)
-
-    # Directly return the list of parsed education records
     return education if education else None
 
 
 def parse_workhistory_records(records):
     """
-    NEEDS TO BE UPDATED TO HANDLE MULTIPLE SETS OF EXPERIENCE RECORDS
-
-    Parses a list of work history records and converts them to JSON format.
+    Parses a list of work history records into Experience entries.
 
     Args:
         records: A list of dictionaries containing work history data.
 
     Returns:
-        A JSON string representing the work history data.
+        A list of Experience entries, or None if there are none.
     """
+    entries = parse_repeater_group(index_meta_rows(records), EXPERIENCE_FIELDS)
+    # Remove HTML tags, special characters and formatting from all descriptions at once
+    descriptions = clean_descriptions([entry["description"] for entry in entries])
+
     workhistory = []
-    count_jobs = None
+    for entry, description in zip(entries, descriptions):
+        workhistory.append(Experience(
+            title=entry["title"],
+            company=entry["company"],
+            duration=format_period(entry["start_date"], entry["end_date"], entry["present"]),
+            description=description,
+        ))
 
-    # Extract the work history data from the records
-    for record in records:
-        # Extract the job data from the record
-        if not count_jobs:
-            count_jobs = parse_php_serialized(record.get('meta_value'))
-        title_value = (next
-                       ((r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_experience_title'), ""))
-        company_value = (next
-                         ((r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_experience_company'), ""))
-        experience_value = (next
-                            ((r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_experience_description'), ""))
-        start_date_value = next(
-            (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_experience_start_date'), "")
-        end_date_value = next(
-            (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_experience_end_date'), "")
-        is_present = next(
-            (r['meta_value'] for r in records if r['meta_key'] == 'jobsearch_field_experience_date_prsnt'), "")
-
-        # Parse the title, company, experience
-        titles = parse_php_serialized(title_value)
-        companies = parse_php_serialized(company_value)
-        experiences = parse_php_serialized(experience_value)
-        start_dates = parse_php_serialized(
-            start_date_value) or parse_php_serialized(start_date_value)
-        end_dates = parse_php_serialized(
-            end_date_value) or parse_php_serialized(end_date_value)
-
-    # Process each education record
-    for i in range(len(count_jobs)):
-        title = titles[i]
-        company = companies[i]
-        experience = experiences[i]
-        start_date = clean_date(start_dates[i])
-        end_date = clean_date(end_dates[i])
-
-        # Combine and format dates if both start and end dates are available
-        if start_date and end_date:
-            year = f"{start_date} - {end_date}"
-        elif start_date and (is_present[i] or is_present[i] == 'on'):
-            year = f"{start_date} - Present"
-        else:
-            year = start_date or end_date or ""
-
-        # Remove HTML tags, special characters and formatting
-        description = clean_description(experience)
-
-        # Create the work history dictionary
-        workhistory_data = {
-            "title": title,
-            "company": company,
-            # "location": location,
-            "duration": year,
-            "description": description,
-        }
-
-        # Add the education data to the list
-        workhistory.append(workhistory_data)
-
-    # Directly return the list of parsed education records
     return workhistory if workhistory else None
 
 
-def get_candidate_data(candidate_id):
+def parse_candidate_rows(rows):
     """
-    Fetch candidate data from the MySQL database.
+    Parses the postmeta rows of a single candidate into resume data.
     Args:
-        candidate_id (int): The ID of the candidate.
+        rows (list): Dictionaries with post_id, meta_key and meta_value for one candidate.
     Returns:
-        dict: A dictionary containing the candidate's data.
+        Candidate: The candidate's data, or a dict with an "error" key if mandatory
+        fields are missing.
     """
-    # Read configuration from config.ini
-    config = configparser.ConfigParser()
-    config.read('config.ini')
-
-    # Get database connection details
-    user = config['DATABASE']['USER']
-    password = config['DATABASE']['PASSWORD']
-    host = config['DATABASE']['HOST']
-    database = config['DATABASE']['DATABASE']
-
     # Initialize an empty dictionary to store key-value pairs
     user_data = {}
     education_records = []
     workhistory_records = []
 
+    for row in rows:
+        key = row["meta_key"]
+        value = row["meta_value"]
+        if not value:
+            continue
+
+        if key == "member_display_name":
+            user_data["name"] = value
+        elif key == "email" or key == "user_email_field":
+            user_data["email"] = value
+        elif key == "user_phone" or key == "jobsearch_field_user_phone":
+            user_data["phone"] = value
+        elif key == "jobsearch_cand_skills":
+            skills = parse_php_serialized(value)
+            user_data["skills"] = skills if isinstance(skills, list) else [skills]
+        elif key.startswith("jobsearch_field_edu"):
+            education_records.append(row)
+        elif key.startswith("jobsearch_field_exp"):
+            workhistory_records.append(row)
+
+    # Check if all mandatory fields are present
+    if "name" not in user_data or "email" not in user_data or "phone" not in user_data:
+        return {"error": "Candidate is missing one or more mandatory fields (name, email, phone)"}
+
+    # Add parsed education data to user_data
+    if education_records:
+        user_data["education"] = parse_education_records(education_records) or []
+
+    # Add parsed work history data to user_data
+    if workhistory_records:
+        user_data["experience"] = parse_workhistory_records(workhistory_records) or []
+
+    # Hand the typed model to the generator, which serializes it once
+    return Candidate(**user_data)
+
+
+def wordpress_table(name):
+    """
+    Returns the quoted name of a WordPress table, using the DATABASE TABLE_PREFIX setting
+    (default "rkg7_", the production site; the staging site uses "itll_").
+    """
+    prefix = get_settings()['DATABASE'].get('TABLE_PREFIX', fallback='rkg7_')
+    if not re.fullmatch(r'\w*', prefix):
+        raise ValueError(f"Invalid table prefix: {prefix!r}")
+    return f"`{prefix}{name}`"
+
+
+def postmeta_table():
+    """Returns the quoted name of the postmeta table."""
+    return wordpress_table("postmeta")
+
+
+def postmeta_query(post_id_placeholders):
+    """
+    Builds the candidate postmeta query, projected onto the meta_keys the parsers consume.
+    Args:
+        post_id_placeholders (int): Number of post_id placeholders in the IN list.
+    Returns:
+        str: The query; its parameters are the post_ids followed by CANDIDATE_META_KEYS.
+    """
+    post_ids = ", ".join(["%s"] * post_id_placeholders)
+    meta_keys = ", ".join(["%s"] * len(CANDIDATE_META_KEYS))
+    return (f"SELECT post_id, meta_key, meta_value FROM {postmeta_table()} "
+            f"WHERE post_id IN ({post_ids}) AND meta_key IN ({meta_keys})")
+
+
+def fingerprint_query():
+    """
+    Builds the query of a candidate's postmeta fingerprint: the number of resume-relevant
+    rows, their highest meta_id and a checksum of their keys and values (see candidate_cache.py).
+    Its parameters are the post_id followed by CANDIDATE_META_KEYS.
+    """
+    meta_keys = ", ".join(["%s"] * len(CANDIDATE_META_KEYS))
+    return (f"SELECT COUNT(*) AS row_count, MAX(meta_id) AS max_meta_id, "
+            f"SUM(CRC32(CONCAT_WS('=', meta_key, meta_value))) AS checksum FROM {postmeta_table()} "
+            f"WHERE post_id = %s AND meta_key IN ({meta_keys})")
+
+
+def candidate_fingerprint(cursor, candidate_id):
+    """
+    Returns:
+        tuple: The fingerprint of the candidate's resume-relevant postmeta rows.
+    """
+    cursor.execute(fingerprint_query(), (candidate_id,) + CANDIDATE_META_KEYS)
+    row = cursor.fetchall()[0]
+    return int(row["row_count"] or 0), int(row["max_meta_id"] or 0), int(row["checksum"] or 0)
+
+
+def _rows_size(rows):
+    """Returns the number of meta_value bytes in the rows."""
+    return sum(len(row["meta_value"].encode('utf-8')) for row in rows if row["meta_value"])
+
+
+def get_candidate_data(candidate_id):
+    """
+    Fetch candidate data from the MySQL database.
+
+    Unless the candidate cache is disabled, the candidate's postmeta fingerprint is checked
+    first and an unchanged candidate is served from the cache without fetching its rows.
+    Args:
+        candidate_id (int): The ID of the candidate.
+    Returns:
+        Candidate: The candidate's data, or a dict with an "error" key if mandatory
+        fields are missing.
+    """
+    import mysql.connector
+
+    cache = get_candidate_cache()
+    fingerprint = None
     try:
-        # Establish a connection with mysql.connector.connect(user=user, password=password, host=host, database=database) as cnx:
-        with mysql.connector.connect(user=user, password=password, host=host, database=database) as cnx:
-            print("Connected successfully!")
+        # Check a connection out of the process-wide pool instead of connecting per request
+        with get_pool().connection() as cnx:
 
             # Create a cursor with cnx.cursor(dictionary=True) as cursor:
             with cnx.cursor(dictionary=True) as cursor:
+                if cache is not None:
+                    with span("db_fingerprint"):
+                        fingerprint = candidate_fingerprint(cursor, candidate_id)
+                    cached = cache.get(int(candidate_id), fingerprint)
+                    if cached is not None:
+                        return cached
+
                 # Execute a SELECT query with parameterized input
-                # query = "SELECT post_id, meta_key, meta_value FROM `itll_postmeta` WHERE post_id = %s"
-                query = "SELECT post_id, meta_key, meta_value FROM `rkg7_postmeta` WHERE post_id = %s"
-                cursor.execute(query, (candidate_id,))
-
-                # Fetch results and process the records
-                for row in cursor.fetchall():
-                    key = row["meta_key"]
-                    value = row["meta_value"]
-                    if not value:
-                        continue
-
-                    if key == "member_display_name":
-                        user_data["name"] = value
-                    elif key == "email" or key == "user_email_field":
-                        user_data["email"] = value
-                    elif key == "user_phone" or key == "jobsearch_field_user_phone":
-                        user_data["phone"] = value
-                    elif key == "jobsearch_cand_skills":
-                        skills = parse_php_serialized(value)
-                        user_data["skills"] = skills
-                    elif key.startswith("jobsearch_field_edu"):
-                        education_records.append(row)
-                    elif key.startswith("jobsearch_field_exp"):
-                        workhistory_records.append(row)
-
-                # Check if all mandatory fields are present
-                if "name" not in user_data or "email" not in user_data or "phone" not in user_data:
-                    return {"error": "Candidate is missing one or more mandatory fields (name, email, phone)"}
-
-                # Add parsed education data to user_data
-                if education_records:
-                    user_data["education"] = parse_education_records(
-                        education_records)
-
-                # Add parsed work history data to user_data
-                if workhistory_records:
-                    user_data["experience"] = parse_workhistory_records(
-                        workhistory_records)
-
-    # except mysql.connector.Error as err:
-    #     print(f"Error: {err}")
-    #     return {"error": f"Database connection error: {err}"}
+                with span("db_query"):
+                    cursor.execute(postmeta_query(1), (candidate_id,) + CANDIDATE_META_KEYS)
+                    rows = cursor.fetchall()
+
     except mysql.connector.Error as err:
-        print(f"Error: {err}")
+        logging.error(f"Database error: {err}")
         # Raise an exception to propagate the error
         raise Exception(f"Database connection error: {err}")
 
-    # Create a JSON string from the user data
-    json_data = json.dumps(user_data, indent=4)
-    return json_data
+    rows_bytes = _rows_size(rows)
+    logging.info(f"Fetched {len(rows)} postmeta rows ({rows_bytes} bytes) for candidate {candidate_id}")
+    with span("parse"):
+        candidate = parse_candidate_rows(rows)
+    if cache is not None:
+        cache.put(int(candidate_id), fingerprint, candidate, rows_bytes)
+    return candidate
+
+
+def fetch_postmeta_rows(candidate_ids, chunk_size=500):
+    """
+    Fetch the postmeta rows of many candidates with chunked IN queries.
+    Args:
+        candidate_ids (list): The candidate IDs (post_ids) to fetch.
+        chunk_size (int): Maximum number of IDs bound into a single query.
+    Returns:
+        dict: The list of postmeta rows for each candidate ID, in request order.
+        Candidates without any rows map to an empty list.
+    """
+    import mysql.connector
+
+    ids = list(dict.fromkeys(int(candidate_id) for candidate_id in candidate_ids))
+    rows_by_post = {candidate_id: [] for candidate_id in ids}
+
+    try:
+        with get_pool().connection() as cnx:
+            with cnx.cursor(dictionary=True) as cursor:
+                for start in range(0, len(ids), chunk_size):
+                    chunk = ids[start:start + chunk_size]
+                    with span("db_query"):
+                        cursor.execute(postmeta_query(len(chunk)), tuple(chunk) + CANDIDATE_META_KEYS)
+                        rows = cursor.fetchall()
+                    for row in rows:
+                        rows_by_post[int(row["post_id"])].append(row)
+
+    except mysql.connector.Error as err:
+        logging.error(f"Database error: {err}")
+        raise Exception(f"Database connection error: {err}")
+
+    total_rows = total_bytes = 0
+    for candidate_id, rows in rows_by_post.items():
+        size = _rows_size(rows)
+        logging.debug(f"Fetched {len(rows)} postmeta rows ({size} bytes) for candidate {candidate_id}")
+        total_rows += len(rows)
+        total_bytes += size
+    logging.info(f"Fetched {total_rows} postmeta rows ({total_bytes} bytes) for {len(ids)} candidates")
+    return rows_by_post
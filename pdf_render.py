@@ -0,0 +1,447 @@
+"""
+In-memory PDF rendering of a parsed resume.
+
+The PDF is written directly, without a PDF library: US Letter pages of text set in DejaVu
+Sans (templates/fonts), which covers Latin, Greek and Cyrillic names. The font is embedded
+as a subset holding only the glyphs the document uses, addressed by glyph ID (Identity-H),
+with a ToUnicode map so the text can be searched and copied. Lines are wrapped with the
+font's glyph widths and the page content is deflate-compressed. The layout (fonts, sizes,
+margins) and the parsed fonts are prepared once per worker in PdfTemplate.
+
+Characters the font has no glyph for (CJK, for example) are drawn as its empty box. Set the
+DOCUMENTS PDF_FONT and PDF_BOLD_FONT settings to the paths of other TrueType fonts to change
+the typeface or the coverage.
+
+"""
+
+import functools
+import hashlib
+import os
+import struct
+import zlib
+
+from resume_document import BULLET
+from settings import get_section
+
+CONTENT_TYPE = "application/pdf"
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "fonts")
+REGULAR_FONT = os.path.join(FONT_DIR, "DejaVuSans.ttf")
+BOLD_FONT = os.path.join(FONT_DIR, "DejaVuSans-Bold.ttf")
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 54
+BULLET_INDENT = 14
+
+# (font resource, size in points, space before the line in points)
+STYLES = {
+    "title": ("F2", 18, 0),
+    "contact": ("F1", 10, 2),
+    "heading": ("F2", 12, 10),
+    "paragraph": ("F1", 10, 2),
+    "bullet": ("F1", 10, 1),
+}
+LINE_SPACING = 1.25
+
+# Tables a PDF reader needs from an embedded TrueType font (the hinting ones if present)
+SUBSET_TABLES = ("head", "hhea", "maxp", "hmtx", "loca", "glyf", "cvt ", "fpgm", "prep")
+# Composite glyph flags
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+
+class TrueTypeFont:
+    """The metrics, character map and glyph outlines of a TrueType font."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.name = os.path.splitext(os.path.basename(path))[0].replace(" ", "")
+        self.tables = {}
+        for number in range(struct.unpack_from(">H", data, 4)[0]):
+            tag, _, offset, length = struct.unpack_from(">4sIII", data, 12 + 16 * number)
+            self.tables[tag.decode('latin-1')] = data[offset:offset + length]
+
+        head, hhea = self.tables["head"], self.tables["hhea"]
+        units_per_em = struct.unpack_from(">H", head, 18)[0]
+        glyph_count = struct.unpack_from(">H", self.tables["maxp"], 4)[0]
+        self.bbox = [round(value * 1000 / units_per_em) for value in struct.unpack_from(">4h", head, 36)]
+        self.ascent, self.descent = (round(value * 1000 / units_per_em) for value in struct.unpack_from(">hh", hhea, 4))
+        os2 = self.tables.get("OS/2", b"")
+        # sCapHeight only exists from version 2 of the OS/2 table
+        cap_height = struct.unpack_from(">h", os2, 88)[0] * 1000 / units_per_em if len(os2) >= 90 else self.ascent
+        self.cap_height = round(cap_height)
+
+        # Advance widths in 1/1000 em; glyphs after the last long metric share its advance
+        metric_count = struct.unpack_from(">H", hhea, 34)[0]
+        advances = [struct.unpack_from(">H", self.tables["hmtx"], 4 * number)[0] for number in range(metric_count)]
+        advances += [advances[-1]] * (glyph_count - metric_count)
+        self.widths = [round(advance * 1000 / units_per_em) for advance in advances]
+        # The horizontal metrics (advance, left side bearing) of each glyph, as in hmtx
+        hmtx = self.tables["hmtx"]
+        self._metrics = [hmtx[4 * number:4 * number + 4] for number in range(metric_count)]
+        # Glyphs after the last long metric only have their left side bearing in hmtx
+        bearings = hmtx[4 * metric_count:]
+        self._metrics += [struct.pack(">H", advances[-1]) + bearings[2 * number:2 * number + 2]
+                          for number in range(glyph_count - metric_count)]
+
+        if struct.unpack_from(">h", head, 50)[0]:
+            offsets = struct.unpack_from(f">{glyph_count + 1}I", self.tables["loca"])
+        else:
+            offsets = [offset * 2 for offset in struct.unpack_from(f">{glyph_count + 1}H", self.tables["loca"])]
+        glyf = self.tables["glyf"]
+        self.glyphs = [glyf[offsets[number]:offsets[number + 1]] for number in range(glyph_count)]
+        self.cmap = _parse_cmap(self.tables["cmap"])
+        # Per character, filled as characters are first seen, so text is mapped without a Python loop
+        self._glyph_of = _CharTable(lambda char: self.cmap.get(ord(char), 0))
+        self._width_of = _CharTable(lambda char: self.widths[self._glyph_of[char]])
+
+    def glyph_ids(self, text):
+        """Returns the glyph ID of each character of `text`, 0 (.notdef) for missing ones."""
+        return list(map(self._glyph_of.__getitem__, text))
+
+    def width(self, text):
+        """Returns the width of `text` in 1/1000 em."""
+        return sum(map(self._width_of.__getitem__, text))
+
+    def subset(self, glyph_ids):
+        """
+        Returns:
+            tuple: A TrueType font with only the glyphs `glyph_ids` and the glyphs they are
+            composed of, and the map of their glyph IDs in this font to those in the subset.
+        """
+        keep = set(glyph_ids) | {0}
+        pending = list(keep)
+        while pending:
+            glyph = self.glyphs[pending.pop()]
+            for position in _component_positions(glyph):
+                component = struct.unpack_from(">H", glyph, position)[0]
+                if component not in keep:
+                    keep.add(component)
+                    pending.append(component)
+
+        # Renumbered in their original order, so .notdef stays glyph 0
+        order = sorted(keep)
+        new_ids = {glyph: number for number, glyph in enumerate(order)}
+        glyf = bytearray()
+        loca = []
+        for glyph_id in order:
+            loca.append(len(glyf))
+            glyph = self.glyphs[glyph_id]
+            positions = list(_component_positions(glyph))
+            if positions:
+                glyph = bytearray(glyph)
+                for position in positions:
+                    struct.pack_into(">H", glyph, position, new_ids[struct.unpack_from(">H", glyph, position)[0]])
+            glyf += glyph + b"\0" * (-len(glyph) % 4)
+        loca.append(len(glyf))
+
+        head, hhea, maxp = (bytearray(self.tables[tag]) for tag in ("head", "hhea", "maxp"))
+        head[8:12] = b"\0\0\0\0"
+        head[50:52] = struct.pack(">h", 1)
+        hhea[34:36] = struct.pack(">H", len(order))
+        maxp[4:6] = struct.pack(">H", len(order))
+        tables = dict(self.tables, head=bytes(head), hhea=bytes(hhea), maxp=bytes(maxp), glyf=bytes(glyf),
+                      hmtx=b"".join(self._metrics[glyph_id] for glyph_id in order),
+                      loca=struct.pack(f">{len(loca)}I", *loca))
+        return _sfnt({tag: tables[tag] for tag in SUBSET_TABLES if tag in tables}), new_ids
+
+
+class _CharTable(dict):
+    """Dict that computes the value of a missing character with `lookup` and keeps it."""
+
+    def __init__(self, lookup):
+        super().__init__()
+        self._lookup = lookup
+
+    def __missing__(self, char):
+        value = self[char] = self._lookup(char)
+        return value
+
+
+def _parse_cmap(table):
+    """Returns the code point to glyph ID map of the Unicode subtable of a cmap table."""
+    subtables = {}
+    for number in range(struct.unpack_from(">H", table, 2)[0]):
+        platform, encoding, offset = struct.unpack_from(">HHI", table, 4 + 8 * number)
+        subtables[(platform, encoding)] = offset
+    cmap = {}
+    # Full Unicode (format 12) if the font has it, else the Basic Multilingual Plane (format 4)
+    if (3, 10) in subtables:
+        offset = subtables[(3, 10)]
+        for group in range(struct.unpack_from(">I", table, offset + 12)[0]):
+            start, end, glyph = struct.unpack_from(">III", table, offset + 16 + 12 * group)
+            for code in range(start, end + 1):
+                cmap[code] = glyph + code - start
+        return cmap
+
+    offset = subtables.get((3, 1), subtables.get((0, 3)))
+    if offset is None:
+        raise ValueError("Font has no Unicode character map")
+    segments = struct.unpack_from(">H", table, offset + 6)[0] // 2
+    ends = struct.unpack_from(f">{segments}H", table, offset + 14)
+    starts = struct.unpack_from(f">{segments}H", table, offset + 16 + 2 * segments)
+    deltas = struct.unpack_from(f">{segments}h", table, offset + 16 + 4 * segments)
+    range_offsets_at = offset + 16 + 6 * segments
+    range_offsets = struct.unpack_from(f">{segments}H", table, range_offsets_at)
+    for segment in range(segments):
+        start, end, delta, range_offset = starts[segment], ends[segment], deltas[segment], range_offsets[segment]
+        for code in range(start, min(end, 0xFFFE) + 1):
+            if range_offset == 0:
+                glyph = (code + delta) & 0xFFFF
+            else:
+                position = range_offsets_at + 2 * segment + range_offset + 2 * (code - start)
+                glyph = struct.unpack_from(">H", table, position)[0]
+                glyph = (glyph + delta) & 0xFFFF if glyph else 0
+            if glyph:
+                cmap[code] = glyph
+    return cmap
+
+
+def _component_positions(glyph):
+    """Yields the offset of each component glyph ID of a composite glyph (none for a simple glyph)."""
+    if len(glyph) < 10 or struct.unpack_from(">h", glyph, 0)[0] >= 0:
+        return
+    position = 10
+    while True:
+        flags = struct.unpack_from(">H", glyph, position)[0]
+        yield position + 2
+        position += 4 + (4 if flags & ARG_1_AND_2_ARE_WORDS else 2)
+        if flags & WE_HAVE_A_SCALE:
+            position += 2
+        elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+            position += 4
+        elif flags & WE_HAVE_A_TWO_BY_TWO:
+            position += 8
+        if not flags & MORE_COMPONENTS:
+            return
+
+
+def _checksum(data):
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+def _sfnt(tables):
+    """Returns the font file holding `tables` (tag: data)."""
+    tags = sorted(tables)
+    power = 1 << (len(tags).bit_length() - 1)
+    header = struct.pack(">IHHHH", 0x00010000, len(tags), power * 16, power.bit_length() - 1,
+                         (len(tags) - power) * 16)
+    directory = b""
+    body = b""
+    offset = len(header) + 16 * len(tags)
+    for tag in tags:
+        data = tables[tag]
+        if tag == "head":
+            head_at = offset + len(body)
+        directory += struct.pack(">4sIII", tag.encode('latin-1'), _checksum(data), offset + len(body), len(data))
+        body += data + b"\0" * (-len(data) % 4)
+    font = bytearray(header + directory + body)
+    # head.checkSumAdjustment makes the checksum of the whole file 0xB1B0AFBA
+    font[head_at + 8:head_at + 12] = struct.pack(">I", (0xB1B0AFBA - _checksum(bytes(font))) & 0xFFFFFFFF)
+    return bytes(font)
+
+
+class PdfTemplate:
+    """Page layout and the parsed fonts shared by every document."""
+
+    def __init__(self, regular_font, bold_font):
+        self.fonts = {"F1": TrueTypeFont(regular_font), "F2": TrueTypeFont(bold_font)}
+        self.text_width = PAGE_WIDTH - 2 * MARGIN
+
+    def measure(self, text, font, size):
+        """Returns the width of `text` in points."""
+        return self.fonts[font].width(text) * size / 1000
+
+    def wrap(self, text, font, size, width):
+        """Splits `text` into lines at most `width` points wide."""
+        measure = self.fonts[font].width
+        # Compared in 1/1000 em, each word measured once
+        limit = width * 1000 / size
+        space = measure(" ")
+        lines = []
+        words = []
+        line_width = 0
+        for word in text.split(" "):
+            word_width = measure(word)
+            if words and line_width + space + word_width > limit:
+                lines.append(" ".join(words))
+                words, line_width = [word], word_width
+            else:
+                line_width += (space if words else 0) + word_width
+                words.append(word)
+        lines.append(" ".join(words))
+        return lines
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(regular_font, bold_font):
+    return PdfTemplate(regular_font, bold_font)
+
+
+def get_template():
+    """Returns the PDF template of the PDF_FONT and PDF_BOLD_FONT settings, prepared once per worker."""
+    documents = get_section('DOCUMENTS')
+    return load_template(documents.get('PDF_FONT', fallback=REGULAR_FONT),
+                         documents.get('PDF_BOLD_FONT', fallback=BOLD_FONT))
+
+
+def layout(document, template):
+    """
+    Places the lines of a ResumeDocument on pages.
+
+    Returns:
+        list: One list of (font, size, x, y, text) per page.
+    """
+    pages = [[]]
+    y = PAGE_HEIGHT - MARGIN
+
+    def add(style, text, indent=0, marker=None, centered=False):
+        nonlocal y
+        font, size, space_before = STYLES[style]
+        leading = size * LINE_SPACING
+        for number, line in enumerate(template.wrap(text, font, size, template.text_width - indent)):
+            y -= (space_before if number == 0 else 0) + leading
+            if y < MARGIN:
+                pages.append([])
+                y = PAGE_HEIGHT - MARGIN - leading
+            if centered:
+                x = MARGIN + (template.text_width - template.measure(line, font, size)) / 2
+            else:
+                x = MARGIN + indent
+            if marker and number == 0:
+                pages[-1].append((font, size, MARGIN + indent - BULLET_INDENT * 0.7, y, marker))
+            pages[-1].append((font, size, x, y, line))
+
+    if document.name:
+        add("title", document.name, centered=True)
+    for line in document.contact:
+        add("contact", line, centered=True)
+    for section in document.sections:
+        if section.heading:
+            add("heading", section.heading.upper())
+        for block in section.blocks:
+            if block.kind == BULLET:
+                add("bullet", block.text, indent=BULLET_INDENT, marker="•")
+            else:
+                add("paragraph", block.text)
+    return pages
+
+
+def _content(lines, template, glyph_maps):
+    """
+    Returns the deflated content stream drawing a page's lines, with the glyph IDs of the
+    font subsets (`glyph_maps`, {font: {glyph ID: subset glyph ID}}).
+    """
+    operations = [b"BT"]
+    for font, size, x, y, text in lines:
+        glyph_ids = list(map(glyph_maps[font].__getitem__, template.fonts[font].glyph_ids(text)))
+        operations.append(b"/%s %d Tf 1 0 0 1 %.2f %.2f Tm <%s> Tj" % (
+            font.encode(), size, x, y, struct.pack(f">{len(glyph_ids)}H", *glyph_ids).hex().encode()))
+    operations.append(b"ET")
+    return zlib.compress(b"\n".join(operations))
+
+
+def _to_unicode(glyphs):
+    """Returns the ToUnicode CMap of a font, mapping each glyph ID back to its character."""
+    mappings = [b"<%04X> <%s>" % (glyph, char.encode('utf-16-be').hex().upper().encode())
+                for glyph, char in sorted(glyphs.items()) if glyph]
+    blocks = []
+    # At most 100 mappings per bfchar block
+    for start in range(0, len(mappings), 100):
+        chunk = mappings[start:start + 100]
+        blocks.append(b"%d beginbfchar\n%s\nendbfchar" % (len(chunk), b"\n".join(chunk)))
+    return (b"/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+            b"/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+            b"1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n%s\n"
+            b"endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend" % b"\n".join(blocks))
+
+
+def _stream(data, extra=b""):
+    compressed = zlib.compress(data)
+    return b"<< /Length %d /Filter /FlateDecode%s >>\nstream\n%s\nendstream" % (len(compressed), extra, compressed)
+
+
+def _font_objects(font, glyphs, first_id):
+    """
+    Returns the five objects embedding the subset of `font` drawing `glyphs` ({glyph ID:
+    character}): the Type0 font (object `first_id`), its CIDFont, font descriptor, font file
+    and ToUnicode map, and the map of the glyph IDs to those of the subset.
+    """
+    font_file, new_ids = font.subset(glyphs)
+    # Subset fonts are named with a tag derived from their glyphs, keeping the output deterministic
+    digest = hashlib.sha256(repr(sorted(glyphs)).encode()).digest()
+    name = ("".join(chr(65 + byte % 26) for byte in digest[:6]) + "+" + font.name).encode()
+    widths = b" ".join(b"%d [%d]" % (new_ids[glyph], font.widths[glyph]) for glyph in sorted(glyphs))
+    objects = [
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H /DescendantFonts [%d 0 R] "
+        b"/ToUnicode %d 0 R >>" % (name, first_id + 1, first_id + 4),
+        b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s "
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+        b"/FontDescriptor %d 0 R /CIDToGIDMap /Identity /W [%s] >>" % (name, first_id + 2, widths),
+        b"<< /Type /FontDescriptor /FontName /%s /Flags 32 /FontBBox [%s] /ItalicAngle 0 /Ascent %d "
+        b"/Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>" % (
+            name, " ".join(map(str, font.bbox)).encode(), font.ascent, font.descent, font.cap_height, first_id + 3),
+        _stream(font_file, b" /Length1 %d" % len(font_file)),
+        _stream(_to_unicode({new_ids[glyph]: char for glyph, char in glyphs.items()})),
+    ]
+    return objects, new_ids
+
+
+def render_pdf(document, stream):
+    """
+    Writes a ResumeDocument to `stream` as a PDF file.
+
+    Args:
+        document (ResumeDocument): The parsed resume.
+        stream: A writable binary file object, such as io.BytesIO.
+    """
+    template = get_template()
+    pages = layout(document, template)
+
+    # Objects 1-2 are the catalog and the page tree, 3-7 and 8-12 the two fonts, then a page
+    # and its content stream per page
+    font_ids = {"F1": 3, "F2": 8}
+    page_ids = [13 + 2 * number for number in range(len(pages))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(pages)),
+    ]
+    # Only the glyphs the document draws are embedded, {font: {glyph ID: character}}
+    used = {font: {} for font in font_ids}
+    for lines in pages:
+        for font, _, _, _, text in lines:
+            used[font].update(zip(template.fonts[font].glyph_ids(text), text))
+    glyph_maps = {}
+    for font, first_id in font_ids.items():
+        font_objects, glyph_maps[font] = _font_objects(template.fonts[font], used[font], first_id)
+        objects.extend(font_objects)
+    for page_id, lines in zip(page_ids, pages):
+        content = _content(lines, template, glyph_maps)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                       b"/Resources << /Font << /F1 3 0 R /F2 8 0 R >> >> /Contents %d 0 R >>"
+                       % (PAGE_WIDTH, PAGE_HEIGHT, page_id + 1))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(content), content))
+
+    offsets = []
+    position = 0
+
+    def write(data):
+        nonlocal position
+        stream.write(data)
+        position += len(data)
+
+    write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    for number, body in enumerate(objects, start=1):
+        offsets.append(position)
+        write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = position
+    write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
@@ -0,0 +1,118 @@
+"""
+Decoding of the PHP-serialized arrays JobSearch stores in postmeta.
+
+JobSearch writes repeater fields and skills as arrays of strings indexed from zero:
+
+    a:2:{i:0;s:5:"Hello";i:1;s:6:"World!";}
+
+decode_string_array parses exactly that shape directly on the str, without the bytes
+round trip of phpserialize. Anything else (nested arrays, non-string values, malformed
+lengths) falls back to phpserialize, and results are memoized because the same values are
+parsed repeatedly while a candidate is processed.
+
+"""
+
+import functools
+import logging
+
+# Number of distinct serialized values remembered by parse_php_serialized
+MEMO_SIZE = 2048
+
+
+def _digits(text):
+    """Parses a non-negative decimal integer, rejecting the signs, spaces and underscores int() accepts."""
+    if not (text.isascii() and text.isdigit()):
+        raise ValueError(f"Not a PHP integer: {text!r}")
+    return int(text)
+
+
+def decode_string_array(data):
+    """
+    Decodes a PHP-serialized array of strings with integer keys.
+
+    Args:
+        data (str): The serialized value.
+
+    Returns:
+        list: The string values in order, or None if the value has any other shape.
+    """
+    if not data.startswith('a:'):
+        return None
+    try:
+        brace = data.index(':{', 2)
+        count = _digits(data[2:brace])
+        pos = brace + 2
+        values = []
+        for index in range(count):
+            # Keys must run 0, 1, 2, ... so the result matches phpserialize's dict values
+            if not data.startswith('i:', pos):
+                return None
+            semicolon = data.index(';', pos)
+            if _digits(data[pos + 2:semicolon]) != index:
+                return None
+            pos = semicolon + 1
+
+            if not data.startswith('s:', pos):
+                return None
+            colon = data.index(':', pos + 2)
+            length = _digits(data[pos + 2:colon])
+            if data[colon + 1] != '"':
+                return None
+            start = colon + 2
+            value = data[start:start + length]
+            if not value.isascii():
+                # The length counts UTF-8 bytes, so a non-ASCII value spans fewer characters
+                value = value.encode('utf-8')[:length].decode('utf-8')
+            end = start + len(value)
+            if not data.startswith('";', end):
+                return None
+            values.append(value)
+            pos = end + 2
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+
+    if data[pos:] != '}':
+        return None
+    return values
+
+
+def _parse_with_phpserialize(data):
+    # Imported on first use: the fast path handles the values JobSearch writes
+    import phpserialize
+
+    try:
+        parsed_data = phpserialize.loads(data.encode('utf-8'))
+    except Exception as e:
+        logging.warning(f"Error parsing PHP serialized data: {e}")
+        return data  # Return original data on error
+
+    # Check if parsed data is a dictionary
+    if isinstance(parsed_data, dict):
+        # Convert dictionary values (bytes) to strings and return as list
+        return [value.decode('utf-8') if isinstance(value, bytes) else str(value)
+                for value in parsed_data.values()]
+    # Not a dictionary, return the original data
+    return data
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def _parse_memoized(data):
+    values = decode_string_array(data)
+    if values is None:
+        values = _parse_with_phpserialize(data)
+    return tuple(values) if isinstance(values, list) else values
+
+
+def parse_php_serialized(data):
+    """
+    Parses a PHP serialized string.
+    Args:
+        data: The PHP serialized string to parse.
+    Returns:
+        A Python list of values or the original data on error.
+    """
+    if not data:
+        return data
+    values = _parse_memoized(data)
+    # Hand out a fresh list, the memoized tuple is shared
+    return list(values) if isinstance(values, tuple) else values
@@ -0,0 +1,233 @@
+"""
+Background pre-generation of resumes for candidates whose data changed.
+
+A timer in function_app calls pregenerate(), which looks for candidates whose resume-relevant
+postmeta changed since the watermark stored by the previous run, regenerates their resumes
+and stores them in the resume cache. They reach every instance through the cache's shared
+tier (see resume_cache.py); with that tier disabled they only serve the instance that ran the
+timer. The cache is keyed by the candidate's parsed data, so http_incognito serves a
+pre-generated resume only while that data is unchanged and can never return a stale one; a
+missed change just means the candidate waits for the LLM as before.
+
+WordPress has no change timestamp on postmeta, so the watermark has two parts:
+
+    meta_id     The highest meta_id among the resume-relevant meta_keys. Catches rows that
+                were added (new repeater fields, first-time profile data).
+    modified    The latest post_modified_gmt of the candidate posts. Catches profile saves
+                that update existing rows in place.
+
+The first run only records the watermark; backfills are the job of batch_generate.py. Two
+stores keep the watermark between runs:
+
+    table   Azure Table Storage in the function app's storage account (AzureWebJobsStorage),
+            so it survives instance recycles and the timer running on another instance.
+            Needs the azure-data-tables package.
+    file    A local JSON file, for development. It is lost when the instance is recycled,
+            which only makes the next run start over with a fresh watermark.
+
+Settings come from the optional PREGENERATE section (see settings.py):
+
+    MAX_GENERATIONS   LLM calls per run at most (default 50); the rest wait for the next run.
+    CONCURRENCY       Resumes generated in parallel (default 2).
+    POST_TYPE         Post type of JobSearch candidates (default candidate).
+    STATE_STORE       table or file (default table).
+    STATE_TABLE       Table of the table store (default pregenerate).
+    STATE_PATH        JSON file of the file store (default in the temp dir).
+
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from create_resume import generate_resume, resume_cache_key
+from db_pool import get_pool
+from parse_postmeta import (CANDIDATE_META_KEYS, fetch_postmeta_rows, parse_candidate_rows, postmeta_table,
+                            wordpress_table)
+from resume_cache import get_resume_cache
+from settings import get_section
+
+# Candidates whose postmeta is fetched with one query
+FETCH_CHUNK = 100
+
+
+class FileWatermarkStore:
+    """Watermark store in a local JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """
+        Returns:
+            dict: The watermark saved by the previous run ({"meta_id": int, "modified": str}),
+            or None on the first run.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logging.warning(f"Ignoring unreadable pre-generation state {self.path}: {e}")
+            return None
+
+    def save(self, watermark):
+        """Writes the watermark atomically, so a crash never leaves a truncated state file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False) as f:
+            json.dump(watermark, f)
+        os.replace(f.name, self.path)
+
+
+class TableWatermarkStore:
+    """Watermark store in an Azure Storage table, as a single entity."""
+
+    def __init__(self, connection_string, table_name):
+        # Imported here so the file store works without the package
+        from azure.data.tables import TableServiceClient
+
+        service = TableServiceClient.from_connection_string(connection_string)
+        self._table = service.create_table_if_not_exists(table_name)
+
+    def load(self):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            entity = self._table.get_entity(partition_key="pregenerate", row_key="watermark")
+        except ResourceNotFoundError:
+            return None
+        return json.loads(entity["data"])
+
+    def save(self, watermark):
+        self._table.upsert_entity({"PartitionKey": "pregenerate", "RowKey": "watermark",
+                                   "data": json.dumps(watermark)})
+
+
+def get_watermark_store():
+    """
+    Returns the watermark store selected by the PREGENERATE STATE_STORE setting.
+    """
+    section = get_section('PREGENERATE')
+    kind = section.get('STATE_STORE', fallback='table').lower()
+    if kind == 'file':
+        return FileWatermarkStore(
+            section.get('STATE_PATH', fallback=os.path.join(tempfile.gettempdir(), 'pregenerate_state.json')))
+    if kind == 'table':
+        return TableWatermarkStore(os.environ['AzureWebJobsStorage'],
+                                   section.get('STATE_TABLE', fallback='pregenerate'))
+    raise ValueError(f"Unknown pre-generation state store: {kind!r}")
+
+
+def _meta_keys():
+    return ", ".join(["%s"] * len(CANDIDATE_META_KEYS))
+
+
+def current_watermark(cursor, post_type):
+    """
+    Returns:
+        dict: The highest resume-relevant meta_id and the latest candidate post_modified_gmt.
+    """
+    cursor.execute(
+        f"SELECT (SELECT MAX(meta_id) FROM {postmeta_table()} WHERE meta_key IN ({_meta_keys()})) AS meta_id, "
+        f"(SELECT MAX(post_modified_gmt) FROM {wordpress_table('posts')} WHERE post_type = %s) AS modified",
+        CANDIDATE_META_KEYS + (post_type,))
+    row = cursor.fetchall()[0]
+    return {"meta_id": int(row["meta_id"] or 0), "modified": str(row["modified"] or "1970-01-01 00:00:00")}
+
+
+def changed_candidates(cursor, post_type, since):
+    """
+    Returns:
+        list: The post_ids whose resume-relevant rows were added, or whose post was saved,
+        after the `since` watermark.
+    """
+    cursor.execute(
+        f"SELECT DISTINCT post_id FROM {postmeta_table()} WHERE meta_id > %s AND meta_key IN ({_meta_keys()}) "
+        f"UNION SELECT ID FROM {wordpress_table('posts')} WHERE post_type = %s AND post_modified_gmt > %s",
+        (since["meta_id"],) + CANDIDATE_META_KEYS + (post_type, since["modified"]))
+    return sorted(int(row["post_id"]) for row in cursor.fetchall())
+
+
+def _generate(candidate_id, resume_data, key, cache):
+    try:
+        cache.put(key, generate_resume(resume_data))
+        return True
+    except Exception as e:
+        logging.error(f"Pre-generation failed for candidate {candidate_id}: {e}")
+        return False
+
+
+def pregenerate():
+    """
+    Regenerates the resumes of the candidates that changed since the previous run.
+
+    The watermark only advances once every changed candidate has been handled, so candidates
+    left over by MAX_GENERATIONS are picked up again by the next run; their resumes that
+    were already generated are then cache hits.
+
+    Returns:
+        dict: Counts of the run (changed, unchanged, generated, failed, deferred, skipped).
+        Failed candidates are not retried; http_incognito generates them on demand.
+    """
+    import mysql.connector
+
+    section = get_section('PREGENERATE')
+    max_generations = section.getint('MAX_GENERATIONS', fallback=50)
+    post_type = section.get('POST_TYPE', fallback='candidate')
+    summary = {"changed": 0, "unchanged": 0, "generated": 0, "failed": 0, "deferred": 0, "skipped": 0}
+
+    cache = get_resume_cache()
+    if cache is None:
+        logging.warning("Resume pre-generation needs the resume cache, which is disabled")
+        return summary
+
+    state = get_watermark_store()
+    since = state.load()
+    start = time.monotonic()
+    try:
+        with get_pool().connection() as cnx:
+            with cnx.cursor(dictionary=True) as cursor:
+                # Read the new watermark first: changes made during the run are seen again next time
+                watermark = current_watermark(cursor, post_type)
+                candidate_ids = changed_candidates(cursor, post_type, since) if since else []
+    except mysql.connector.Error as err:
+        raise Exception(f"Database connection error: {err}")
+
+    if since is None:
+        state.save(watermark)
+        logging.info(f"Pre-generation watermark initialized at {watermark}")
+        return summary
+
+    summary["changed"] = len(candidate_ids)
+    pending = []
+    for chunk_start in range(0, len(candidate_ids), FETCH_CHUNK):
+        rows_by_candidate = fetch_postmeta_rows(candidate_ids[chunk_start:chunk_start + FETCH_CHUNK])
+        for candidate_id, rows in rows_by_candidate.items():
+            resume_data = parse_candidate_rows(rows)
+            if isinstance(resume_data, dict):
+                # Not a complete candidate (yet), http_incognito would reject it too
+                summary["skipped"] += 1
+                continue
+            key = resume_cache_key(resume_data)
+            if cache.peek(key) is not None:
+                summary["unchanged"] += 1
+                continue
+            pending.append((candidate_id, resume_data, key))
+
+    deferred = pending[max_generations:]
+    with ThreadPoolExecutor(max_workers=section.getint('CONCURRENCY', fallback=2)) as executor:
+        results = list(executor.map(lambda job: _generate(*job, cache), pending[:max_generations]))
+    summary["generated"] = results.count(True)
+    summary["failed"] = results.count(False)
+    summary["deferred"] = len(deferred)
+
+    if deferred:
+        logging.info(f"Pre-generation deferred {len(deferred)} candidates to the next run")
+    else:
+        state.save(watermark)
+    logging.info(f"Pre-generation finished in {time.monotonic() - start:.1f}s: {summary}")
+    return summary
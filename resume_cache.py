@@ -0,0 +1,305 @@
+"""
+Content-addressed cache of generated resumes.
+
+A resume is cached under a hash of the normalized candidate JSON, the prompt template
+version, the model and the sampling parameters, so it is reused only when the LLM would
+be asked exactly the same thing again. The cache has three tiers, looked up in order:
+
+    memory  An in-process LRU that serves repeated requests within a worker.
+    disk    A SQLite file shared by the workers of an instance, surviving restarts.
+    shared  An Azure Storage table in the function app's storage account (AzureWebJobsStorage),
+            shared by every instance, so a resume generated on one instance (for example by
+            pregenerate.py) is served by all of them. Needs the azure-data-tables package.
+
+A hit in a lower tier is copied into the tiers above it. Every tier honours a TTL; the disk
+tier is additionally bounded by its total size. Errors of the shared tier are logged and
+count as misses, they never fail a request. Settings come from the optional CACHE section
+(see settings.py):
+
+    ENABLED           Set to false to disable caching altogether (default true).
+    MEMORY_ENTRIES    Maximum number of resumes kept in memory (default 256).
+    TTL_SECONDS       Lifetime of a cached resume (default 7 days).
+    PATH              SQLite file of the disk tier, empty to disable it (default in the temp dir).
+    MAX_BYTES         Maximum total size of the disk tier (default 50 MB).
+    SHARED_TABLE      Table of the shared tier, empty to disable it (default resumecache).
+
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from settings import get_section
+
+
+def normalize_candidate(candidate_info):
+    """
+    Returns a canonical compact JSON string for candidate data given as a Candidate, a dict
+    or a JSON string.
+    """
+    if hasattr(candidate_info, 'to_dict'):
+        candidate_info = candidate_info.to_dict()
+    elif isinstance(candidate_info, str):
+        try:
+            candidate_info = json.loads(candidate_info)
+        except ValueError:
+            return candidate_info
+    return json.dumps(candidate_info, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def make_cache_key(candidate_info, prompt_version, model, params):
+    """
+    Builds the cache key of a resume generation.
+    Args:
+        candidate_info: The candidate data passed to the LLM (Candidate, dict or JSON string).
+        prompt_version (str): Version of the prompt template.
+        model (str): The LLM model name.
+        params (dict): Sampling parameters such as max_tokens and temperature.
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for part in (prompt_version, model, json.dumps(params, sort_keys=True), normalize_candidate(candidate_info)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class SharedTier:
+    """Resume cache tier in an Azure Storage table, one entity per key."""
+
+    def __init__(self, connection_string, table_name):
+        # Imported here so the cache works without the package when the tier is disabled
+        from azure.data.tables import TableServiceClient
+
+        service = TableServiceClient.from_connection_string(connection_string)
+        self._table = service.create_table_if_not_exists(table_name)
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: The value and its expiry time, or None if the key is not stored.
+        """
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            # Partitioned by the first characters of the hash, spreading keys evenly
+            entity = self._table.get_entity(partition_key=key[:2], row_key=key)
+        except ResourceNotFoundError:
+            return None
+        return entity["value"], entity["expires_at"]
+
+    def put(self, key, value, expires_at):
+        self._table.upsert_entity({"PartitionKey": key[:2], "RowKey": key, "value": value,
+                                   "expires_at": expires_at})
+
+
+class ResumeCache:
+    """
+    Three-tier (memory LRU + SQLite + shared table) cache of resume texts with TTL and
+    size-based eviction.
+    """
+
+    def __init__(self, memory_entries=256, ttl_seconds=7 * 24 * 3600, path=None, max_bytes=50 * 1024 * 1024,
+                 shared=None):
+        """
+        Args:
+            memory_entries (int): Maximum number of entries in the memory tier.
+            ttl_seconds (float): Lifetime of an entry in every tier.
+            path (str): SQLite file of the disk tier, or None for no disk tier.
+            max_bytes (int): Maximum total size of the values in the disk tier.
+            shared (SharedTier): The tier shared by all instances, or None.
+        """
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._shared = shared
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS resumes ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS resumes_accessed_at ON resumes (accessed_at)")
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
+
+    def get(self, key):
+        """
+        Returns:
+            str: The cached resume, or None on a miss.
+        """
+        return self._lookup(key, count=True)
+
+    def peek(self, key):
+        """Like get(), without counting a hit or miss, for checks that are not requests."""
+        return self._lookup(key, count=False)
+
+    def _lookup(self, key, count):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    if count:
+                        self._stats["memory_hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM resumes WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE resumes SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[0], row[1])
+                    if count:
+                        self._stats["disk_hits"] += 1
+                    return row[0]
+
+        # Outside the lock, so a slow storage call does not hold up other lookups
+        entry = self._get_shared(key)
+        with self._lock:
+            if entry is not None and entry[1] > now:
+                self._remember(key, entry[0], entry[1])
+                self._store_disk(key, entry[0], entry[1], now)
+                if count:
+                    self._stats["shared_hits"] += 1
+                return entry[0]
+            if count:
+                self._stats["misses"] += 1
+            return None
+
+    def _get_shared(self, key):
+        if self._shared is None:
+            return None
+        try:
+            return self._shared.get(key)
+        except Exception as e:
+            logging.warning(f"Shared resume cache lookup failed: {e}")
+            with self._lock:
+                self._stats["shared_errors"] += 1
+            return None
+
+    def _store_disk(self, key, value, expires_at, now):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO resumes (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value.encode('utf-8')), expires_at, now))
+        self._evict(now)
+
+    def put(self, key, value):
+        """Stores a resume in every tier, evicting expired and least recently used entries."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._stats["stores"] += 1
+            self._store_disk(key, value, expires_at, now)
+        if self._shared is not None:
+            try:
+                self._shared.put(key, value, expires_at)
+            except Exception as e:
+                logging.warning(f"Shared resume cache store failed: {e}")
+                with self._lock:
+                    self._stats["shared_errors"] += 1
+
+    def _evict(self, now):
+        expired = self._db.execute("DELETE FROM resumes WHERE expires_at <= ?", (now,)).rowcount
+        self._stats["disk_evictions"] += max(expired, 0)
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM resumes").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM resumes ORDER BY accessed_at").fetchall():
+            self._db.execute("DELETE FROM resumes WHERE key = ?", (key,))
+            self._stats["disk_evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def record_bypass(self):
+        """Counts a request that skipped the cache on purpose."""
+        with self._lock:
+            self._stats["bypasses"] += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit, miss, store, bypass, eviction and shared tier error counters plus the
+            memory tier size.
+        """
+        with self._lock:
+            stats = {name: self._stats[name] for name in (
+                "memory_hits", "disk_hits", "shared_hits", "misses", "stores", "bypasses", "memory_evictions",
+                "disk_evictions", "shared_errors")}
+            stats["memory_entries"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["shared_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _shared_tier(table_name):
+    """Returns the shared tier of the resume cache, or None if it is disabled or unavailable."""
+    if not table_name:
+        return None
+    try:
+        return SharedTier(os.environ['AzureWebJobsStorage'], table_name)
+    except Exception as e:
+        logging.error(f"Shared resume cache tier unavailable, caching per instance only: {e}")
+        return None
+
+
+def get_resume_cache():
+    """
+    Returns the process-wide resume cache, or None if caching is disabled in the settings.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = get_section('CACHE')
+                if not cache.getboolean('ENABLED', fallback=True):
+                    return None
+                path = cache.get('PATH', fallback=os.path.join(tempfile.gettempdir(), 'resume_cache.sqlite3'))
+                options = {
+                    "memory_entries": cache.getint('MEMORY_ENTRIES', fallback=256),
+                    "ttl_seconds": cache.getfloat('TTL_SECONDS', fallback=7 * 24 * 3600),
+                    "shared": _shared_tier(cache.get('SHARED_TABLE', fallback='resumecache')),
+                }
+                try:
+                    _cache = ResumeCache(path=path or None,
+                                         max_bytes=cache.getint('MAX_BYTES', fallback=50 * 1024 * 1024), **options)
+                except sqlite3.Error as e:
+                    logging.error(f"Resume cache disk tier unavailable, continuing without it: {e}")
+                    _cache = ResumeCache(**options)
+    return _cache
+
+
+def resume_cache_stats():
+    """
+    Returns:
+        dict: The resume cache statistics, or an empty dict if the cache is not in use.
+    """
+    return _cache.stats() if _cache is not None else {}
@@ -0,0 +1,120 @@
+"""
+Structure of a generated resume, parsed from the LLM's text for the document renderers.
+
+The LLM returns plain text (see create_resume.fix_resume_bullets), usually laid out as:
+
+    Jane Doe
+    555-0100 | jane@example.com
+
+    PROFESSIONAL EXPERIENCE
+    Senior Accountant, Acme Corp (2019 - 2023)
+    • Closed the books five days faster
+
+parse_resume turns it into a ResumeDocument: the name, the contact lines below it, and the
+sections with their paragraphs and bullets. Headings are recognized as markdown headings
+("## Skills"), bold lines ("**Skills**"), short all-caps lines ("SKILLS") or short lines
+ending in a colon ("Skills:"). Markdown emphasis is dropped, since the renderers apply the
+template's styles instead.
+
+"""
+
+import re
+from dataclasses import dataclass, field
+
+PARAGRAPH = "paragraph"
+BULLET = "bullet"
+
+# Longest line that can still be an all-caps or colon heading
+HEADING_MAX_LENGTH = 60
+
+_BULLET = re.compile(r"^\s*(?:[•◦▪●*]|-(?!-))\s*")
+_MARKDOWN_HEADING = re.compile(r"^\s*#{1,6}\s+")
+_EMPHASIS = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+
+
+@dataclass(slots=True)
+class Block:
+    kind: str
+    text: str
+
+
+@dataclass(slots=True)
+class Section:
+    heading: str = ""
+    blocks: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ResumeDocument:
+    name: str = ""
+    contact: list = field(default_factory=list)
+    sections: list = field(default_factory=list)
+
+
+def _plain(text):
+    """Drops markdown emphasis markers."""
+    return _EMPHASIS.sub(lambda match: match.group(1) or match.group(2), text).strip()
+
+
+def heading_text(line):
+    """
+    Returns:
+        str: The heading of a line that is a section heading, else None.
+    """
+    stripped = line.strip()
+    if _MARKDOWN_HEADING.match(stripped):
+        return _plain(_MARKDOWN_HEADING.sub("", stripped)).rstrip(":")
+    if stripped.startswith("**") and stripped.endswith("**") and len(stripped) > 4:
+        return _plain(stripped).rstrip(":")
+    if len(stripped) > HEADING_MAX_LENGTH:
+        return None
+    letters = [c for c in stripped if c.isalpha()]
+    if len(letters) > 2 and all(c.isupper() for c in letters):
+        return _plain(stripped).rstrip(":")
+    if stripped.endswith(":") and not _BULLET.match(stripped) and len(stripped.split()) <= 5:
+        return _plain(stripped[:-1])
+    return None
+
+
+def parse_resume(text):
+    """
+    Parses the text of a resume.
+
+    Args:
+        text (str): The resume text returned by generate_resume.
+
+    Returns:
+        ResumeDocument: The name, contact lines and sections of the resume.
+    """
+    document = ResumeDocument()
+    lines = text.splitlines()
+    position = 0
+
+    # The header: the first line is the name (however it is marked up), the lines up to the
+    # first blank line or heading are contact details
+    while position < len(lines) and not lines[position].strip():
+        position += 1
+    if position < len(lines):
+        document.name = _plain(_MARKDOWN_HEADING.sub("", lines[position].strip()))
+        position += 1
+        while position < len(lines) and lines[position].strip() and heading_text(lines[position]) is None:
+            document.contact.append(_plain(lines[position]))
+            position += 1
+
+    section = None
+    for line in lines[position:]:
+        if not line.strip():
+            continue
+        heading = heading_text(line)
+        if heading is not None:
+            section = Section(heading)
+            document.sections.append(section)
+            continue
+        if section is None:
+            section = Section()
+            document.sections.append(section)
+        if _BULLET.match(line):
+            section.blocks.append(Block(BULLET, _plain(_BULLET.sub("", line, count=1))))
+        else:
+            section.blocks.append(Block(PARAGRAPH, _plain(line)))
+    return document
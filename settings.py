@@ -0,0 +1,86 @@
+"""
+Application settings, loaded once per worker process.
+
+Settings are read from config.ini and can be overridden (or supplied entirely) through
+environment variables, which is how Azure Functions exposes app settings. An environment
+variable named <SECTION>__<KEY> overrides that key, for example:
+
+    DATABASE__HOST=198.51.100.7
+    DATABASE__POOL_SIZE=8
+    LLM__ANTHROPIC_KEY=sk-ant-...
+
+The standard ANTHROPIC_API_KEY variable is also honoured for LLM.ANTHROPIC_KEY.
+
+"""
+
+import configparser
+import os
+import threading
+
+CONFIG_FILE = 'config.ini'
+
+# Well-known environment variables mapped onto (section, key)
+ENV_ALIASES = {
+    "ANTHROPIC_API_KEY": ("LLM", "ANTHROPIC_KEY"),
+}
+
+_settings = None
+_settings_lock = threading.Lock()
+
+
+def load_settings(path=CONFIG_FILE, environ=None):
+    """
+    Reads settings from a config file and applies environment overrides.
+    Args:
+        path (str): Path of the config.ini file. A missing file is not an error.
+        environ (dict): Environment to read overrides from (defaults to os.environ).
+    Returns:
+        configparser.ConfigParser: The merged settings.
+    """
+    environ = os.environ if environ is None else environ
+    # Keep keys upper case, matching config.ini and the lookups throughout the app
+    config = configparser.ConfigParser()
+    config.optionxform = str.upper
+    config.read(path)
+
+    for name, (section, key) in ENV_ALIASES.items():
+        if environ.get(name):
+            if not config.has_section(section):
+                config.add_section(section)
+            config.set(section, key, environ[name].replace('%', '%%'))
+
+    for name, value in environ.items():
+        section, sep, key = name.partition('__')
+        if not sep or not section or not key:
+            continue
+        section = section.upper()
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, key.upper(), value.replace('%', '%%'))
+
+    return config
+
+
+def get_settings():
+    """
+    Returns the process-wide settings, loading them on first use.
+    """
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = load_settings()
+    return _settings
+
+
+def get_section(name):
+    """
+    Returns a settings section. A section missing from the configuration is returned empty,
+    so every lookup on it falls back to its default.
+    """
+    settings = get_settings()
+    if not settings.has_section(name):
+        with _settings_lock:
+            if not settings.has_section(name):
+                settings.add_section(name)
+    return settings[name]
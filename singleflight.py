@@ -0,0 +1,144 @@
+"""
+Coalescing of concurrent identical work ("single flight").
+
+The WordPress front end often requests the same candidate several times at once (double
+clicks, retries, page reloads). A SingleFlight lets the first caller for a key do the work
+while every concurrent caller with the same key waits for it and gets the same result, or
+the same exception. Callers that arrive after the work finished start a new flight.
+
+Two flights are shared by the routes:
+
+    candidate_fetches  get_candidate_data, keyed by candidate ID.
+    generations        generate_resume, keyed by the resume cache key (the hash of the
+                       candidate data, prompt version, model and parameters), so only
+                       callers that would send the LLM the exact same input share a call.
+
+Sync (thread) and async callers can share a flight. Settings come from the optional
+COALESCE section (see settings.py):
+
+    ENABLED          Set to false to run every request on its own (default true).
+    TIMEOUT_SECONDS  How long a caller waits for another caller's work (default 300).
+
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import threading
+
+from settings import get_section
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time and hands its outcome to all concurrent callers.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def _join(self, key):
+        """
+        Returns:
+            tuple: The shared future of the key and whether the caller leads the flight.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future, False
+            future = concurrent.futures.Future()
+            self._calls[key] = future
+            self._stats["executions"] += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            del self._calls[key]
+            if error is not None:
+                self._stats["errors"] += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _timeout_error(self, timeout):
+        with self._lock:
+            self._stats["timeouts"] += 1
+        return TimeoutError(f"Gave up waiting {timeout:.0f}s for a concurrent {self.name}")
+
+    def run(self, key, fn, *args):
+        """
+        Returns `fn(*args)`, or the result of the call already running for `key`.
+        """
+        section = get_section('COALESCE')
+        if not section.getboolean('ENABLED', fallback=True):
+            return fn(*args)
+        future, leader = self._join(key)
+        if leader:
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                # Waiting callers get a plain exception even if the leader was interrupted
+                self._finish(key, future, error=e if isinstance(e, Exception) else RuntimeError(
+                    f"Concurrent {self.name} was interrupted"))
+                raise
+            self._finish(key, future, result)
+            return result
+
+        timeout = section.getfloat('TIMEOUT_SECONDS', fallback=300.0)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            raise self._timeout_error(timeout) from None
+
+    async def run_async(self, key, fn, *args):
+        """
+        Like run(), for a coroutine function `fn`. Waiting never blocks the event loop.
+        """
+        section = get_section('COALESCE')
+        if not section.getboolean('ENABLED', fallback=True):
+            return await fn(*args)
+        future, leader = self._join(key)
+        if leader:
+            try:
+                result = await fn(*args)
+            except BaseException as e:
+                self._finish(key, future, error=e if isinstance(e, Exception) else RuntimeError(
+                    f"Concurrent {self.name} was interrupted"))
+                raise
+            self._finish(key, future, result)
+            return result
+
+        timeout = section.getfloat('TIMEOUT_SECONDS', fallback=300.0)
+        try:
+            # Shielded, so a waiter that times out or is cancelled leaves the shared call alone
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            raise self._timeout_error(timeout) from None
+
+    def stats(self):
+        """
+        Returns:
+            dict: Executions, coalesced callers (duplicate calls avoided), errors, timeouts
+            and the number of calls in flight.
+        """
+        with self._lock:
+            stats = {name: self._stats[name] for name in ("executions", "coalesced", "errors", "timeouts")}
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+candidate_fetches = SingleFlight("candidate fetch")
+generations = SingleFlight("resume generation")
+
+
+def coalescing_stats():
+    """
+    Returns:
+        dict: The statistics of both flights; generations.coalesced counts the LLM calls avoided.
+    """
+    return {"candidate_fetches": candidate_fetches.stats(), "generations": generations.stats()}
@@ -0,0 +1,222 @@
+"""
+Tests of the PDF writer and font subsetter in pdf_render.py.
+
+The rendered files are parsed back with the standard library only: the cross-reference table,
+the page content streams, the ToUnicode maps and the embedded subset fonts. If fontTools is
+installed, the subset fonts are also loaded with it and compared to the original fonts.
+
+Usage:
+
+    python -m pytest tests
+    python -m unittest discover tests
+
+"""
+
+import importlib.util
+import io
+import os
+import re
+import struct
+import sys
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pdf_render  # noqa: E402
+from resume_document import parse_resume  # noqa: E402
+
+RESUME = """Ελένη Παπαδοπούλου
++30 210 000 0000 | eleni@example.com | Αθήνα
+
+SUMMARY
+Product manager who led café and naïve Bayes projects in Жанна's team, Zürich.
+
+EXPERIENCE
+• Reduced onboarding time by 40% across 3 regional offices
+• Launched the Ελληνικά and Русский editions of the customer portal
+• Shipped 東京 integration
+"""
+
+
+def render(text):
+    stream = io.BytesIO()
+    pdf_render.render_pdf(parse_resume(text), stream)
+    return stream.getvalue()
+
+
+def read_objects(pdf):
+    """Returns {object number: (dictionary, stream data or None)}, found through the xref table."""
+    xref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", pdf).group(1))
+    assert pdf[xref:xref + 5] == b"xref\n"
+    header, _, entries = pdf[xref + 5:].partition(b"\n")
+    first, count = map(int, header.split())
+    objects = {}
+    for number in range(first + 1, first + count):
+        entry = entries[20 * number:20 * number + 20]
+        assert entry.endswith(b" n \n"), entry
+        offset = int(entry[:10])
+        match = re.compile(rb"(\d+) 0 obj\n").match(pdf, offset)
+        assert match and int(match.group(1)) == number, (number, pdf[offset:offset + 20])
+        body_at = match.end()
+        stream_at = pdf.find(b"\nstream\n", body_at)
+        end_at = pdf.find(b"\nendobj\n", body_at)
+        if stream_at != -1 and stream_at < end_at:
+            dictionary = pdf[body_at:stream_at]
+            length = int(re.search(rb"/Length (\d+)", dictionary).group(1))
+            data = pdf[stream_at + 8:stream_at + 8 + length]
+            assert pdf[stream_at + 8 + length:].startswith(b"\nendstream\nendobj\n")
+            objects[number] = (dictionary, zlib.decompress(data))
+        else:
+            objects[number] = (pdf[body_at:end_at], None)
+    return objects
+
+
+def reference(dictionary, key):
+    return int(re.search(rb"/%s (\d+) 0 R" % key, dictionary).group(1))
+
+
+def read_fonts(objects):
+    """
+    Returns {font resource: (ToUnicode map {CID: text}, widths {CID: width}, font file)} of the
+    fonts of the first page.
+    """
+    page = next(dictionary for dictionary, _ in objects.values() if b"/Type /Page " in dictionary)
+    fonts = {}
+    for resource, font_id in re.findall(rb"/(F\d) (\d+) 0 R", page):
+        font = objects[int(font_id)][0]
+        to_unicode = objects[reference(font, b"ToUnicode")][1]
+        mappings = b"".join(re.findall(rb"beginbfchar\n(.*?)endbfchar", to_unicode, re.DOTALL))
+        cids = {int(cid, 16): bytes.fromhex(text.decode()).decode('utf-16-be')
+                for cid, text in re.findall(rb"<([0-9A-F]{4})> <([0-9A-F]+)>", mappings)}
+        descendant = objects[int(re.search(rb"/DescendantFonts \[(\d+) 0 R\]", font).group(1))][0]
+        widths = {int(cid): int(width) for cid, width in re.findall(rb"(\d+) \[(\d+)\]", descendant)}
+        descriptor = objects[reference(descendant, b"FontDescriptor")][0]
+        fonts[resource.decode()] = (cids, widths, objects[reference(descriptor, b"FontFile2")][1])
+    return fonts
+
+
+def page_text(objects, fonts):
+    """Returns the text drawn on each page, one line per Tj, decoded with the ToUnicode maps."""
+    pages = []
+    kids = re.search(rb"/Kids \[([^\]]*)\]", objects[reference(objects[1][0], b"Pages")][0]).group(1)
+    for page_id in re.findall(rb"(\d+) 0 R", kids):
+        content = objects[reference(objects[int(page_id)][0], b"Contents")][1]
+        lines = []
+        for font, glyphs in re.findall(rb"/(F\d) \d+ Tf [^<]*<([0-9a-f]*)> Tj", content):
+            cids = struct.unpack(f">{len(glyphs) // 4}H", bytes.fromhex(glyphs.decode()))
+            lines.append("".join(fonts[font.decode()][0].get(cid, "�") for cid in cids))
+        pages.append(lines)
+    return pages
+
+
+def font_tables(font_file):
+    """Returns {tag: data} of a TrueType font file, checking the table and file checksums."""
+    tables = {}
+    for number in range(struct.unpack_from(">H", font_file, 4)[0]):
+        tag, checksum, offset, length = struct.unpack_from(">4sIII", font_file, 12 + 16 * number)
+        data = font_file[offset:offset + length]
+        if tag == b"head":
+            data = data[:8] + b"\0\0\0\0" + data[12:]
+        assert pdf_render._checksum(data) == checksum, tag
+        tables[tag.decode('latin-1')] = font_file[offset:offset + length]
+    assert pdf_render._checksum(font_file) == 0xB1B0AFBA
+    return tables
+
+
+class RenderPdfTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pdf = render(RESUME)
+        cls.objects = read_objects(cls.pdf)
+        cls.fonts = read_fonts(cls.objects)
+        cls.template = pdf_render.get_template()
+
+    def test_header_and_trailer(self):
+        self.assertTrue(self.pdf.startswith(b"%PDF-1.4\n"))
+        self.assertIn(b"trailer\n<< /Size %d /Root 1 0 R >>" % (len(self.objects) + 1), self.pdf)
+        self.assertIn(b"/Type /Catalog", self.objects[1][0])
+
+    def test_text_round_trips_through_to_unicode(self):
+        lines = [line for page in page_text(self.objects, self.fonts) for line in page]
+        self.assertEqual(lines[0], "Ελένη Παπαδοπούλου")
+        self.assertIn("+30 210 000 0000 | eleni@example.com | Αθήνα", lines)
+        text = " ".join(lines)
+        for expected in ("café", "naïve", "Жанна's", "Zürich", "Ελληνικά", "Русский", "40%",
+                         "SUMMARY"):
+            self.assertIn(expected, text)
+
+    def test_missing_glyphs_are_drawn_as_notdef(self):
+        # DejaVu Sans has no CJK glyphs: they are drawn as glyph 0, which has no text
+        text = " ".join(line for page in page_text(self.objects, self.fonts) for line in page)
+        self.assertIn("Shipped �� integration", text)
+
+    def test_widths_match_the_original_and_embedded_fonts(self):
+        for resource, (cids, widths, font_file) in self.fonts.items():
+            font = self.template.fonts[resource]
+            # Every drawn glyph has a width, .notdef included, which has no text
+            self.assertLessEqual(set(cids), set(widths))
+            self.assertLessEqual(set(widths) - set(cids), {0})
+            for cid, char in cids.items():
+                self.assertEqual(widths[cid], font.width(char), (resource, char))
+
+            tables = font_tables(font_file)
+            units_per_em = struct.unpack_from(">H", tables["head"], 18)[0]
+            metric_count = struct.unpack_from(">H", tables["hhea"], 34)[0]
+            for cid, width in widths.items():
+                advance = struct.unpack_from(">H", tables["hmtx"], 4 * min(cid, metric_count - 1))[0]
+                self.assertEqual(round(advance * 1000 / units_per_em), width, (resource, cid))
+
+    def test_subset_glyphs_match_the_original_font(self):
+        for resource, (cids, _, font_file) in self.fonts.items():
+            font = self.template.fonts[resource]
+            tables = font_tables(font_file)
+            glyph_count = struct.unpack_from(">H", tables["maxp"], 4)[0]
+            self.assertLess(glyph_count, len(font.glyphs) // 10)
+            offsets = struct.unpack_from(f">{glyph_count + 1}I", tables["loca"])
+            self.assertEqual(offsets[-1], len(tables["glyf"]))
+            for cid, char in cids.items():
+                glyph = tables["glyf"][offsets[cid]:offsets[cid + 1]]
+                original = font.glyphs[font.glyph_ids(char)[0]]
+                if list(pdf_render._component_positions(original)):
+                    # Composite glyphs only differ in their renumbered component IDs
+                    self.assertEqual(len(glyph.rstrip(b"\0")), len(original.rstrip(b"\0")), char)
+                else:
+                    self.assertEqual(glyph.rstrip(b"\0"), original.rstrip(b"\0"), char)
+
+    def test_long_resumes_break_into_pages(self):
+        text = RESUME + "".join(f"• Bullet point number {number} of a long list\n" for number in range(120))
+        objects = read_objects(render(text))
+        pages = page_text(objects, read_fonts(objects))
+        self.assertGreater(len(pages), 1)
+        lines = [line for page in pages for line in page]
+        self.assertEqual([line for line in lines if line.startswith("Bullet point number")],
+                         [f"Bullet point number {number} of a long list" for number in range(120)])
+
+    def test_output_is_deterministic(self):
+        self.assertEqual(render(RESUME), self.pdf)
+
+
+@unittest.skipUnless(importlib.util.find_spec("fontTools"), "fontTools is not installed")
+class SubsetFontToolsTest(unittest.TestCase):
+
+    def test_subset_loads_with_the_same_outlines(self):
+        from fontTools.ttLib import TTFont
+
+        objects = read_objects(render(RESUME))
+        template = pdf_render.get_template()
+        for resource, (cids, _, font_file) in read_fonts(objects).items():
+            original = TTFont(pdf_render.REGULAR_FONT if resource == "F1" else pdf_render.BOLD_FONT)
+            subset = TTFont(io.BytesIO(font_file))
+            original_glyf, subset_glyf = original["glyf"], subset["glyf"]
+            for cid, char in cids.items():
+                name = original.getGlyphOrder()[template.fonts[resource].glyph_ids(char)[0]]
+                expected = original_glyf[name]
+                glyph = subset_glyf[subset.getGlyphOrder()[cid]]
+                self.assertEqual(glyph.getCoordinates(subset_glyf)[0], expected.getCoordinates(original_glyf)[0], char)
+                self.assertEqual(subset["hmtx"][subset.getGlyphOrder()[cid]], original["hmtx"][name], char)
+
+
+if __name__ == "__main__":
+    unittest.main()
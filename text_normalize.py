@@ -0,0 +1,70 @@
+r"""
+Normalization of the free-text descriptions candidates enter for their education and jobs.
+
+Candidates often paste HTML job descriptions, bullets copied from Word and tab-indented
+lists. clean_description turns them into a single line of plain text for the LLM prompt.
+
+The patterns are compiled once, the bullet and tab removals share one pass, and the newline
+collapsing and replacement share another; passes whose trigger characters do not occur in
+the text are skipped. The output is identical to the original six-step implementation:
+
+    re.sub(r'<[^>]+>', '', text)
+    text.strip('\n\r\t\u2019')
+    re.sub(r'^\s*[\u2022\uf0a7]\s*', '', text, flags=re.MULTILINE)
+    re.sub(r'^\s*\t+', '', text, flags=re.MULTILINE)
+    re.sub(r'[\n\r]\s*[\n\r]+', '\n', text)
+    text.replace('\n', ' ').replace('\r', ' ')
+
+"""
+
+import re
+
+# HTML tags
+TAG_PATTERN = re.compile(r'<[^>]+>')
+# Characters stripped from both ends of the text
+STRIP_CHARS = '\n\r\t\u2019'
+# A bullet (with the whitespace around it) or a run of tabs at the start of a line. A bullet
+# consumes all whitespace that follows it, so no tab run can start inside a removed bullet
+# and both removals can share one pass.
+INDENT_PATTERN = re.compile(r'^\s*(?:[\u2022\uf0a7]\s*|\t+)', re.MULTILINE)
+INDENT_CHARS = ('\u2022', '\uf0a7', '\t')
+# A run of blank lines collapses to one space, any other line break becomes a space
+NEWLINE_PATTERN = re.compile(r'[\n\r]\s*[\n\r]+|[\n\r]')
+
+
+def clean_description(description):
+    """
+    Cleans the description text by removing HTML tags, special characters, and formatting.
+    Args:
+        description (str): The description text to be cleaned.
+    Returns:
+        str: The cleaned description text.
+    """
+    text = description
+    # Remove HTML tags
+    if '<' in text:
+        text = TAG_PATTERN.sub('', text)
+    # Remove leading/trailing newlines, carriage returns, whitespace, and special characters
+    text = text.strip(STRIP_CHARS)
+    # Remove bullet points and tabs
+    if any(char in text for char in INDENT_CHARS):
+        text = INDENT_PATTERN.sub('', text)
+    # Collapse consecutive newlines and replace line breaks with spaces
+    if '\n' in text or '\r' in text:
+        text = NEWLINE_PATTERN.sub(' ', text)
+    return text
+
+
+def clean_descriptions(descriptions):
+    """
+    Cleans all descriptions of a candidate at once. Repeated descriptions are cleaned once.
+    Args:
+        descriptions (list): The description texts.
+    Returns:
+        list: The cleaned texts, in the same order.
+    """
+    cleaned = {}
+    for description in descriptions:
+        if description not in cleaned:
+            cleaned[description] = clean_description(description)
+    return [cleaned[description] for description in descriptions]